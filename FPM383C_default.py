@@ -1,8 +1,41 @@
 import binascii
 import machine
+import micropython
+import struct
 import time
 from machine import Pin, UART
 import Player
+from compat import ticks_ms, ticks_diff
+from fpm_codec import (FrameCodec, frame, DEFAULT_ADDRESS, ACK_SIZE,
+                       CMD_READ_SYS_PARA, CMD_CANCEL, CMD_AUTO_ENROLL, CMD_AUTO_IDENTIFY, CMD_SLEEP,
+                       READ_SYS_PARA_FRAME, CANCEL_FRAME, SLEEP_FRAME)
+
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+POLL_PERIOD = 0.01  # 秒, 自动注册/识别时查询串口的间隔
+AUTO_TIMEOUT_MS = 60000  # 自动注册/识别超过该时间仍未结束则发送取消指令
+READ_TIMEOUT_MS = 1000  # 普通指令的应答超时
+
+# 自动注册/识别应答中 param1 的步骤 -> 进度事件
+ENROLL_EVENTS = {0x00: 'checked',
+                 0x01: 'image_captured',
+                 0x02: 'template_generated',
+                 0x03: 'finger_left',
+                 0x04: 'merged',
+                 0x05: 'duplicate_checked',
+                 0x06: 'stored'}
+IDENTIFY_EVENTS = {0x00: 'checked',
+                   0x01: 'image_captured',
+                   0x05: 'searched'}
+
+
+def _code_key(code):
+    # 提示信息字典以两位十六进制字符串为键
+    return '{:02x}'.format(code)
 
 
 class FPM383C:
@@ -11,11 +44,11 @@ class FPM383C:
     Attributes:
         en_pin(Pin): This Pin is used to control the power supply of the FPM383C. Low level to open the FPM383C.
         model_status(bool): This is used to check if the FPM383C is OPEN or not.
+        touch_out_pin(Pin): TOUCH_OUT of the module, goes high when a finger touches the sensor (see enable_touch_wakeup).
     """
     
     def __init__(self, uart_obj, en=None, touch_out=None, device_address=None):
         self._result_dict_list = None
-        self._current_message = None
         self._result_dict = None
         self._received_confirmation_code = None
         self.player = Player
@@ -35,27 +68,37 @@ class FPM383C:
             self.en = None
             self.model_status = True
         
+        self.touch_count = 0
+        self._cancel_requested = False
+        self.busy = False
+        self._touch_pending = False
+        self._on_identified = None
         if touch_out is not None:
             self.touch_out = touch_out
-            self.touch_out_pin = Pin(self.touch_out)
+            self.touch_out_pin = Pin(self.touch_out, Pin.IN)
+        else:
+            self.touch_out = None
+            self.touch_out_pin = None
         
         self._header = bytearray([239, 1])
         if device_address is None:
             self._device_address = bytearray([255, 255, 255, 255])
         else:
             self._device_address = bytearray(device_address)
-        
-        self._all_para_data = ''
-        self._write_conclusions = b''
-        self._write_list = []
+        self.codec = FrameCodec(self._device_address)
+        if self.codec.address == DEFAULT_ADDRESS:
+            self._read_sys_para_frame = READ_SYS_PARA_FRAME
+            self._cancel_frame = CANCEL_FRAME
+            self._sleep_frame = SLEEP_FRAME
+        else:
+            self._read_sys_para_frame = frame(CMD_READ_SYS_PARA, address=self.codec.address)
+            self._cancel_frame = frame(CMD_CANCEL, address=self.codec.address)
+            self._sleep_frame = frame(CMD_SLEEP, address=self.codec.address)
         
         self._sys_para_list = ['EnrollTimes', 'FingerprintTemplateSize', 'FingerprintLibrary', 'ScoreLevelCode',
                                'DeviceAddressH', 'DeviceAddressL', 'DataPackageSize', 'BaudRate']
         self._sys_para_dic = {}
         
-        self._write_params = 0
-        self._sum = 0
-        
         self._confirmation_code = {'00': "OK",
                                    '01': "Packet received error",
                                    '02': "No finger on sensor",
@@ -235,8 +278,9 @@ class FPM383C:
         """
         self.en_pin.value(0)
         time.sleep_ms(10)
-        if self.uart.any():
-            if binascii.hexlify(self.uart.read()) != b'55':
+        available = self.uart.any()
+        if available:
+            if binascii.hexlify(self.uart.read(available)) != b'55':
                 print('Failed to initialize!')
                 self.model_status = False
             else:
@@ -249,146 +293,281 @@ class FPM383C:
         :param para_name: The name of the parameter to read.
         :return: all the system parameter or one of them
         """
-        if para_name not in self._sys_para_list:
+        if para_name is not None and para_name not in self._sys_para_list:
             raise ValueError('Parameter must be one of{}'.format(self._sys_para_list))
-        self._write_conclusions = self._header + self._device_address + b'\x01\x00\x03\x0f\x00\x13'
-        self.uart.write(self._write_conclusions)
-        time.sleep_ms(1)
-        if self.uart.any():
-            self._all_para_data = binascii.hexlify(self.uart.read()).decode()[22:]
-        if self._all_para_data[0:2] != '00':
-            print(self._confirmation_code[self._all_para_data[0:2]])
+        self._flush_input()
+        self.uart.write(self._read_sys_para_frame)
+        count = self.codec.read_frame(self.uart, READ_TIMEOUT_MS)
+        if count is None:
             return 'Error'
+        reply = self.codec.decode(count)
+        if reply.code != 0:
+            print(self._confirmation_code[_code_key(reply.code)])
+            return 'Error'
+        # 16字节参数, 每个参数占两个字节
+        values = struct.unpack_from('>8H', self.codec.params(reply))
+        for i in range(len(self._sys_para_list)):
+            self._sys_para_dic[self._sys_para_list[i]] = values[i]
+        if para_name is None:
+            return self._sys_para_dic
         else:
-            for i in range(len(self._sys_para_list)):
-                self._sys_para_dic[self._sys_para_list[i]] = self._all_para_data[i * 2 + 2:i * 2 + 4]
-            if para_name is None:
-                return self._sys_para_dic
-            else:
-                return self._sys_para_dic[para_name]
+            return self._sys_para_dic[para_name]
     
     def cancel_direction(self):
         """
         Cancels the direction of the auto-enrollment or auto-identification.
         :return:
         """
-        self._write_list = [1, 0, 3, 48, 0, 52]
-        self.uart.write(self._header + self._device_address + bytearray(self._write_list))
+        self.uart.write(self._cancel_frame)
     
     def model_sleep(self):
-        self._write_list = [1, 0, 3, 51, 0, 55]
-        self.uart.write(self._header + self._device_address + bytearray(self._write_list))
-        print(binascii.hexlify(self.uart.read()).decode())
+        """
+        Blocking wrapper around sleep() for use outside the event loop.
+        """
+        return self._run_blocking(self.sleep())
     
-    def auto_enroll(self, id_number, enroll_times=6, abc=0, apc=0, ksr=0, oid=1, fdr=0, afl=0):
+    async def sleep(self, timeout_ms=READ_TIMEOUT_MS):
         """
-        This method is to automatically enroll one fingerprint.
-        :param id_number: ID number to enroll.
-        :param abc:Acquisition backlight control bits.0:solid LED,1:Off LED after acquisition.
-        :param apc:Acquisition preprocessing control bits.0:Close preprocessing,1:Open preprocessing.
-        :param ksr:Key steps return.0:Return,1:No need to return.
-        :param oid:Allow to override the ID number.0:Not allowed,1:Allow.
-        :param fdr:Fingerprint duplicate registration.
-        :param afl:Ask your finger to leave.
-        :param enroll_times:The number of repetitions, up to a maximum of 6
-        :return:None
+        Send the Sleep instruction and wait for its acknowledgement without blocking the event loop.
+        :return: The confirmation code, None if no acknowledgement arrived within timeout_ms.
+        """
+        if self.busy:
+            raise OSError('FPM383C busy')
+        self.busy = True
+        started = ticks_ms()
+        self._flush_input()
+        self.codec.reset_frame()
+        self.uart.write(self._sleep_frame)
+        try:
+            while True:
+                count = self.codec.poll_frame(self.uart)
+                if count is not None:
+                    code = self.codec.decode(count).code
+                    print(self._confirmation_code_cn[_code_key(code)])
+                    return code
+                if ticks_diff(ticks_ms(), started) > timeout_ms:
+                    return None
+                await asyncio.sleep(POLL_PERIOD)
+        finally:
+            self.busy = False
+    
+    def _flush_input(self):
+        # 丢弃上一条指令残留的应答; 不带长度的 read() 会一直等到串口 timeout, 只读已经到达的字节
+        available = self.uart.any()
+        if available:
+            self.uart.read(available)
+    
+    def enable_touch_wakeup(self, on_identified=None):
+        """
+        Put the module to sleep and only run auto_identify when a finger raises TOUCH_OUT, then sleep again.
+        Nothing is sent on the UART while no finger is on the sensor.
+        :param on_identified: Called with the result list of every auto_identify run.
+        """
+        if self.touch_out_pin is None:
+            raise ValueError('touch_out pin required!')
+        self._on_identified = on_identified
+        self._touch_pending = False
+        # 不等待应答, 以便在事件循环里调用; 应答留在串口里, 下一条指令发送前会被丢弃
+        self.uart.write(self._sleep_frame)
+        self.touch_out_pin.irq(trigger=Pin.IRQ_RISING, handler=self._touch_irq)
+    
+    def disable_touch_wakeup(self):
+        if self.touch_out_pin is not None:
+            self.touch_out_pin.irq(handler=None)
+        self._on_identified = None
+    
+    def _touch_irq(self, pin):
+        # 中断里只登记一次识别, 真正的串口通信交给 micropython.schedule 在主线程执行
+        if self._touch_pending:
+            return
+        self._touch_pending = True
+        try:
+            micropython.schedule(self._touch_identify, None)
+        except RuntimeError:  # schedule 队列已满, 等下一次触摸
+            self._touch_pending = False
+    
+    def _touch_identify(self, _):
+        # 识别在事件循环里进行, 不阻塞网页和旋钮
+        asyncio.create_task(self._touch_identify_task())
+    
+    async def _touch_identify_task(self):
+        if self.busy:  # 正在注册指纹, 这次触摸属于注册流程
+            self._touch_pending = False
+            return
+        self.touch_count += 1
+        try:
+            result = await self.identify()
+        finally:
+            if not self.busy:  # 识别结束后可能已经开始注册, 这时不能让模组休眠
+                await self.sleep()
+            self._touch_pending = False
+        if self._on_identified is not None:
+            self._on_identified(result)
+    
+    def cancel(self):
+        """
+        Stop a running enroll() or identify(): the Cancel instruction is sent from the running coroutine.
+        """
+        if self.busy:
+            self._cancel_requested = True
+    
+    async def _run_auto(self, command, on_reply, timeout_ms):
+        """
+        Send an auto command and feed its replies to on_reply(count) as they arrive, without blocking.
+        Stops when on_reply returns True, on cancel(), on timeout or when the task is cancelled;
+        in the last three cases the Cancel instruction is sent and its acknowledgement awaited.
+        :return: True if on_reply ended the command, False if it was cancelled.
+        """
+        if self.busy:
+            raise OSError('FPM383C busy')
+        self.busy = True
+        self._cancel_requested = False
+        cancel_sent = False
+        started = ticks_ms()
+        self._flush_input()
+        self.codec.reset_frame()
+        self.uart.write(command)
+        try:
+            while True:
+                count = self.codec.poll_frame(self.uart)
+                if count is None:
+                    if not cancel_sent and (self._cancel_requested or
+                                            ticks_diff(ticks_ms(), started) > timeout_ms):
+                        self.uart.write(self._cancel_frame)
+                        cancel_sent = True
+                    await asyncio.sleep(POLL_PERIOD)
+                    continue
+                if count == ACK_SIZE:
+                    if cancel_sent:
+                        return False  # 取消指令的应答
+                    continue
+                if on_reply(count):
+                    return True
+        except asyncio.CancelledError:
+            self.uart.write(self._cancel_frame)
+            raise
+        finally:
+            self.busy = False
+            self._cancel_requested = False
+    
+    async def enroll(self, id_number, enroll_times=6, abc=0, apc=0, ksr=0, oid=1, fdr=0, afl=0, on_event=None,
+                     timeout_ms=AUTO_TIMEOUT_MS):
+        """
+        Automatically enroll one fingerprint without blocking the event loop.
+        :param on_event: Called as on_event(event, reply) for every step reported by the module, event being
+            one of ENROLL_EVENTS ('image_captured', 'merged', 'stored', ...) and reply an EnrollReply.
+        See auto_enroll for the other parameters.
+        :return: The list of progress messages; the last one says whether the template was stored.
         """
-        self._write_list = []
-        self._result_dict = {}
         self._result_dict_list = []
-        self._write_params = int(f"{afl}{fdr}{oid}{ksr}{apc}{abc}", 2)
-        self._sum = 58 + id_number + enroll_times + self._write_params
-        self._write_conclusions = self._header + self._device_address + b'\x01\x00\x08\x31' + bytearray(
-            [0, id_number, enroll_times, 0, self._write_params]) + self._sum.to_bytes(2, 'big')
-        print('Auto Enrollment Start! Sending:' + str(binascii.hexlify(self._write_conclusions)))
-        # print(bytes(self._write_conclusions))
-        self.uart.read()
-        self.uart.write(bytes(self._write_conclusions))
-        while True:
+        write_params = int(f"{afl}{fdr}{oid}{ksr}{apc}{abc}", 2)
+        command = self.codec.encode(CMD_AUTO_ENROLL, 'HBH', id_number, enroll_times, write_params)
+        print('Auto Enrollment Start! Sending:' + str(binascii.hexlify(command)))
+        
+        def on_reply(count):
             try:
-                self._current_message = binascii.hexlify(self.uart.read(14)).decode()
-                print(self._current_message)
-                self._result_dict = {'header': self._current_message[0:4],
-                                     'device_address': self._current_message[4:12],
-                                     'package_identification': self._current_message[12:14],
-                                     'package_length': self._current_message[14:18],
-                                     'conformation_code': self._current_message[18:20],
-                                     'param1': self._current_message[20:22],
-                                     'param2': self._current_message[22:24],
-                                     'check_sum': self._current_message[24:28]
-                                     }
-                if self._result_dict['param2'] in self._auto_enroll_param2_cn:
-                    self._result_dict_list.append(self._auto_enroll_param2_cn[self._result_dict['param2']] +
-                                                  self._auto_enroll_param1_cn[self._result_dict['param1']] +
-                                                  self._auto_enroll_conformation_code_cn[
-                                                      self._result_dict['conformation_code']])
-                    if self._result_dict['param2'] == '00':
+                self._result_dict = self.codec.enroll_reply(count)
+                print(self._result_dict)
+                step = _code_key(self._result_dict.step)
+                code = _code_key(self._result_dict.code)
+                progress = self._result_dict.progress
+                if _code_key(progress) in self._auto_enroll_param2_cn:
+                    self._result_dict_list.append(self._auto_enroll_param2_cn[_code_key(progress)] +
+                                                  self._auto_enroll_param1_cn[step] +
+                                                  self._auto_enroll_conformation_code_cn[code])
+                    if progress == 0x00:
                         self.player.play_music_finger('请放手指')
-                    if self._result_dict['param2'] == 'f2' and self._result_dict['conformation_code'] == '00':
+                    if progress == 0xf2 and self._result_dict.code == 0:
                         self.player.play_music_finger('指纹录入成功')
-                        break
                 else:
-                    self._result_dict_list.append('第{}次注册'.format(self._result_dict['param2']) +
-                                                  self._auto_enroll_param1_cn[self._result_dict['param1']] +
-                                                  self._auto_enroll_conformation_code_cn[
-                                                      self._result_dict['conformation_code']])
-                    if eval(self._result_dict['param2']) < 6:
+                    self._result_dict_list.append('第{}次注册'.format(progress) +
+                                                  self._auto_enroll_param1_cn[step] +
+                                                  self._auto_enroll_conformation_code_cn[code])
+                    if progress < 6:
                         self.player.play_music_finger('采集成功,请重新放手指')
-            except OSError:
-                break
-            except TypeError:
-                break
-            except KeyError:
+            except (KeyError, ValueError):
                 self._result_dict_list.append('模组状态异常')
+                return False
+            if on_event is not None and self._result_dict.step in ENROLL_EVENTS:
+                on_event(ENROLL_EVENTS[self._result_dict.step], self._result_dict)
+            return self._result_dict.code != 0 or self._result_dict.progress == 0xf2
+        
+        if not await self._run_auto(command, on_reply, timeout_ms):
+            self._result_dict_list.append('已取消')
         return self._result_dict_list
     
-    def auto_identify(self, level=3, abc=0, apc=0, ksr=0):
-        self._write_list = []
-        self._result_dict = {}
+    async def identify(self, level=3, abc=0, apc=0, ksr=0, on_event=None, timeout_ms=AUTO_TIMEOUT_MS):
+        """
+        Automatically search the finger on the sensor without blocking the event loop.
+        :param on_event: Called as on_event(event, reply) for every step, event being one of IDENTIFY_EVENTS
+            and reply an IdentifyReply; the 'searched' reply carries finger_id and score.
+        :return: The list of progress messages.
+        """
         self._result_dict_list = []
-        self._write_params = int(f"{ksr}{apc}{abc}", 2)
-        self._sum = 59 + 255 + 255 + level + self._write_params
-        print(self._sum.to_bytes(2, 'big'))
-        self._write_conclusions = self._header + self._device_address + b'\x01\x00\x08\x32' + bytearray(
-            [level, 255, 255, 0, self._write_params]) + self._sum.to_bytes(2, 'big')
-        print('Auto Identify Start! Sending:' + str(binascii.hexlify(self._write_conclusions)))
-        print(bytes(self._write_conclusions))
-        self.uart.read()
-        self.uart.write(bytes(self._write_conclusions))
-        while True:
+        write_params = int(f"{ksr}{apc}{abc}", 2)
+        command = self.codec.encode(CMD_AUTO_IDENTIFY, 'BHH', level, 0xffff, write_params)
+        print('Auto Identify Start! Sending:' + str(binascii.hexlify(command)))
+        
+        def on_reply(count):
             try:
-                self._current_message = binascii.hexlify(self.uart.read(17)).decode()
-                print(self._current_message)
-                self._result_dict = {'header': self._current_message[0:4],
-                                     'device_address': self._current_message[4:12],
-                                     'package_identification': self._current_message[12:14],
-                                     'package_length': self._current_message[14:18],
-                                     'conformation_code': self._current_message[18:20],
-                                     'param': self._current_message[20:22],
-                                     'ID_number': self._current_message[22:26],
-                                     'grade': self._current_message[26:30],
-                                     'checksum': self._current_message[30:34]
-                                     }
+                self._result_dict = self.codec.identify_reply(count)
                 print(self._result_dict)
-                if self._result_dict['param'] in self._auto_identify_param_cn:
-                    print(self._auto_identify_param_cn[self._result_dict['param']] +
-                          self._confirmation_code_cn[
-                              self._result_dict['conformation_code']])
-                
-                # 判断指纹是否存在或者验证成功
-                if self._result_dict['param'] == '05' and self._result_dict['conformation_code'] == '09': #验证失败
-                    self.player.play_music('00099')
-                    break
-                elif self._result_dict['param'] == '05' and self._result_dict['conformation_code'] == '00': #验证成功搜索到指纹
-                    self.player.play_music('0' + self._result_dict['ID_number'])
-                    break
-            except OSError:
-                break
-            except TypeError:
-                break
-            except KeyError:
+                step = self._result_dict.step
+                code = self._result_dict.code
+                message = self._auto_identify_param_cn.get(_code_key(step), '') + \
+                    self._confirmation_code_cn[_code_key(code)]
+                print(message)
+                self._result_dict_list.append(message)
+            except (KeyError, ValueError):
                 self._result_dict_list.append('模组状态异常')
+                return False
+            if on_event is not None and step in IDENTIFY_EVENTS:
+                on_event(IDENTIFY_EVENTS[step], self._result_dict)
+            # 判断指纹是否存在或者验证成功
+            if step == 0x05 and code == 0x09: #验证失败
+                self.player.play_music('00099')
+            elif step == 0x05 and code == 0x00: #验证成功搜索到指纹
+                self.player.play_music('{:05d}'.format(self._result_dict.finger_id))
+            return code != 0 or step == 0x05
+        
+        if not await self._run_auto(command, on_reply, timeout_ms):
+            self._result_dict_list.append('已取消')
         return self._result_dict_list
+    
+    def auto_enroll(self, id_number, enroll_times=6, abc=0, apc=0, ksr=0, oid=1, fdr=0, afl=0):
+        """
+        This method is to automatically enroll one fingerprint.
+        Blocking wrapper around enroll() for use outside the event loop (e.g. from the REPL).
+        :param id_number: ID number to enroll.
+        :param abc:Acquisition backlight control bits.0:solid LED,1:Off LED after acquisition.
+        :param apc:Acquisition preprocessing control bits.0:Close preprocessing,1:Open preprocessing.
+        :param ksr:Key steps return.0:Return,1:No need to return.
+        :param oid:Allow to override the ID number.0:Not allowed,1:Allow.
+        :param fdr:Fingerprint duplicate registration.
+        :param afl:Ask your finger to leave.
+        :param enroll_times:The number of repetitions, up to a maximum of 6
+        :return:None
+        """
+        return self._run_blocking(self.enroll(id_number, enroll_times, abc, apc, ksr, oid, fdr, afl))
+    
+    def auto_identify(self, level=3, abc=0, apc=0, ksr=0):
+        """
+        Blocking wrapper around identify() for use outside the event loop.
+        """
+        return self._run_blocking(self.identify(level, abc, apc, ksr))
+    
+    def _run_blocking(self, coro):
+        # 事件循环之外没有 Player.queue.run() 任务, 提示音只会入队; 临时启动一个, 放完再返回
+        async def main():
+            drain = asyncio.create_task(self.player.queue.run())
+            try:
+                return await coro
+            finally:
+                while len(self.player.queue):
+                    await asyncio.sleep(POLL_PERIOD)
+                drain.cancel()
+        
+        return asyncio.run(main())
 
 
 if __name__ == '__main__':
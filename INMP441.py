@@ -2,9 +2,21 @@ from machine import Pin, I2S
 import socket
 import network
 import micropython
+from audio_stream import AudioStream
+from vad import VoiceGate
+from adpcm import AdpcmEncoder
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+SAMPLE_RATE = 8000
+CHUNK_SIZE = 1024  # 字节, 16位单声道8kHz下为64ms
+SINK_ADDRESS = ('192.168.1.114', 8001)
 
 wlan = network.WLAN(network.STA_IF)
-if wlan.active():
+if not wlan.active():
     wlan.active(True)
     
 bck_pin = Pin(25)
@@ -15,16 +27,10 @@ audio_in = I2S(0,
                mode=I2S.RX,
                bits=16,
                format=I2S.MONO,
-               rate=8000,
+               rate=SAMPLE_RATE,
                ibuf=8000)
 
 
-try:
-    ibuf = bytearray(8000)
-except:
-    pass
-
-
 def connect(ssid='Tenda_04F7D0', password='123456789'):
     print('Connecting')
     wlan.connect(ssid, password)
@@ -32,8 +38,32 @@ def connect(ssid='Tenda_04F7D0', password='123456789'):
         pass
 
 
-def socket_create():
+def socket_create(address=SINK_ADDRESS):
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    s.connect(('192.168.1.114', 8001))
-    
+    s.connect(address)
+    return s
+
+
+def stream(duration_ms=None, chunk_size=CHUNK_SIZE, stages=None, address=SINK_ADDRESS):
+    """
+    Stream the microphone to the sink (tools/audio_sink.py) until stopped or for duration_ms.
+    :param stages: Processing stages, by default a VoiceGate so that only speech is sent, then IMA-ADPCM
+        encoding (4:1; decode on the sink with --adpcm).
+    :return: The AudioStream, for its captured/dropped/sent counters.
+    """
+    if stages is None:
+        stages = (VoiceGate(chunk_size), AdpcmEncoder(chunk_size))
+    if not wlan.isconnected():
+        connect()
+    sock = socket_create(address)
+    audio = AudioStream(audio_in, sock, chunk_size, stages)
+    try:
+        asyncio.run(audio.run(duration_ms=duration_ms))
+    finally:
+        sock.close()
+    print('captured {} dropped {} sent {} bytes'.format(audio.captured, audio.dropped, audio.sent_bytes))
+    return audio
+
 
+if __name__ == '__main__':
+    stream()
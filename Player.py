@@ -1,8 +1,11 @@
 import machine
 from machine import UART
+from audio_queue import AudioQueue, PRIORITY_ALARM, PRIORITY_GREETING
 
 music_name = None
 player_uart = UART(1, 9600, tx=26, rx=27)
+# 所有播放指令都经过这个队列, 由 queue.run() 任务按模块可接受的节奏发出
+queue = AudioQueue(player_uart, size=8, interval_ms=100, collapse_ms=1000)
 
 finger_wav_dict = {"请放手指": '00100',
                    "采集成功,请重新放手指": '00101',
@@ -10,18 +13,69 @@ finger_wav_dict = {"请放手指": '00100',
                    "指纹录入成功": '00103'
                    }
 
+# 这些提示音优先于问候语播放
+ALARM_TRACKS = ('00099',)
+# 程序中直接使用的提示音: 室内开门关门, 密码错误
+SYSTEM_TRACKS = ('00017', '00099')
+
+# 曲目 -> 编码好的播放指令, 开锁时不再格式化字符串
+_command_cache = {}
+_finger_command_cache = {}
+
+
+def _encode_play(music_name):
+    return 'A7:{}'.format(music_name).encode()
+
+
+def preload(data_base=None):
+    """
+    Encode the play command of every known track once: the system and fingerprint prompts and the
+    dooring track of every user in data_base.
+    """
+    global _command_cache, _finger_command_cache
+    cache = {}
+    for track in SYSTEM_TRACKS:
+        cache[track] = _encode_play(track)
+    finger_cache = {}
+    for prompt in finger_wav_dict:
+        track = finger_wav_dict[prompt]
+        cache[track] = finger_cache[prompt] = _encode_play(track)
+    if data_base is not None:
+        users = data_base.get_data()
+        for username in users:
+            track = users[username].get('dooring')
+            if track is not None:
+                cache[track] = _encode_play(track)
+    _command_cache = cache
+    _finger_command_cache = finger_cache
+
+
+def watch(data_base):
+    """
+    Preload the tracks of data_base and rebuild the cache whenever a user changes.
+    """
+    preload(data_base)
+    data_base.add_listener(lambda username: preload(data_base))
+
 
 def volume_set(volume=31):
-    player_uart.write(b'AF:{}'.format(volume))
+    queue.push('AF:{}'.format(volume).encode(), PRIORITY_ALARM)
 
 
-def play_music(music_name):
-    player_uart.write(b'A7:{}'.format(music_name))
+def play_music(music_name, priority=None):
+    command = _command_cache.get(music_name)
+    if command is None:
+        command = _encode_play(music_name)
+    if priority is None:
+        priority = PRIORITY_ALARM if music_name in ALARM_TRACKS else PRIORITY_GREETING
+    queue.push(command, priority)
 
 
 def play_music_finger(music_name):
-    if music_name in finger_wav_dict:
-        play_music(finger_wav_dict[music_name])
+    command = _finger_command_cache.get(music_name)
+    if command is not None:
+        queue.push(command, PRIORITY_GREETING)
 
 
+preload()
 volume_set()
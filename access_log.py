@@ -0,0 +1,132 @@
+import os
+import struct
+
+_MAGIC = b'RLOG'
+_HEADER_FORMAT = '<4sHHHH'  # magic, slot_size, capacity, head, count
+_HEADER_SIZE = 16
+
+
+class AccessLog:
+    """
+    Unlock records kept in a fixed-size ring buffer file.
+    The file starts with a small header holding the index of the next slot to write, followed by
+    `capacity` slots of `slot_size` bytes, so appending a record is a slot write plus a header write
+    no matter how many records are stored.
+    A file written with another slot_size or capacity is migrated to the new layout, keeping the
+    newest records; the legacy record.txt is imported once and then renamed to record.txt.imported.
+    Attributes:
+        head(int): Index of the slot the next record goes to (the oldest record once the log is full).
+        count(int): Number of valid records, at most capacity.
+    """
+
+    def __init__(self, file_name='record.log', capacity=300, slot_size=96, legacy_file='record.txt'):
+        self.file_name = file_name
+        self.capacity = capacity
+        self.slot_size = slot_size
+        self.head = 0
+        self.count = 0
+        self._slot = bytearray(slot_size)
+        try:
+            self._file = open(file_name, 'r+b')
+            self._load_header()
+        except (OSError, ValueError):
+            self._create(file_name)
+            self._import_legacy(legacy_file)
+
+    def _load_header(self):
+        header = self._file.read(struct.calcsize(_HEADER_FORMAT))
+        if len(header) < struct.calcsize(_HEADER_FORMAT) or header[:4] != _MAGIC:
+            self._file.close()
+            raise ValueError('not a record log')
+        _, slot_size, capacity, head, count = struct.unpack(_HEADER_FORMAT, header)
+        if slot_size != self.slot_size or capacity != self.capacity:
+            self._migrate(slot_size, capacity, head, count)
+            return
+        self.head = head
+        self.count = count
+
+    def _migrate(self, slot_size, capacity, head, count):
+        # 按文件头中的旧布局读出记录, 只保留最新的 capacity 条, 写入临时文件后再替换原文件
+        records = list(self._read_slots(self._file, slot_size, capacity, head, count))
+        self._file.close()
+        tmp_name = self.file_name + '.tmp'
+        self._create(tmp_name)
+        for record in records[-self.capacity:]:
+            self.append(record)
+        self._file.close()
+        try:
+            os.rename(tmp_name, self.file_name)
+        except OSError:
+            os.remove(self.file_name)
+            os.rename(tmp_name, self.file_name)
+        self._file = open(self.file_name, 'r+b')
+
+    def _write_header(self):
+        self._file.seek(0)
+        self._file.write(struct.pack(_HEADER_FORMAT, _MAGIC, self.slot_size, self.capacity, self.head, self.count))
+
+    def _create(self, file_name):
+        self._file = open(file_name, 'w+b')
+        self.head = 0
+        self.count = 0
+        self._file.write(bytearray(_HEADER_SIZE))
+        blank = b' ' * (self.slot_size - 1) + b'\n'
+        for _ in range(self.capacity):
+            self._file.write(blank)
+        self._write_header()
+        self._file.flush()
+
+    def _import_legacy(self, legacy_file):
+        # 把旧版 record.txt 中的记录导入环形日志, 导入后改名, 环形日志重建时不会再导入一次
+        try:
+            with open(legacy_file, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        self.append(line)
+        except OSError:
+            return
+        try:
+            os.rename(legacy_file, legacy_file + '.imported')
+        except OSError:
+            pass
+
+    def append(self, record):
+        data = record.encode()
+        size = len(data)
+        if size > self.slot_size - 1:
+            size = self.slot_size - 1
+            while size > 0 and data[size] & 0xC0 == 0x80:  # 不截断UTF-8多字节字符
+                size -= 1
+        slot = self._slot
+        slot[:size] = data[:size]
+        for i in range(size, self.slot_size - 1):
+            slot[i] = 32
+        slot[self.slot_size - 1] = 10
+        self._file.seek(_HEADER_SIZE + self.head * self.slot_size)
+        self._file.write(slot)
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        self._write_header()
+        self._file.flush()
+
+    def records(self):
+        """
+        Yield the stored records from oldest to newest, reading one slot at a time.
+        """
+        with open(self.file_name, 'rb') as f:
+            for record in self._read_slots(f, self.slot_size, self.capacity, self.head, self.count):
+                yield record
+
+    @staticmethod
+    def _read_slots(f, slot_size, capacity, head, count):
+        start = head if count == capacity else 0
+        slot = bytearray(slot_size)
+        for i in range(count):
+            f.seek(_HEADER_SIZE + (start + i) % capacity * slot_size)
+            f.readinto(slot)
+            yield bytes(slot).decode().strip()
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,263 @@
+"""
+IMA-ADPCM (4 bits per sample) for the microphone uplink.
+Every chunk of 16 bit little endian mono PCM becomes one block in the layout of IMA-ADPCM WAV files:
+a 4 byte header (first sample as int16, step index, 0) followed by the remaining samples as 4 bit codes,
+low nibble first. Blocks decode independently, so chunks dropped by the VoiceGate do not break the
+stream. The encoder works in place: the block is written over the start of the PCM it came from.
+encode_blocks is the pure-Python reference; encode_blocks_native uses viper on the board.
+"""
+from array import array
+
+HEADER_SIZE = 4
+
+STEPS = array('H', (
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+    50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230, 253, 279, 307,
+    337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963, 1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066,
+    2272, 2499, 2749, 3024, 3327, 3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442,
+    11487, 12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794, 32767))
+MAX_INDEX = 88
+INDEX_ADJUST = (-1, -1, -1, -1, 2, 4, 6, 8)
+_INDEX_ADJUST_BIASED = bytes(x + 1 for x in INDEX_ADJUST)  # viper 的 ptr8 只能读无符号数
+
+
+def block_size(chunk_size):
+    """
+    :param chunk_size: PCM bytes per chunk (a multiple of 4).
+    :return: Bytes per encoded block.
+    """
+    return HEADER_SIZE + chunk_size // 4
+
+
+def _encode_sample(sample, predictor, index):
+    step = STEPS[index]
+    diff = sample - predictor
+    code = 0
+    if diff < 0:
+        code = 8
+        diff = -diff
+    delta = step >> 3
+    if diff >= step:
+        code |= 4
+        diff -= step
+        delta += step
+    step >>= 1
+    if diff >= step:
+        code |= 2
+        diff -= step
+        delta += step
+    step >>= 1
+    if diff >= step:
+        code |= 1
+        delta += step
+    predictor = predictor - delta if code & 8 else predictor + delta
+    predictor = -32768 if predictor < -32768 else 32767 if predictor > 32767 else predictor
+    index += INDEX_ADJUST[code & 7]
+    index = 0 if index < 0 else MAX_INDEX if index > MAX_INDEX else index
+    return code, predictor, index
+
+
+def _sample(buf, offset):
+    x = buf[offset] | (buf[offset + 1] << 8)
+    return x - 0x10000 if x & 0x8000 else x
+
+
+def encode_blocks(buf, blocks, state):
+    """
+    Encode blocks * block_samples samples of buf in place.
+    :param buf: Writable PCM buffer; block n is written over it at n * block_bytes.
+    :param blocks: Number of blocks.
+    :param state: array('i', (index, block_samples, block_bytes)): the step index carried from block to
+        block, samples per block (even) and block_size(block_samples * 2).
+    """
+    index, block_samples, block_bytes = state[0], state[1], state[2]
+    for block in range(blocks):
+        src = block * block_samples * 2
+        dst = block * block_bytes
+        predictor = _sample(buf, src)
+        header_index = index
+        # 第二个采样和块头重叠, 先编码它再写块头
+        pending, predictor, index = _encode_sample(_sample(buf, src + 2), predictor, index)
+        buf[dst] = buf[src]
+        buf[dst + 1] = buf[src + 1]
+        buf[dst + 2] = header_index
+        buf[dst + 3] = 0
+        out = dst + HEADER_SIZE
+        for i in range(2, block_samples):
+            code, predictor, index = _encode_sample(_sample(buf, src + 2 * i), predictor, index)
+            if i & 1:
+                pending = code
+            else:
+                buf[out] = pending | (code << 4)
+                out += 1
+        buf[out] = pending  # 最后一个字节只用低4位
+    state[0] = index
+
+
+try:
+    import micropython
+
+    # viper 函数最多只能有 4 个参数, 块大小和步长索引一起放在 state 数组里
+    @micropython.viper
+    def _encode_blocks_viper(buf, blocks: int, state):
+        pcm = ptr8(buf)
+        steps = ptr16(STEPS)
+        adjust = ptr8(_INDEX_ADJUST_BIASED)
+        index_out = ptr32(state)
+        index = int(index_out[0])
+        block_samples = int(index_out[1])
+        block_bytes = int(index_out[2])
+        block = 0
+        while block < blocks:
+            src = block * block_samples * 2
+            dst = block * block_bytes
+            predictor = int(pcm[src]) | (int(pcm[src + 1]) << 8)
+            if predictor & 0x8000:
+                predictor -= 0x10000
+            header_index = index
+            out = dst + 4
+            pending = 0
+            i = 1
+            while i < block_samples:
+                o = src + 2 * i
+                diff = (int(pcm[o]) | (int(pcm[o + 1]) << 8))
+                if diff & 0x8000:
+                    diff -= 0x10000
+                diff -= predictor
+                step = int(steps[index])
+                code = 0
+                if diff < 0:
+                    code = 8
+                    diff = 0 - diff
+                delta = step >> 3
+                if diff >= step:
+                    code |= 4
+                    diff -= step
+                    delta += step
+                step >>= 1
+                if diff >= step:
+                    code |= 2
+                    diff -= step
+                    delta += step
+                step >>= 1
+                if diff >= step:
+                    code |= 1
+                    delta += step
+                if code & 8:
+                    predictor -= delta
+                    if predictor < -32768:
+                        predictor = -32768
+                else:
+                    predictor += delta
+                    if predictor > 32767:
+                        predictor = 32767
+                index += int(adjust[code & 7]) - 1
+                if index < 0:
+                    index = 0
+                elif index > 88:
+                    index = 88
+                if i == 1:
+                    # 第二个采样已读出, 现在可以写块头
+                    pcm[dst] = pcm[src]
+                    pcm[dst + 1] = pcm[src + 1]
+                    pcm[dst + 2] = header_index
+                    pcm[dst + 3] = 0
+                if i & 1:
+                    pending = code
+                else:
+                    pcm[out] = pending | (code << 4)
+                    out += 1
+                i += 1
+            pcm[out] = pending
+            block += 1
+        index_out[0] = index
+
+    def encode_blocks_native(buf, blocks, state):
+        _encode_blocks_viper(buf, blocks, state)
+except (ImportError, AttributeError):
+    encode_blocks_native = encode_blocks
+
+
+def decode_block(block, offset, block_samples, out, out_offset):
+    """
+    Decode one block into 16 bit little endian PCM.
+    :param block: Encoded data; the block starts at offset.
+    :param out: Writable buffer for block_samples * 2 bytes at out_offset.
+    """
+    predictor = _sample(block, offset)
+    index = block[offset + 2]
+    if index > MAX_INDEX:
+        raise ValueError('bad block header')
+    out[out_offset] = block[offset]
+    out[out_offset + 1] = block[offset + 1]
+    pos = offset + HEADER_SIZE
+    for i in range(1, block_samples):
+        code = block[pos] & 0x0f if i & 1 else block[pos] >> 4
+        if not i & 1:
+            pos += 1
+        step = STEPS[index]
+        delta = step >> 3
+        if code & 4:
+            delta += step
+        if code & 2:
+            delta += step >> 1
+        if code & 1:
+            delta += step >> 2
+        predictor = predictor - delta if code & 8 else predictor + delta
+        predictor = -32768 if predictor < -32768 else 32767 if predictor > 32767 else predictor
+        index += INDEX_ADJUST[code & 7]
+        index = 0 if index < 0 else MAX_INDEX if index > MAX_INDEX else index
+        o = out_offset + 2 * i
+        out[o] = predictor & 0xff
+        out[o + 1] = (predictor >> 8) & 0xff
+
+
+class AdpcmEncoder:
+    """
+    AudioStream stage: encodes the chunk in place and returns the view of the encoded blocks.
+    A view holding several chunks (VoiceGate pre-roll) becomes one block per chunk.
+    Attributes:
+        blocks(int): Blocks encoded.
+    """
+
+    def __init__(self, chunk_size, encode=encode_blocks_native):
+        if chunk_size % 4:
+            raise ValueError('chunk size must be a multiple of 4')
+        self.chunk_size = chunk_size
+        self.block_samples = chunk_size // 2
+        self.block_bytes = block_size(chunk_size)
+        self.encode = encode
+        self._state = array('i', (0, self.block_samples, self.block_bytes))  # 步长索引跨块延续
+        self.blocks = 0
+
+    def __call__(self, view):
+        blocks = len(view) // self.chunk_size
+        self.encode(view, blocks, self._state)
+        self.blocks += blocks
+        return view[:blocks * self.block_bytes]
+
+
+class AdpcmDecoder:
+    """
+    Decoder for the received byte stream (host side): call it with whatever recv returned, it keeps
+    an incomplete block for the next call.
+    :param chunk_size: PCM bytes per chunk used by the encoder.
+    """
+
+    def __init__(self, chunk_size):
+        self.block_samples = chunk_size // 2
+        self.block_bytes = block_size(chunk_size)
+        self._pending = bytearray()
+
+    def reset(self):
+        # 新连接: 丢弃上一个连接剩下的不完整块
+        self._pending = bytearray()
+
+    def __call__(self, data):
+        self._pending += data
+        blocks = len(self._pending) // self.block_bytes
+        out = bytearray(blocks * self.block_samples * 2)
+        for n in range(blocks):
+            decode_block(self._pending, n * self.block_bytes, self.block_samples, out, n * self.block_samples * 2)
+        del self._pending[:blocks * self.block_bytes]
+        return bytes(out)
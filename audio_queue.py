@@ -0,0 +1,113 @@
+from compat import const, ticks_ms, ticks_diff
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+PRIORITY_ALARM = const(0)
+PRIORITY_GREETING = const(1)
+
+
+class AudioQueue:
+    """
+    Bounded queue of commands for the audio module, drained at most one command every interval_ms so
+    that writes from the web handlers, the rotary listener and the fingerprint driver never interleave
+    on the UART or arrive faster than the module accepts them.
+    A command that is already waiting, or that was sent less than collapse_ms ago, is not queued again
+    (a burst of 00099 plays once). Alarms go out before greetings; when the queue is full the newest
+    lowest-priority command is dropped.
+    push() only appends to the queue and every write is done by the run() task, so push() may also be
+    called from a machine.Timer callback (e.g. LockActuator's on_release) that interrupts service().
+    Attributes:
+        sent(int): Commands written to the UART.
+        collapsed(int): Commands dropped as duplicates.
+        dropped(int): Commands dropped because the queue was full.
+    """
+
+    def __init__(self, uart, size=8, interval_ms=100, collapse_ms=1000, clock=ticks_ms, poll_ms=10):
+        self.uart = uart
+        self.size = size
+        self.interval_ms = interval_ms
+        self.poll_ms = poll_ms
+        self.collapse_ms = collapse_ms
+        self.clock = clock
+        self.sent = 0
+        self.collapsed = 0
+        self.dropped = 0
+        self._pending = []  # [priority, command], 同一优先级按入队顺序
+        self._last_command = None
+        self._last_sent = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def push(self, command, priority=PRIORITY_GREETING):
+        """
+        Queue one command; run() writes it within poll_ms if the queue is empty and the module is ready.
+        :return: False if the command was collapsed, or dropped because the queue is full of commands at
+            least as urgent.
+        """
+        now = self.clock()
+        for item in self._pending:
+            if item[1] == command:
+                item[0] = min(item[0], priority)
+                self.collapsed += 1
+                return False
+        if (command == self._last_command and self._last_sent is not None and
+                ticks_diff(now, self._last_sent) < self.collapse_ms):
+            self.collapsed += 1
+            return False
+        if len(self._pending) >= self.size:
+            # 这里不删除: 删除会移动 service() 正在使用的下标, 多出的低优先级指令由 service() 丢弃
+            lower = 0
+            for item in self._pending:
+                if item[0] > priority:
+                    lower += 1
+            if lower <= len(self._pending) - self.size:
+                self.dropped += 1
+                return False
+        self._pending.append([priority, command])
+        return True
+
+    def _trim(self):
+        # 超出 size 时丢弃最新的最低优先级指令; push() 只会在末尾追加, 不影响这里的下标
+        while len(self._pending) > self.size:
+            victim = len(self._pending) - 1
+            for i in range(victim, -1, -1):
+                if self._pending[i][0] > self._pending[victim][0]:
+                    victim = i
+            del self._pending[victim]
+            self.dropped += 1
+
+    def service(self, now=None):
+        """
+        Write the next command if interval_ms has passed since the previous one.
+        :return: True if a command was written.
+        """
+        self._trim()
+        if not self._pending:
+            return False
+        if now is None:
+            now = self.clock()
+        if self._last_sent is not None and ticks_diff(now, self._last_sent) < self.interval_ms:
+            return False
+        best = 0
+        for i in range(1, len(self._pending)):
+            if self._pending[i][0] < self._pending[best][0]:
+                best = i
+        command = self._pending.pop(best)[1]
+        self.uart.write(command)
+        self._last_command = command
+        self._last_sent = now
+        self.sent += 1
+        return True
+
+    async def run(self):
+        # 队列中的指令按 interval_ms 的节奏逐条发出, 队列为空时每 poll_ms 查看一次
+        while True:
+            self.service()
+            wait = self.poll_ms
+            if self._pending:
+                wait = max(1, self.interval_ms - ticks_diff(self.clock(), self._last_sent))
+            await asyncio.sleep(wait / 1000)
@@ -0,0 +1,123 @@
+"""
+Microphone capture pipeline: I2S -> optional processing stages -> TCP socket.
+Two preallocated buffers alternate: the I2S driver fills one in the background (non-blocking readinto,
+completion reported through audio_in.irq) while the other is sent through a memoryview, so nothing is
+allocated per chunk. Depends only on the readinto/irq interface of machine.I2S and on socket.send, so
+it also runs on a PC against tools/fake_i2s.py.
+"""
+from compat import ticks_ms, ticks_diff
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+try:
+    from errno import EAGAIN
+except ImportError:
+    EAGAIN = 11
+
+
+class AudioStream:
+    """
+    :param audio_in: machine.I2S in RX mode (or a fake with the same readinto/irq interface).
+    :param sock: Connected socket; it is switched to non-blocking.
+    :param chunk_size: Bytes per buffer (16 bit mono: 2 bytes per sample).
+    :param stages: Callables stage(view) -> view or None, applied in order to every captured chunk;
+        None drops the chunk (e.g. silence), a view replaces it (e.g. compressed data).
+    Attributes:
+        captured(int): Chunks completed by the I2S driver.
+        dropped(int): Chunks overwritten because the previous one was still being sent.
+        skipped(int): Chunks dropped by a stage.
+        sent_bytes(int): Bytes written to the socket.
+    """
+
+    def __init__(self, audio_in, sock, chunk_size=1024, stages=()):
+        self.audio_in = audio_in
+        self.sock = sock
+        self.chunk_size = chunk_size
+        self.stages = stages
+        self._buffers = (bytearray(chunk_size), bytearray(chunk_size))
+        self._views = (memoryview(self._buffers[0]), memoryview(self._buffers[1]))
+        self._fill = 0  # 正在被I2S写入的缓冲区
+        self._ready = None  # 录好等待发送的缓冲区
+        self._out = None  # 正在发送的数据
+        self._offset = 0
+        self.captured = 0
+        self.dropped = 0
+        self.skipped = 0
+        self.sent_bytes = 0
+        self.running = False
+
+    def start(self):
+        self.sock.setblocking(False)
+        self.running = True
+        self.audio_in.irq(self._filled)
+        self.audio_in.readinto(self._views[self._fill])
+
+    def stop(self):
+        self.running = False
+        self.audio_in.irq(None)
+
+    def _filled(self, audio_in):
+        # I2S 中断回调(经 micropython.schedule 在主线程执行): 交出录好的缓冲区, 继续录另一个
+        if not self.running:
+            return
+        self.captured += 1
+        if self._ready is None:
+            self._ready = self._fill
+            self._fill ^= 1
+        else:
+            self.dropped += 1  # 发送跟不上, 丢弃刚录好的这一块并原地重录
+        self.audio_in.readinto(self._views[self._fill])
+
+    def pump(self):
+        """
+        Process the ready chunk and push as much of it into the socket as it takes without blocking.
+        :return: True while data is still waiting to be sent.
+        """
+        if self._out is None:
+            if self._ready is None:
+                return False
+            out = self._views[self._ready]
+            for stage in self.stages:
+                out = stage(out)
+                if out is None:
+                    break
+            if out is None:
+                self.skipped += 1
+                self._ready = None
+                return False
+            self._out = out
+            self._offset = 0
+        try:
+            sent = self.sock.send(self._out[self._offset:])
+        except OSError as e:
+            if e.args[0] == EAGAIN:
+                return True
+            raise
+        if sent:
+            self._offset += sent
+            self.sent_bytes += sent
+        if self._offset >= len(self._out):
+            self._out = None
+            self._ready = None
+            return False
+        return True
+
+    async def run(self, period_ms=5, duration_ms=None):
+        """
+        Capture and send until stop() (or for duration_ms).
+        """
+        started = ticks_ms()
+        self.start()
+        try:
+            while self.running:
+                if not self.pump():
+                    await asyncio.sleep(period_ms / 1000)
+                else:
+                    await asyncio.sleep(0)
+                if duration_ms is not None and ticks_diff(ticks_ms(), started) >= duration_ms:
+                    break
+        finally:
+            self.stop()
@@ -0,0 +1,75 @@
+from compat import ticks_ms, ticks_diff
+
+
+class CodeEntrySession:
+    """
+    One outdoor code being entered on the rotary dial.
+    Each digit is the number of detents turned in one direction (10 wraps to 0); reversing the direction
+    ends the digit. If no edge arrives for digit_timeout_ms the half-entered code is dropped.
+    Attributes:
+        start(int): ticks_ms of the first edge of this code, None when idle.
+        last_edge(int): ticks_ms of the latest edge.
+        digits(list): Digits completed so far.
+    """
+
+    def __init__(self, length=4, digit_timeout_ms=30000, clock=ticks_ms):
+        self.length = length
+        self.digit_timeout_ms = digit_timeout_ms
+        self.clock = clock
+        self.abort_count = 0
+        self._reset()
+
+    def abort(self):
+        """
+        Drop the code being entered, e.g. after a timeout.
+        """
+        if self.start is not None:
+            self.abort_count += 1
+        self._reset()
+
+    def _reset(self):
+        self.start = None
+        self.last_edge = None
+        self.digits = []
+        self._direction = None
+        self._count = 0
+
+    def active(self):
+        return self.start is not None
+
+    def expired(self, now=None):
+        if self.start is None:
+            return False
+        if now is None:
+            now = self.clock()
+        return ticks_diff(now, self.last_edge) > self.digit_timeout_ms
+
+    def feed(self, delta, now=None):
+        """
+        Feed one rotary step.
+        :param delta: Step from the encoder, the sign gives the direction.
+        :param now: ticks_ms of the edge, defaults to the clock.
+        :return: The complete code as a string once `length` digits are in, otherwise None.
+        """
+        if now is None:
+            now = self.clock()
+        if self.expired(now):
+            self.abort()
+        if self.start is None:
+            self.start = now
+        self.last_edge = now
+        direction = 1 if delta > 0 else -1
+        if direction == self._direction:
+            self._count += 1
+            if self._count == 10:
+                self._count = 0
+        else:
+            if self._direction is not None:
+                self.digits.append(self._count)
+            self._count = 1
+            self._direction = direction
+        if len(self.digits) == self.length:
+            code = ''.join(map(str, self.digits))
+            self._reset()
+            return code
+        return None
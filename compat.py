@@ -0,0 +1,33 @@
+"""
+Helpers that exist in MicroPython but not in CPython, so that the pure-Python modules can also be
+imported on a PC for benchmarks.
+"""
+try:
+    from micropython import const
+except ImportError:
+    def const(value):
+        return value
+
+try:
+    from time import ticks_ms, ticks_us, ticks_diff, ticks_add, sleep_ms
+except ImportError:
+    import time as _time
+
+    _TICKS_PERIOD = 1 << 30
+    _TICKS_HALF_PERIOD = _TICKS_PERIOD >> 1
+
+    def sleep_ms(ms):
+        _time.sleep(ms / 1000)
+
+    def ticks_ms():
+        return int(_time.monotonic() * 1000) & (_TICKS_PERIOD - 1)
+
+    def ticks_us():
+        return int(_time.monotonic() * 1000000) & (_TICKS_PERIOD - 1)
+
+    def ticks_add(ticks, delta):
+        return (ticks + delta) & (_TICKS_PERIOD - 1)
+
+    def ticks_diff(ticks1, ticks2):
+        diff = (ticks1 - ticks2) & (_TICKS_PERIOD - 1)
+        return diff - _TICKS_PERIOD if diff >= _TICKS_HALF_PERIOD else diff
@@ -1,6 +1,7 @@
 import time
 from machine import UART, Pin
 import struct
+from fpm_codec import FrameCodec, CMD_AUTO_ENROLL, CMD_DELETE_CHAR, CMD_READ_INDEX_TABLE
 
 HEADER = b"\xEF\x01"
 DEVICE_ADDR = b"\xFF\xFF\xFF\xFF"
@@ -22,6 +23,10 @@ REGISTER_VERIFY_VALUE = None
 GRANT_FINGER = b'\x08\x00\x05'
 # REGISTER_FINALL_CMD = REGISTER_FINGER_HEADER + REGISTER_FINGER_ID + REGISTER_TAIL + REGISTER_VERIFY_VALUE
 SENSOR_STAT = b"\xEF\x01\xFF\xFF\xFF\xFF\x01\x00\x03\x36\x00\x3A"
+READ_TIMEOUT_MS = 1000  # 普通指令的应答超时
+REGISTER_TIMEOUT_MS = 10000  # 自动注册/搜索时等待手指的超时
+INDEX_TABLE_PAGES = 1  # 每页索引表32字节, 对应256个指纹ID
+FIRST_FINGER_ID = 1  # 与原来按已存数量加一分配的编号保持一致, 不使用0号
 TIME_STAMP = time.time()
 PASTTIME = 0
 
@@ -30,7 +35,14 @@ PASTTIME = 0
 
 
 class FINGER:
-    def __init__(self, uart=1, rx=5, tx=17, freq=57600, en=16):
+    """
+    Attributes:
+        index_table(bytearray): Occupied slots of the fingerprint library, one bit per ID (LSB first), read
+            from the module with ReadIndexTable on first use and kept in sync on enroll/delete.
+        data_base(UserDatabase): Optional, maps fingerprint IDs to users (the 'fingers' field).
+    """
+    
+    def __init__(self, uart=1, rx=5, tx=17, freq=57600, en=16, data_base=None):
         self.rx = rx  # yellow wire is rx
         self.tx = tx  # black wire is tx
         self.uart = uart
@@ -40,6 +52,9 @@ class FINGER:
         self.en = en
         self.en_pin = Pin(self.en, Pin.OUT)
         self.en_pin.value(1)
+        self.codec = FrameCodec()
+        self.index_table = None
+        self.data_base = data_base
         self.open_model()
         
     def open_model(self):
@@ -49,11 +64,22 @@ class FINGER:
         self.en_pin.value(1)
     
     def write_cmd(self, cmd):
+        available = self.finger_uart.any()
+        if available:
+            # 丢弃上一条指令残留的应答, 以免被当作本次应答; 不带长度的 read() 会等到串口 timeout
+            self.finger_uart.read(available)
         self.finger_uart.write(cmd)
-        time.sleep(0.1)
     
-    def read_cmd(self):
-        return (self.finger_uart.read())
+    def read_cmd(self, timeout_ms=READ_TIMEOUT_MS):
+        """
+        Wait for one complete reply frame and return it as bytes, None if nothing arrived in time.
+        A frame with a bad checksum raises ValueError.
+        """
+        count = self.codec.read_frame(self.finger_uart, timeout_ms)
+        if count is None:
+            return None
+        self.codec.decode(count)
+        return bytes(self.codec.rx_view[:count])
     
     def calibrate_spawn(self, calibrate_value):
         try:
@@ -68,7 +94,6 @@ class FINGER:
     def query_savednum(self):
         try:
             self.write_cmd(FINGERPRINT_NUMBER)
-            time.sleep(0.001)
             callback = int.from_bytes(self.read_cmd()[10:12], "big")
             return callback
         except BaseException as e:
@@ -77,7 +102,6 @@ class FINGER:
     def query_sensorstat(self):
         try:
             self.write_cmd(SENSOR_STAT)
-            time.sleep(0.01)
             stat = self.read_cmd()
             if stat is None:
                 return False
@@ -86,20 +110,97 @@ class FINGER:
         except BaseException as e:
             return "sensor_stat error"
     
-    def register_fingerprinter(self):
-        
-        register_cmd = REGISTER_FINGER_HEADER + self.finger_print_nextnum() + REGISTER_TAIL + self.spawn_finger_sumverify()
-        print(register_cmd)
+    def load_index_table(self, pages=INDEX_TABLE_PAGES):
+        """
+        Read which library slots hold a template (ReadIndexTable), one UART round trip per 256 IDs.
+        """
+        table = bytearray(32 * pages)
+        for page in range(pages):
+            self.write_cmd(self.codec.encode(CMD_READ_INDEX_TABLE, 'B', page))
+            callback = self.read_cmd()
+            if callback is None or callback[9] != 0:
+                raise OSError('ReadIndexTable failed')
+            table[page * 32:page * 32 + 32] = callback[10:42]
+        self.index_table = table
+        return table
+    
+    def id_used(self, finger_id):
+        if self.index_table is None:
+            self.load_index_table()
+        return bool(self.index_table[finger_id >> 3] & (1 << (finger_id & 7)))
+    
+    def _mark_id(self, finger_id, used):
+        if self.index_table is None:
+            return
+        if used:
+            self.index_table[finger_id >> 3] |= 1 << (finger_id & 7)
+        else:
+            self.index_table[finger_id >> 3] &= ~(1 << (finger_id & 7)) & 0xff
+    
+    def allocate_id(self):
+        """
+        Lowest free library ID (gaps left by deleted templates are reused), None if the library is full.
+        The ID is only marked as used once a template has been stored there.
+        """
+        if self.index_table is None:
+            self.load_index_table()
+        for i in range(FIRST_FINGER_ID >> 3, len(self.index_table)):
+            byte = self.index_table[i]
+            if byte == 0xff:
+                continue
+            for bit in range(8):
+                finger_id = (i << 3) | bit
+                if finger_id >= FIRST_FINGER_ID and not byte & (1 << bit):
+                    return finger_id
+        return None
+    
+    def register_fingerprinter(self, username=None):
+        """
+        Enroll a finger into the lowest free ID.
+        :param username: If given (and data_base is set), the new ID is added to this user's fingers.
+        :return: The new ID, None if the enrollment failed.
+        """
+        finger_id = self.allocate_id()
+        if finger_id is None:
+            return None
+        register_cmd = self.codec.encode(CMD_AUTO_ENROLL, 'HBH', finger_id, 4, 0x002A)
+        print(bytes(register_cmd))
         self.write_cmd(register_cmd)
-        time.sleep(3)
+        while True:
+            callback = self.read_cmd(REGISTER_TIMEOUT_MS)
+            print(callback)
+            # 出错或者到达存储模板步骤(param2 = f2)时结束
+            if callback is None or callback[9] != 0:
+                return None
+            if callback[11] == 0xf2:
+                break
+        self._mark_id(finger_id, True)
+        if username is not None and self.data_base is not None:
+            self.data_base.add_finger(username, finger_id)
+        return finger_id
+    
+    def delete_fingerprinter(self, finger_id):
+        """
+        Delete one template (DeletChar) and free its ID, also in the user data.
+        """
+        self.write_cmd(self.codec.encode(CMD_DELETE_CHAR, 'HH', finger_id, 1))
         callback = self.read_cmd()
-        print(callback)
+        if callback is None or callback[9] != 0:
+            return False
+        self._mark_id(finger_id, False)
+        if self.data_base is not None:
+            self.data_base.remove_finger(finger_id)
+        return True
     
     def search_fingerprinter(self):
         self.write_cmd(SEARCH_FINGER)
         try:
-            callback = self.read_cmd()
-            # print(callback)
+            while True:
+                callback = self.read_cmd(REGISTER_TIMEOUT_MS)
+                # print(callback)
+                # 出错或者到达搜索步骤(param = 05)时结束
+                if callback[9] != 0 or callback[10] == 0x05:
+                    break
             ifgrant = callback[8:11]
             finger_id = callback[11:13]
             return ifgrant, finger_id
@@ -126,9 +227,7 @@ class FINGER:
     
     def finger_print_nextnum(self):
         try:
-            current_finger_num = int(self.query_savednum())
-            next_finger_id = current_finger_num + 1
-            return b"\x00" + struct.pack("B", next_finger_id)
+            return struct.pack(">H", self.allocate_id())
         except BaseException as e:
             return "finger_print_nextnum error"
     
@@ -145,10 +244,19 @@ class FINGER:
         except BaseException as e:
             return "spawn_finger_sumverify error"
     
+    def verify_user(self):
+        """
+        Search the finger on the sensor and resolve it to a user through the fingers index of data_base.
+        :return: The user dict, None if the finger is unknown or not linked to a user.
+        """
+        result = self.verify_finger()
+        if self.data_base is None or len(result) != 4:
+            return None
+        return self.data_base.user_by_finger(int.from_bytes(result[0], "big"))
+    
     def breath_led(self):
         try:
             self.write_cmd(BREATH_LED)
-            time.sleep(0.001)
             self.read_cmd()
         except BaseException as e:
             return "breath_led error"
@@ -156,7 +264,6 @@ class FINGER:
     def red_led(self):
         try:
             self.write_cmd(RED_LED)
-            time.sleep(0.001)
             self.read_cmd()
         except BaseException as e:
             return "red_led error"
@@ -164,7 +271,6 @@ class FINGER:
     def blue_led(self):
         try:
             self.write_cmd(BLUE_LED)
-            time.sleep(0.001)
             self.read_cmd()
         except BaseException as e:
             return "blue_led error"
@@ -172,7 +278,6 @@ class FINGER:
     def green_led(self):
         try:
             self.write_cmd(GREEN_LED)
-            time.sleep(0.001)
             self.read_cmd()
         except BaseException as e:
             return "green_led error"
@@ -180,7 +285,6 @@ class FINGER:
     def off_led(self):
         try:
             self.write_cmd(OFF_LED)
-            time.sleep(0.001)
             self.read_cmd()
         except BaseException as e:
             return "off_led error"
@@ -0,0 +1,188 @@
+"""
+Packet codec for the FPM383C fingerprint module.
+A frame is  EF 01 | address(4) | pid(1) | length(2) | code(1) + params | checksum(2)  where length counts
+the code, the params and the checksum, and the checksum is the 16 bit sum of pid, length, code and params.
+Frames are packed with struct straight into a reusable buffer, replies are checked in place and unpacked
+into small namedtuples, so the driver never goes through hex strings.
+"""
+import struct
+from collections import namedtuple
+from compat import const, ticks_ms, ticks_diff, ticks_add, sleep_ms
+
+HEADER = b'\xef\x01'
+DEFAULT_ADDRESS = b'\xff\xff\xff\xff'
+
+PID_COMMAND = const(0x01)
+PID_DATA = const(0x02)
+PID_ACK = const(0x07)
+PID_END = const(0x08)
+
+CMD_DELETE_CHAR = const(0x0c)
+CMD_READ_SYS_PARA = const(0x0f)
+CMD_READ_INDEX_TABLE = const(0x1f)
+CMD_CANCEL = const(0x30)
+CMD_AUTO_ENROLL = const(0x31)
+CMD_AUTO_IDENTIFY = const(0x32)
+CMD_SLEEP = const(0x33)
+
+PREFIX_SIZE = const(9)  # header + address + pid + length
+MAX_FRAME_SIZE = const(64)
+ACK_SIZE = const(12)  # reply carrying only the confirmation code
+SYS_PARA_REPLY_SIZE = const(28)
+ENROLL_REPLY_SIZE = const(14)
+IDENTIFY_REPLY_SIZE = const(17)
+
+Reply = namedtuple('Reply', ('pid', 'code', 'size'))
+EnrollReply = namedtuple('EnrollReply', ('code', 'step', 'progress'))
+IdentifyReply = namedtuple('IdentifyReply', ('code', 'step', 'finger_id', 'score'))
+
+
+def checksum(buf, start, end):
+    return sum(buf[start:end]) & 0xffff
+
+
+def frame(code, fmt='', *args, address=DEFAULT_ADDRESS):
+    """
+    Build one command frame as bytes, for frames that are computed once and kept as constants.
+    """
+    codec = FrameCodec(address, PREFIX_SIZE + 3 + struct.calcsize('>' + fmt))
+    return bytes(codec.encode(code, fmt, *args))
+
+
+class FrameCodec:
+    """
+    Encodes commands into one transmit buffer and checks replies in one receive buffer, both
+    allocated once. encode() returns a memoryview of the transmit buffer that is only valid until
+    the next encode(); rx_view is the buffer to readinto() a reply before decoding it.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, size=MAX_FRAME_SIZE):
+        self.address = bytes(address)
+        self._address_word = struct.unpack('>I', self.address)[0]
+        self._formats = {}  # params 格式 -> (完整格式, 校验和位置), 每种命令只计算一次
+        self._tx = bytearray(size)
+        self._tx[0:2] = HEADER
+        self._tx[2:6] = self.address
+        self._tx_view = memoryview(self._tx)
+        self.rx = bytearray(size)
+        self.rx_view = memoryview(self.rx)
+        self.reset_frame()
+
+    def encode(self, code, fmt='', *args):
+        """
+        Pack a command frame.
+        :param code: Instruction code.
+        :param fmt: struct format of the params (big endian is implied), e.g. 'HBH'.
+        :return: memoryview of the frame in the transmit buffer.
+        """
+        layout = self._formats.get(fmt)
+        if layout is None:
+            layout = self._formats[fmt] = ('>BHB' + fmt, 10 + struct.calcsize('>' + fmt))
+        fmt, end = layout
+        struct.pack_into(fmt, self._tx, 6, PID_COMMAND, end - 7, code, *args)
+        struct.pack_into('>H', self._tx, end, checksum(self._tx_view, 6, end))
+        return self._tx_view[:end + 2]
+
+    def decode(self, count=None):
+        """
+        Validate the frame at the start of the receive buffer.
+        :param count: Number of bytes read into the buffer, defaults to the whole buffer.
+        :return: Reply(pid, code, size), size being the total frame length.
+        :raise ValueError: Bad header, address, length or checksum.
+        """
+        rx = self.rx
+        if count is None:
+            count = len(rx)
+        if count < PREFIX_SIZE + 3:
+            raise ValueError('short frame')
+        header, address, pid, length = struct.unpack_from('>HIBH', rx, 0)
+        if header != 0xef01:
+            raise ValueError('bad header')
+        if address != self._address_word:
+            raise ValueError('bad address')
+        end = PREFIX_SIZE + length - 2
+        if length < 3 or end + 2 > count:
+            raise ValueError('bad length')
+        if struct.unpack_from('>H', rx, end)[0] != checksum(self.rx_view, 6, end):
+            raise ValueError('bad checksum')
+        return Reply(pid, rx[PREFIX_SIZE], end + 2)
+
+    def enroll_reply(self, count=ENROLL_REPLY_SIZE):
+        self.decode(count)
+        return EnrollReply(*struct.unpack_from('>BBB', self.rx, PREFIX_SIZE))
+
+    def identify_reply(self, count=IDENTIFY_REPLY_SIZE):
+        self.decode(count)
+        return IdentifyReply(*struct.unpack_from('>BBHH', self.rx, PREFIX_SIZE))
+
+    def reset_frame(self):
+        """
+        Forget a partly received frame, e.g. before sending a new command.
+        """
+        self._count = 0
+        self._need = 2
+
+    def poll_frame(self, uart):
+        """
+        Move whatever uart has buffered into the receive buffer without waiting.
+        Bytes before an EF 01 header (e.g. the 0x55 sent at power up) are skipped.
+        Only the bytes uart.any() reports are read, so this also returns at once on a UART created
+        with a timeout.
+        :return: Size of the frame once one is complete, otherwise None (call again later).
+        """
+        view = self.rx_view
+        rx = self.rx
+        while True:
+            available = uart.any()
+            if not available:
+                return None
+            # 串口设置了 timeout 时, readinto 会等到凑够缓冲区长度, 所以只读已经到达的字节
+            end = self._count + min(available, self._need - self._count)
+            received = uart.readinto(view[self._count:end])
+            if not received:
+                return None
+            self._count += received
+            if self._count < self._need:
+                continue
+            if self._need == 2:
+                if rx[0] == 0xef and rx[1] == 0x01:
+                    self._need = PREFIX_SIZE
+                elif rx[1] == 0xef:
+                    rx[0] = 0xef
+                    self._count = 1
+                else:
+                    self._count = 0
+            elif self._need == PREFIX_SIZE:
+                self._need = PREFIX_SIZE + struct.unpack_from('>H', rx, 7)[0]
+                if self._need > len(rx) or self._need < PREFIX_SIZE + 3:
+                    self.reset_frame()  # 长度字段不可信, 重新找帧头
+            else:
+                size = self._count
+                self.reset_frame()
+                return size
+
+    def read_frame(self, uart, timeout_ms=1000):
+        """
+        Read exactly one frame from uart into the receive buffer, returning as soon as it is complete.
+        :return: Size of the frame, or None if no complete frame arrived before the deadline.
+        """
+        deadline = ticks_add(ticks_ms(), timeout_ms)
+        self.reset_frame()
+        while True:
+            size = self.poll_frame(uart)
+            if size is not None:
+                return size
+            if ticks_diff(deadline, ticks_ms()) <= 0:
+                return None
+            sleep_ms(1)
+
+    def params(self, reply):
+        """
+        memoryview of the params of a decoded reply (after the confirmation code, before the checksum).
+        """
+        return self.rx_view[PREFIX_SIZE + 1:reply.size - 2]
+
+
+READ_SYS_PARA_FRAME = frame(CMD_READ_SYS_PARA)
+CANCEL_FRAME = frame(CMD_CANCEL)
+SLEEP_FRAME = frame(CMD_SLEEP)
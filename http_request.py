@@ -0,0 +1,113 @@
+MAX_HEADER_SIZE = 2048
+MAX_BODY_SIZE = 1024
+
+_HEX_DIGITS = b'0123456789abcdefABCDEF'
+
+
+def parse_query(query):
+    params = {}
+    for pair in query.split('&'):
+        if pair:
+            key, _, value = pair.partition('=')
+            params[unquote(key)] = unquote(value)
+    return params
+
+
+def unquote(value):
+    if '%' not in value and '+' not in value:
+        return value
+    value = value.replace('+', ' ').encode()
+    parts = value.split(b'%')
+    result = bytearray(parts[0])
+    for part in parts[1:]:
+        # 只有紧跟两位十六进制数才是转义, int() 会接受 '-0'、' 1'、单个数字等, 不能直接用
+        if len(part) >= 2 and part[0] in _HEX_DIGITS and part[1] in _HEX_DIGITS:
+            result.append(int(part[:2], 16))
+            result.extend(part[2:])
+        else:
+            result.extend(b'%')
+            result.extend(part)
+    return bytes(result).decode()
+
+
+class HTTPRequest:
+    """
+    A parsed HTTP request.
+    Attributes:
+        method(str), path(str), query(str), version(str): From the request line, path without the query string.
+        headers(dict): Header names in lower case -> value.
+        body(bytes): Exactly Content-Length bytes of body.
+    """
+
+    def __init__(self, method, target, version, headers, body):
+        self.method = method
+        self.path, _, self.query = target.partition('?')
+        self.version = version
+        self.headers = headers
+        self.body = body
+
+    def args(self):
+        return parse_query(self.query)
+
+    def form(self):
+        return parse_query(self.body.decode())
+
+
+class RequestParser:
+    """
+    Incremental HTTP request parser.
+    Bytes are fed as they arrive from the socket, in pieces of any size; feed() returns True once the
+    headers and exactly Content-Length body bytes have been received, after which `request` is set.
+    Requests larger than the limits, or malformed ones, raise ValueError.
+    """
+
+    def __init__(self, max_header_size=MAX_HEADER_SIZE, max_body_size=MAX_BODY_SIZE):
+        self.max_header_size = max_header_size
+        self.max_body_size = max_body_size
+        self.request = None
+        self._buffer = b''
+        self._head = None
+        self._content_length = 0
+
+    def feed(self, data):
+        if self.request is not None:
+            return True
+        start = len(self._buffer) - 3
+        self._buffer += data
+        if self._head is None:
+            end = self._buffer.find(b'\r\n\r\n', start if start > 0 else 0)
+            if end < 0:
+                # 头部正好达到上限时, 结尾 \r\n\r\n 的前 3 个字节可能已经到了
+                if len(self._buffer) > self.max_header_size + 3:
+                    raise ValueError('request header too large')
+                return False
+            if end > self.max_header_size:
+                raise ValueError('request header too large')
+            self._head = self._parse_head(self._buffer[:end])
+            self._buffer = self._buffer[end + 4:]
+        if len(self._buffer) < self._content_length:
+            return False
+        method, target, version, headers = self._head
+        self.request = HTTPRequest(method, target, version, headers, self._buffer[:self._content_length])
+        self._buffer = None
+        return True
+
+    def _parse_head(self, head):
+        lines = head.decode().split('\r\n')
+        request_parts = lines[0].split(' ')
+        if len(request_parts) != 3:
+            raise ValueError('bad request line')
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(':')
+            if not sep:
+                raise ValueError('bad header line')
+            headers[name.strip().lower()] = value.strip()
+        content_length = headers.get('content-length', '0')
+        # 只接受十进制数字, int() 还会接受 '+5'、'1_0' 等写法
+        if not content_length.isdigit():
+            raise ValueError('bad content-length')
+        self._content_length = int(content_length)
+        if self._content_length > self.max_body_size:
+            raise ValueError('request body too large')
+        return request_parts[0], request_parts[1], request_parts[2], headers
@@ -0,0 +1,64 @@
+from compat import ticks_ms, ticks_add, ticks_diff
+
+
+class LockActuator:
+    """
+    Drives the lock pin for every unlock path (web, indoor button page, rotary code).
+    open() returns immediately: the pin is released by a one-shot machine.Timer, so nothing sleeps while
+    the door is held open. An open() while the lock is already open only extends the hold deadline.
+    Attributes:
+        pin(Pin): Lock output, high to open.
+        timer(Timer): One-shot timer used for the release.
+        hold_ms(int): Default hold time.
+    """
+
+    def __init__(self, pin, timer, hold_ms=3000):
+        self.pin = pin
+        self.timer = timer
+        self.hold_ms = hold_ms
+        self.open_count = 0
+        self._deadline = None
+        self._on_release = None
+        self.pin.value(0)
+
+    def is_open(self):
+        return self._deadline is not None
+
+    def open(self, hold_ms=None, on_release=None):
+        """
+        Open the lock (or keep it open) for at least hold_ms from now.
+        :param on_release: Called once from the timer callback when the lock closes again.
+        """
+        now = ticks_ms()
+        deadline = ticks_add(now, self.hold_ms if hold_ms is None else hold_ms)
+        if self._deadline is None or ticks_diff(deadline, self._deadline) > 0:
+            self._deadline = deadline
+        if on_release is not None:
+            self._on_release = on_release
+        self.open_count += 1
+        self.pin.value(1)
+        self._arm(ticks_diff(self._deadline, now))
+
+    def close(self):
+        self.timer.deinit()
+        self._release()
+
+    def _arm(self, period):
+        self.timer.init(mode=self.timer.ONE_SHOT, period=max(1, period), callback=self._expire)
+
+    def _expire(self, timer):
+        if self._deadline is None:
+            return
+        remaining = ticks_diff(self._deadline, ticks_ms())
+        if remaining > 0:
+            self._arm(remaining)
+        else:
+            self._release()
+
+    def _release(self):
+        self.pin.value(0)
+        self._deadline = None
+        on_release = self._on_release
+        self._on_release = None
+        if on_release is not None:
+            on_release()
@@ -1,129 +1,63 @@
-from machine import Pin, UART, RTC
+from machine import Pin, UART, RTC, Timer
 import time
 import network
-import socket
-import ujson
-import _thread
 from rotary_irq_esp import RotaryIRQ
-import os
-import ntptime
 import Player
+from user_database import UserDatabase
+from access_log import AccessLog
+from timekeeper import TimeKeeper
+from lock_actuator import LockActuator
+from code_entry import CodeEntrySession
+from rate_limit import RateLimiter
+from http_request import RequestParser
+from router import Router
+from static_pages import StaticPages
+import pages
 
-lock = Pin(15, Pin.OUT)
-lock.value(0)
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+lock = LockActuator(Pin(15, Pin.OUT), Timer(0), hold_ms=3000)
 rtc = RTC()
+access_log = AccessLog()
+timekeeper = TimeKeeper(rtc)
+# 密码错误过多时在查库之前拒绝. 网页按客户端IP计数;
+# 旋钮单独一张表, 否则足够多的不同IP会把 'rotary' 挤出表, 清掉它的锁定和退避
+limiter = RateLimiter(size=16, burst=5, refill_ms=60000, lockout_ms=30000)
+rotary_limiter = RateLimiter(size=1, burst=5, refill_ms=60000, lockout_ms=30000)
 
+REQUEST_TIMEOUT = 5  # 秒, 读取请求与发送响应的超时
 
-def time_sync(timeoffset=8 * 3600):
-    try:
-        ntptime.settime()
-    except OSError:
-        pass
-    timestamp = time.time()
-    print(time.localtime(timestamp))
-    time_now = time.localtime(timestamp + timeoffset)
-    print(time_now)
-    rtc.datetime(
-        (time_now[0], time_now[1], time_now[2], time_now[6] + 1, time_now[3], time_now[4], time_now[5], time_now[7])
-    )
+RECORD_PAGE_LIMIT = 50
+RECORD_PAGE_MAX_LIMIT = 300
+RECORD_CHUNK_SIZE = 1024
+RECORD_UNLOCK_TYPES = ('WLAN', 'rotary', 'indoor')
 
 
-def write_record(record):
-    try:
-        time_sync()
-    except OSError:
-        pass
-    _file_name = 'record.txt'
-    with open(_file_name, 'r') as file:
-        lines = file.readlines()
-    
-    if len(lines) == 300:
-        with open(_file_name, 'w') as file:
-            file.writelines(lines[1:])
-    
-    with open(_file_name, 'a') as file:
-        file.write(str(rtc.datetime())+record+'\n')
+def peer_address(writer):
+    peername = writer.get_extra_info('peername')
+    return peername[0] if peername else 'unknown'
 
 
-class UserDatabase:
-    def __init__(self, file_name='Userdata.json'):
-        self.file_name = file_name
-        try:
-            with open(file_name, 'r') as f:
-                self.data = ujson.load(f)
-        except (OSError, ValueError):
-            self.data = {}
-    
-    def save(self):
-        with open(self.file_name, 'w') as f:
-            ujson.dump(self.data, f)
-    
-    def get_data(self):
-        return self.data
-    
-    def add_user(self, username, key, value):
-        if username not in self.data:
-            self.data[username][key] = value
-            self.save()
-            return True
-        else:
-            return False
-    
-    def get_user(self, username):
-        return self.data[username]
-    
-    def update_user(self, username, updated_data):
-        if username in self.data:
-            user_data = self.data[username]
-            user_data.update(updated_data)  # 更新用户数据
-            self.save()
-            return True
-        else:
-            return False
-    
-    def delete_user(self, username):
-        if username in self.data:
-            del self.data[username]
-            self.save()
-            return True
-        else:
-            return False
-    
-    def search_data(self, key, value):
-        for sub_dict in self.data:
-            if value == self.data[sub_dict][key]:
-                return self.data[sub_dict]
-        return None
+def write_record(record):
+    # 只读取RTC, 网络对时由服务器循环中的 timekeeper.poll() 放到后台线程进行
+    access_log.append(str(rtc.datetime())+record)
 
 
 class Server:
     def __init__(self):
-        self.all_user_data = None
-        self.current_reset_key = None
-        self.user_data = None
-        self.register_name = None
-        self.register_dict = {}
-        self.register_content = None
-        self.get_data = None
-        self.html_response = None
-        self.password = None
-        self.content_length = None
-        self.request_path = None
-        self.request_method = None
-        self.request_parts = None
-        
         self.db = UserDatabase()
         
         self.player = Player
+        self.player.watch(self.db)  # 预先编码所有用户的开门音乐指令, 用户变化时重建
         
-        try:
-            self.s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        except OSError:
-            pass
-        self.wlan = network.WLAN(network.STA_IF)
+        self.static_pages = StaticPages()
+        self.router = Router(self.not_found)
+        self.add_routes()
         
-        self.request_lines = ''
-        self.request_line = []
+        self.wlan = network.WLAN(network.STA_IF)
         
         if not self.wlan.active():
             self.wlan.active(True)
@@ -131,8 +65,7 @@ class Server:
         self.wlan.config(dhcp_hostname='LOCK')
         
         self.do_connect()
-        time_sync()
-        self.creat_server()
+        timekeeper.sync()
     
     def do_connect(self):
         if not self.wlan.isconnected():
@@ -142,716 +75,210 @@ class Server:
                 pass
         print('network config:', self.wlan.ifconfig())
     
-    def creat_server(self):
+    async def serve(self, port=80):
         if not self.wlan.isconnected():
             self.do_connect()
-        else:
-            self.s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.s.bind((self.wlan.ifconfig()[0], 80))
-            self.s.listen(5)
-            self.s.settimeout(1)
-            print('Successfully creat socket server!')
-    
-    def search_data(self, key, value):
-        for sub_dict in self.all_user_data:
-            if value == self.all_user_data[sub_dict][key]:
-                return self.all_user_data[sub_dict]
-        return None
+        await asyncio.start_server(self.handle_client, self.wlan.ifconfig()[0], port, backlog=5)
+        print('Successfully creat socket server!')
+        while True:
+            timekeeper.poll()
+            await asyncio.sleep(1)
     
-    def handle_request(self, conn, request):
-        self.request_lines = request.split('\r\n')
-        print('Request line' + str(self.request_lines))
-        
-        if len(self.request_lines) > 0:
-            self.request_line = self.request_lines[0]
-            self.request_parts = self.request_line.split(' ')
-        
-        if len(self.request_parts) == 3:
-            self.request_method = self.request_parts[0]
-            print('Request method:' + str(self.request_method))
-            self.request_path = self.request_parts[1]
-            print('Request path:' + str(self.request_path))
-            
-            if self.request_method == 'GET':
-                if self.request_path == '/password':
-                    # 返回输入密码界面
-                    self.html_response = '''HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n\r\n
-                                        <!DOCTYPE html>
-                                        <html lang="zh">
-                                        <head>
-                                          <meta name="viewport" content="width=device-width, initial-scale=1">
-                                          <style>
-                                            body {
-                                              display: flex;
-                                              flex-direction: column;
-                                              align-items: center;
-                                              justify-content: center;
-                                              height: 100vh;
-                                              margin: 0;
-                                              background-color: aquamarine;
-                                            }
-                                        
-                                            h1 {
-                                              text-align: center;
-                                            }
-                                        
-                                            form {
-                                              text-align: center;
-                                              max-width: 80%;
-                                              padding: 20px;
-                                              border: 1px solid #ccc;
-                                              border-radius: 5px;
-                                              box-shadow: 0 0 10px rgba(0, 0, 0, 0.2);
-                                              background-color: antiquewhite;
-                                            }
-                                        
-                                            label {
-                                              font-size: 18px;
-                                            }
-                                        
-                                            input[type="text"] {
-                                              width: 80%;
-                                              padding: 10px;
-                                              font-size: 16px;
-                                              border: 1px solid #ccc;
-                                              border-radius: 5px;
-                                            }
-                                        
-                                            input[type="checkbox"] {
-                                              width: 20px;
-                                              height: 20px;
-                                            }
-                                        
-                                            input[type="submit"] {
-                                              width: 80%;
-                                              padding: 10px;
-                                              font-size: 18px;
-                                              background-color: #007bff;
-                                              color: #fff;
-                                              border: none;
-                                              border-radius: 5px;
-                                              cursor: pointer;
-                                            }
-                                        
-                                            @media screen and (max-width: 600px) {
-                                              form {
-                                                max-width: 90%;
-                                              }
-                                            }
-                                          </style>
-                                          <title>423门锁</title>
-                                        </head>
-                                        <body>
-                                        <h1>欢迎使用网络钥匙</h1>
-                                        <form method="POST" action="/pwd">
-                                          <label>请输入密码</label>
-                                          <input type="text" id="password" name="password" pattern="[0-9]{6}" required placeholder="六位数字"><br><br>
-                                          <input type="checkbox" id="rememberMe" name="play" checked>
-                                          <label for="rememberMe">播放开门音效</label><br><br>
-                                          <input type="submit" value="提交">
-                                        </form>
-                                        </body>
-                                        </html>
-                                        '''
-                
-                elif self.request_path == '/indoor':
-                    self.html_response = """HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n\r\n
-                                        <!DOCTYPE html>
-                                        <html>
-                                        <head>
-                                          <meta name="viewport" content="width=device-width, initial-scale=1">
-                                          <style>
-                                            body {{
-                                              display: flex;
-                                              flex-direction: column;
-                                              align-items: center;
-                                              justify-content: center;
-                                              height: 100vh;
-                                              margin: 0;
-                                              background-color: aquamarine;
-                                            }}
-                                            h1 {{
-                                            text - align: center;
-                                              font-size: 24px;
-                                            }}
-                                            h2 {{
-                                            text - align: center;
-                                              font-size: 18px;
-                                            }}
-                                          </style>
-                                          <title>欢迎页面</title>
-                                        </head>
-                                        <body>
-                                          <h1>欢迎{}{}</h1>
-                                          <h2>请在提示音后拉门把手</h2>
-                                        </body>
-                                        </html>
-                                        """
-                    lock.value(1)
-                    write_record('+indoor+open')
-                    time.sleep(3)
-                    lock.value(0)
-                    self.player.play_music('00017')
-                
-                elif self.request_path == '/reset-password':
-                    self.html_response = """HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n\r\n
-                                        <!DOCTYPE html>
-                                        <html lang="zh">
-                                        <head>
-                                          <meta name="viewport" content="width=device-width, initial-scale=1">
-                                          <style>
-                                            body {
-                                              display: flex;
-                                              flex-direction: column;
-                                              align-items: center;
-                                              justify-content: center;
-                                              height: 100vh;
-                                              margin: 0;
-                                              background-color: aquamarine;
-                                            }
-                                        
-                                            h1 {
-                                              text-align: center;
-                                            }
-                                        
-                                            form {
-                                              text-align: center;
-                                              max-width: 80%;
-                                              padding: 20px;
-                                              border: 1px solid #ccc;
-                                              border-radius: 5px;
-                                              box-shadow: 0 0 10px rgba(0, 0, 0, 0.2);
-                                              background-color: antiquewhite;
-                                            }
-                                        
-                                            label {
-                                              font-size: 18px;
-                                            }
-                                        
-                                            input[type="text"] {
-                                              width: 80%;
-                                              padding: 10px;
-                                              font-size: 16px;
-                                              border: 1px solid #ccc;
-                                              border-radius: 5px;
-                                            }
-                                        
-                                            input[type="checkbox"] {
-                                              width: 20px;
-                                              height: 20px;
-                                            }
-                                        
-                                            input[type="submit"] {
-                                              width: 80%;
-                                              padding: 10px;
-                                              font-size: 18px;
-                                              background-color: #007bff;
-                                              color: #fff;
-                                              border: none;
-                                              border-radius: 5px;
-                                              cursor: pointer;
-                                            }
-                                        
-                                            @media screen and (max-width: 600px) {
-                                              form {
-                                                max-width: 90%;
-                                              }
-                                            }
-                                          </style>
-                                          <title>423门锁</title>
-                                        </head>
-                                        <body>
-                                        <h1>用户信息修改</h1>
-                                        <form method="POST" action="/reset-password">
-                                          <label>开锁密码修改</label>
-                                          <input type="text" id="JX" name="JX" pattern="[A-Z]*" required placeholder="请输入名称首字母大写"><br><br>
-                                          <input type="text" id="old-password" name="old-password" pattern="[0-9]{6}" required placeholder="请输入旧解锁密码(六位数字)"><br><br>
-                                          <input type="text" id="password" name="password" pattern="[0-9]{6}" required placeholder="请输入新解锁密码(六位数字)"><br><br>
-                                          <input type="submit" value="提交">
-                                        </form>
-                                        </body>
-                                        </html>
-                                        """
-                
-                elif self.request_path == '/reset-code_outdoor':
-                    self.html_response = """HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n\r\n
-                                        <!DOCTYPE html>
-                                        <html lang="zh">
-                                        <head>
-                                          <meta name="viewport" content="width=device-width, initial-scale=1">
-                                          <style>
-                                            body {
-                                              display: flex;
-                                              flex-direction: column;
-                                              align-items: center;
-                                              justify-content: center;
-                                              height: 100vh;
-                                              margin: 0;
-                                              background-color: aquamarine;
-                                            }
-
-                                            h1 {
-                                              text-align: center;
-                                            }
-
-                                            form {
-                                              text-align: center;
-                                              max-width: 80%;
-                                              padding: 20px;
-                                              border: 1px solid #ccc;
-                                              border-radius: 5px;
-                                              box-shadow: 0 0 10px rgba(0, 0, 0, 0.2);
-                                              background-color: antiquewhite;
-                                            }
-
-                                            label {
-                                              font-size: 18px;
-                                            }
-
-                                            input[type="text"] {
-                                              width: 80%;
-                                              padding: 10px;
-                                              font-size: 16px;
-                                              border: 1px solid #ccc;
-                                              border-radius: 5px;
-                                            }
-
-                                            input[type="checkbox"] {
-                                              width: 20px;
-                                              height: 20px;
-                                            }
-
-                                            input[type="submit"] {
-                                              width: 80%;
-                                              padding: 10px;
-                                              font-size: 18px;
-                                              background-color: #007bff;
-                                              color: #fff;
-                                              border: none;
-                                              border-radius: 5px;
-                                              cursor: pointer;
-                                            }
-
-                                            @media screen and (max-width: 600px) {
-                                              form {
-                                                max-width: 90%;
-                                              }
-                                            }
-                                          </style>
-                                          <title>423门锁</title>
-                                        </head>
-                                        <body>
-                                        <h1>用户信息修改</h1>
-                                        <form method="POST" action="/reset-code_outdoor">
-                                          <label>拨盘密码修改</label>
-                                          <input type="text" id="JX" name="JX" pattern="[A-Z]*" required placeholder="请输入名称首字母大写"><br><br>
-                                          <input type="text" id="old-code_outdoor" name="old-code_outdoor" pattern="[0-9]{4}" required placeholder="请输入旧拨盘密码(四位数字)"><br><br>
-                                          <input type="text" id="code_outdoor" name="code_outdoor" pattern="[0-9]{4}" required placeholder="请输入新拨盘密码(四位数字)"><br><br>
-                                          <input type="submit" value="提交">
-                                        </form>
-                                        </body>
-                                        </html>
-                                        """
-                
-                elif self.request_path == '/forget_password':
-                    self.html_response = """HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n\r\n
-                                        <!DOCTYPE html>
-                                        <html lang="zh">
-                                        <head>
-                                          <meta name="viewport" content="width=device-width, initial-scale=1">
-                                          <style>
-                                            body {
-                                              display: flex;
-                                              flex-direction: column;
-                                              align-items: center;
-                                              justify-content: center;
-                                              height: 100vh;
-                                              margin: 0;
-                                              background-color: aquamarine;
-                                            }
-
-                                            h1 {
-                                              text-align: center;
-                                            }
-
-                                            form {
-                                              text-align: center;
-                                              max-width: 80%;
-                                              padding: 20px;
-                                              border: 1px solid #ccc;
-                                              border-radius: 5px;
-                                              box-shadow: 0 0 10px rgba(0, 0, 0, 0.2);
-                                              background-color: antiquewhite;
-                                            }
-
-                                            label {
-                                              font-size: 18px;
-                                            }
-
-                                            input[type="text"] {
-                                              width: 80%;
-                                              padding: 10px;
-                                              font-size: 16px;
-                                              border: 1px solid #ccc;
-                                              border-radius: 5px;
-                                            }
-
-                                            input[type="checkbox"] {
-                                              width: 20px;
-                                              height: 20px;
-                                            }
-
-                                            input[type="submit"] {
-                                              width: 80%;
-                                              padding: 10px;
-                                              font-size: 18px;
-                                              background-color: #007bff;
-                                              color: #fff;
-                                              border: none;
-                                              border-radius: 5px;
-                                              cursor: pointer;
-                                            }
-
-                                            @media screen and (max-width: 600px) {
-                                              form {
-                                                max-width: 90%;
-                                              }
-                                            }
-                                          </style>
-                                          <title>423门锁</title>
-                                        </head>
-                                        <body>
-                                        <h1>用户信息找回</h1>
-                                        <form method="POST" action="/get-password">
-                                          <label>找回密码</label>
-                                          <input type="text" id="JX" name="JX" pattern="[A-Z]*" required placeholder="请输入名称首字母大写"><br><br>
-                                          <input type="text" id="ID" name="ID" required placeholder="请输入身份ID"><br><br>
-                                          <input type="submit" value="提交">
-                                        </form>
-                                        </body>
-                                        </html>
-                                        """
-
-                elif self.request_path == '/record':
-                    with open('record.txt', 'r') as record_file:
-                        record_lines = record_file.readlines()
-                    self.html_response = """HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n\r\n
-                                                            <!DOCTYPE html>
-                                                            <html lang="zh">
-                                                            <head><title>开锁记录</title>
-                                                            </head>
-                                                            <body>
-                                                            <h1>开锁记录</h1>
-                                                            <table border='1'><tr><th>时间记录</th><th>解锁方式</th><th>操作员</th></tr>
-                                        """
-                    for line in record_lines:
-                        timestamp, unlock_type, operator = line.strip().split('+')
-                        self.html_response += f"<tr><td>{timestamp}</td><td>{unlock_type}</td><td>{operator}</td></tr>"
-                    self.html_response += "</table></body></html>"
-                
-                elif self.request_path == '/time':
-                    self.html_response = """HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n\r\n
-                                            <!DOCTYPE html>
-                                            <html>
-                                            <head>
-                                              <meta name="viewport" content="width=device-width, initial-scale=1">
-                                              <style>
-                                                body {{
-                                                  display: flex;
-                                                  flex-direction: column;
-                                                  align-items: center;
-                                                  justify-content: center;
-                                                  height: 100vh;
-                                                  margin: 0;
-                                                  background-color: aquamarine;
-                                                }}
-                                                h1 {{
-                                                text - align: center;
-                                                  font-size: 24px;
-                                                }}
-                                                h2 {{
-                                                text - align: center;
-                                                  font-size: 18px;
-                                                }}
-                                              </style>
-                                              <title>错误页面</title>
-                                            </head>
-                                            <body>
-                                              <h1>当前系统时间为：</h1>
-                                              <h2>{}</h2>
-                                            </body>
-                                            </html>
-                                            """.format(str(time.localtime()))
-                
-                else:
-                    self.html_response = """HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n\r\n
-                                            <!DOCTYPE html>
-                                            <html>
-                                            <head>
-                                              <meta name="viewport" content="width=device-width, initial-scale=1">
-                                              <style>
-                                                body {{
-                                                  display: flex;
-                                                  flex-direction: column;
-                                                  align-items: center;
-                                                  justify-content: center;
-                                                  height: 100vh;
-                                                  margin: 0;
-                                                  background-color: aquamarine;
-                                                }}
-                                                h1 {{
-                                                text - align: center;
-                                                  font-size: 24px;
-                                                }}
-                                                h2 {{
-                                                text - align: center;
-                                                  font-size: 18px;
-                                                }}
-                                              </style>
-                                              <title>错误页面</title>
-                                            </head>
-                                            <body>
-                                              <h1>您访问的页面不存在</h1>
-                                              <h2>请联系管理员</h2>
-                                            </body>
-                                            </html>
-                                            """
-                try:
-                    conn.send(self.html_response)
-                except ValueError:
-                    pass
-                finally:
-                    conn.close()
-            elif self.request_method == 'POST':
-                self.content_length = 0
-                for line in self.request_lines:
-                    if 'Content-Length' in line:
-                        self.content_length = int(line.split(': ')[1])
-                        break
-                
-                if self.request_path == '/pwd':
-                    if self.content_length > 0:
-                        self.password = self.request_lines[-1].split('&')[0].split('=')[1]
-                        self.get_data = self.db.search_data('password', self.password)
-                        if self.get_data is not None:
-                            self.html_response = """HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n\r\n
-                                                <!DOCTYPE html>
-                                                <html>
-                                                <head>
-                                                  <meta name="viewport" content="width=device-width, initial-scale=1">
-                                                  <style>
-                                                    body {{
-                                                      display: flex;
-                                                      flex-direction: column;
-                                                      align-items: center;
-                                                      justify-content: center;
-                                                      height: 100vh;
-                                                      margin: 0;
-                                                      background-color: aquamarine;
-                                                    }}
-                                                    h1 {{
-                                                    text - align: center;
-                                                      font-size: 24px;
-                                                    }}
-                                                    h2 {{
-                                                    text - align: center;
-                                                      font-size: 18px;
-                                                    }}
-                                                  </style>
-                                                  <title>欢迎页面</title>
-                                                </head>
-                                                <body>
-                                                  <h1>欢迎{}{}</h1>
-                                                  <h2>请在提示音后拉门把手</h2>
-                                                </body>
-                                                </html>
-                                                """.format(self.get_data['level'], self.get_data['name'])
-                            conn.send(self.html_response)
-                            conn.close()
-                            if 'on' in self.request_lines[-1]:
-                                self.player.play_music(self.get_data['dooring'])
-                            lock.value(1)
-                            write_record('+WLAN+'+self.get_data['name'])
-                            time.sleep(3)
-                            lock.value(0)
-                        else:
-                            self.html_response = """HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n\r\n
-                                                <!DOCTYPE html>
-                                                <html>
-                                                <head>
-                                                  <meta name="viewport" content="width=device-width, initial-scale=1">
-                                                  <style>
-                                                    body {{
-                                                      display: flex;
-                                                      flex-direction: column;
-                                                      align-items: center;
-                                                      justify-content: center;
-                                                      height: 100vh;
-                                                      margin: 0;
-                                                      background-color: aquamarine;
-                                                    }}
-                                                    h1 {{
-                                                    text - align: center;
-                                                      font-size: 24px;
-                                                    }}
-                                                    h2 {{
-                                                    text - align: center;
-                                                      font-size: 18px;
-                                                    }}
-                                                  </style>
-                                                  <title>错误页面</title>
-                                                </head>
-                                                <body>
-                                                  <h1>您的密码输入有误！</h1>
-                                                  <h2>请检查后重新输入！</h2>
-                                                </body>
-                                                </html>
-                                                """
-                else:
-                    self.register_content = self.request_lines[-1]
-                    print(self.register_content)
-                    self.register_name = self.register_content[
-                                         self.register_content.find('=') + 1:self.register_content.find('&')]
-                    self.register_dict = eval(
-                        '{"' + self.register_content[self.register_content.find('&') + 1:].replace('&',
-                                                                                                   '","').replace(
-                            '=', '":"') + '"}')
-                    print(self.register_dict)
-                    self.user_data = self.db.get_user(self.register_name)
-                    if 'reset' in self.request_path:
-                        self.current_reset_key = self.request_path.split('-')[1]
-                        if self.user_data[self.current_reset_key] != self.register_dict[
-                            'old-' + self.current_reset_key]:
-                            self.html_response = """HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n\r\n
-                                                <!DOCTYPE html>
-                                                <html>
-                                                <head>
-                                                  <meta name="viewport" content="width=device-width, initial-scale=1">
-                                                  <style>
-                                                    body {{
-                                                      display: flex;
-                                                      flex-direction: column;
-                                                      align-items: center;
-                                                      justify-content: center;
-                                                      height: 100vh;
-                                                      margin: 0;
-                                                      background-color: aquamarine;
-                                                    }}
-                                                    h1 {{
-                                                    text - align: center;
-                                                      font-size: 24px;
-                                                    }}
-                                                    h2 {{
-                                                    text - align: center;
-                                                      font-size: 18px;
-                                                    }}
-                                                  </style>
-                                                  <title>错误页面</title>
-                                                </head>
-                                                <body>
-                                                  <h1>您的密码输入有误！</h1>
-                                                  <h2>请检查后重新输入！</h2>
-                                                </body>
-                                                </html>
-                                                """
-                        else:
-                            self.user_data[self.current_reset_key] = self.register_dict[self.current_reset_key]
-                            self.db.update_user(self.register_name, self.user_data)
-                            self.html_response = """HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n\r\n
-                                                <!DOCTYPE html>
-                                                <html>
-                                                <head>
-                                                  <meta name="viewport" content="width=device-width, initial-scale=1">
-                                                  <style>
-                                                    body {{
-                                                      display: flex;
-                                                      flex-direction: column;
-                                                      align-items: center;
-                                                      justify-content: center;
-                                                      height: 100vh;
-                                                      margin: 0;
-                                                      background-color: aquamarine;
-                                                    }}
-                                                    h1 {{
-                                                    text - align: center;
-                                                      font-size: 24px;
-                                                    }}
-                                                    h2 {{
-                                                    text - align: center;
-                                                      font-size: 18px;
-                                                    }}
-                                                  </style>
-                                                  <title>修改页面</title>
-                                                </head>
-                                                <body>
-                                                  <h1>修改密码成功</h1>
-                                                </body>
-                                                </html>
-                                                """
-                    
-                    elif self.request_path == '/get-password':
-                        if self.register_dict['ID'] == self.user_data["ID"]:
-                            self.html_response = """HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n\r\n
-                                                <!DOCTYPE html>
-                                                <html>
-                                                <head>
-                                                  <meta name="viewport" content="width=device-width, initial-scale=1">
-                                                  <style>
-                                                    body {{
-                                                      display: flex;
-                                                      flex-direction: column;
-                                                      align-items: center;
-                                                      justify-content: center;
-                                                      height: 100vh;
-                                                      margin: 0;
-                                                      background-color: aquamarine;
-                                                    }}
-                                                    h1 {{
-                                                    text - align: center;
-                                                      font-size: 24px;
-                                                    }}
-                                                    h2 {{
-                                                    text - align: center;
-                                                      font-size: 18px;
-                                                    }}
-                                                  </style>
-                                                  <title>密码找回</title>
-                                                </head>
-                                                <body>
-                                                  <h1>欢迎{}{}</h1>
-                                                  <h2>您的开锁密码{}</h2>
-                                                  <h2>您的拨盘密码{}</h2>
-                                                </body>
-                                                </html>
-                                                """.format(self.user_data['level'],
-                                                           self.user_data['name'],
-                                                           self.user_data['password'],
-                                                           self.user_data['code_outdoor'])
-                try:
-                    conn.send(self.html_response)
-                except ValueError:
-                    pass
-                finally:
-                    conn.close()
-
-    def server_loop(self):
+    async def read_request(self, reader):
+        parser = RequestParser()
         while True:
+            data = await reader.read(512)
+            if not data:
+                raise OSError('connection closed')
+            if parser.feed(data):
+                return parser.request
+    
+    async def handle_client(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(self.read_request(reader), REQUEST_TIMEOUT)
+            await self.handle_request(writer, request)
+        except (OSError, ValueError, KeyError, asyncio.TimeoutError):
+            pass
+        finally:
             try:
-                conn, addr = self.s.accept()
-                request_data = conn.recv(1024).decode('utf-8')
-                self.handle_request(conn, request_data)
+                writer.close()
+                await writer.wait_closed()
             except OSError:
                 pass
+    
+    async def send(self, writer, data):
+        writer.write(data.encode() if isinstance(data, str) else data)
+        await asyncio.wait_for(writer.drain(), REQUEST_TIMEOUT)
+    
+    async def render(self, writer, template, values=None):
+        template.write(writer, values)
+        await asyncio.wait_for(writer.drain(), REQUEST_TIMEOUT)
+    
+    def search_data(self, key, value):
+        return self.db.search_data(key, value)
+    
+    def record_page(self, page=1, limit=RECORD_PAGE_LIMIT, unlock_type=None, chunk_size=RECORD_CHUNK_SIZE):
+        """
+        Generate the /record page in chunks of about chunk_size bytes.
+        :param page: Page number, starting at 1.
+        :param limit: Records per page.
+        :param unlock_type: Only show records of this unlock type (WLAN, rotary or indoor).
+        """
+        yield """HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n\r\n
+                <!DOCTYPE html>
+                <html lang="zh">
+                <head><title>开锁记录</title>
+                <meta name="viewport" content="width=device-width, initial-scale=1">
+                </head>
+                <body>
+                <h1>开锁记录</h1>
+                <table border='1'><tr><th>时间记录</th><th>解锁方式</th><th>操作员</th></tr>
+                """
+        skip = (page - 1) * limit
+        shown = 0
+        has_next = False
+        rows = []
+        size = 0
+        for line in access_log.records():
+            parts = line.split('+')
+            if len(parts) != 3 or (unlock_type and parts[1] != unlock_type):
+                continue
+            if skip:
+                skip -= 1
+                continue
+            if shown == limit:
+                has_next = True
+                break
+            row = '<tr><td>{}</td><td>{}</td><td>{}</td></tr>'.format(parts[0], parts[1], parts[2])
+            rows.append(row)
+            size += len(row)
+            shown += 1
+            if size >= chunk_size:
+                yield ''.join(rows)
+                rows = []
+                size = 0
+        if rows:
+            yield ''.join(rows)
+        type_query = '&type=' + unlock_type if unlock_type else ''
+        nav = '</table><p>'
+        if page > 1:
+            nav += '<a href="/record?page={}&limit={}{}">上一页</a> '.format(page - 1, limit, type_query)
+        if has_next:
+            nav += '<a href="/record?page={}&limit={}{}">下一页</a>'.format(page + 1, limit, type_query)
+        yield nav + '</p></body></html>'
+
+    def add_routes(self):
+        # /password, /reset-password, /reset-code_outdoor, /forget_password
+        for path in self.static_pages.pages:
+            self.router.add('GET', path, self.static_pages.handler(path, self.send))
+        self.router.add('GET', '/indoor', self.indoor)
+        self.router.add('GET', '/record', self.record)
+        self.router.add('GET', '/time', self.system_time)
+        self.router.add('GET', '/metrics', self.metrics)
+        self.router.add('POST', '/pwd', self.pwd)
+        self.router.add('POST', '/reset-password', self.reset)
+        self.router.add('POST', '/reset-code_outdoor', self.reset)
+        self.router.add('POST', '/get-password', self.get_password)
+    
+    async def handle_request(self, writer, request):
+        print('Request method:' + str(request.method))
+        print('Request path:' + str(request.path))
+        await self.router.dispatch(writer, request)
+    
+    async def not_found(self, writer, request):
+        await self.render(writer, pages.PAGE_NOT_FOUND)
+    
+    async def indoor(self, writer, request):
+        lock.open(on_release=lambda: self.player.play_music('00017'))
+        write_record('+indoor+open')
+        await self.render(writer, pages.PAGE_WELCOME, {'level': '', 'name': ''})
+    
+    async def record(self, writer, request):
+        query = request.args()
+        try:
+            page = max(1, int(query.get('page', 1)))
+            limit = min(RECORD_PAGE_MAX_LIMIT, max(1, int(query.get('limit', RECORD_PAGE_LIMIT))))
+        except ValueError:
+            page, limit = 1, RECORD_PAGE_LIMIT
+        unlock_type = query.get('type')
+        if unlock_type not in RECORD_UNLOCK_TYPES:
+            unlock_type = None
+        # 逐块发送, 内存占用只与块大小有关
+        for chunk in self.record_page(page, limit, unlock_type):
+            await self.send(writer, chunk)
+    
+    async def system_time(self, writer, request):
+        await self.render(writer, pages.PAGE_TIME, {'time': time.localtime()})
+    
+    async def metrics(self, writer, request):
+        await self.send(writer, 'HTTP/1.1 200 OK\r\nContent-Type: text/plain; charset=utf-8\r\n\r\n')
+        for line in self.router.metrics():
+            await self.send(writer, line)
+        await self.send(writer, 'unlock_attempts_rejected_total {}\n'.format(
+            limiter.rejected + rotary_limiter.rejected))
+    
+    async def throttled(self, writer, source):
+        if limiter.allow(source):
+            return False
+        retry = (limiter.locked_ms(source) + 999) // 1000 or limiter.refill_ms // 1000
+        await self.render(writer, pages.PAGE_TOO_MANY_ATTEMPTS, {'retry': retry})
+        return True
+    
+    async def pwd(self, writer, request):
+        source = peer_address(writer)
+        if await self.throttled(writer, source):
+            return
+        register_dict = request.form()
+        get_data = None
+        if 'password' in register_dict:
+            get_data = self.db.search_data('password', register_dict['password'])
+        if get_data is None:
+            limiter.failure(source)
+            await self.render(writer, pages.PAGE_WRONG_PASSWORD)
+            return
+        limiter.success(source)
+        if register_dict.get('play') == 'on':
+            self.player.play_music(get_data['dooring'])
+        lock.open()
+        write_record('+WLAN+'+get_data['name'])
+        await self.render(writer, pages.PAGE_WELCOME, get_data)
+    
+    async def reset(self, writer, request):
+        source = peer_address(writer)
+        if await self.throttled(writer, source):
+            return
+        register_dict = request.form()
+        register_name = register_dict['JX']
+        user_data = self.db.get_user(register_name)
+        current_reset_key = request.path.split('-')[1]
+        if user_data[current_reset_key] != register_dict['old-' + current_reset_key]:
+            limiter.failure(source)
+            await self.render(writer, pages.PAGE_WRONG_PASSWORD)
+            return
+        limiter.success(source)
+        self.db.update_user(register_name, {current_reset_key: register_dict[current_reset_key]})
+        await self.render(writer, pages.PAGE_RESET_SUCCESS)
+    
+    async def get_password(self, writer, request):
+        source = peer_address(writer)
+        if await self.throttled(writer, source):
+            return
+        register_dict = request.form()
+        user_data = self.db.get_user(register_dict['JX'])
+        if register_dict['ID'] != user_data['ID']:
+            limiter.failure(source)
+            await self.render(writer, pages.PAGE_WRONG_PASSWORD)
+            return
+        limiter.success(source)
+        await self.render(writer, pages.PAGE_GET_PASSWORD, user_data)
 
 
 class RotaryLock:
-    def __init__(self):
-        self.last_time = None
-        self.max_interval_time = 30000
+    def __init__(self, data_base=None):
         self.player = Player
         self.search_result = None
         self._password_char = None
-        self.data_base = UserDatabase()
+        self.data_base = data_base if data_base is not None else UserDatabase()
         self.rotary_lock = RotaryIRQ(pin_num_clk=32,
                                      pin_num_dt=33,
                                      min_val=0,
@@ -859,55 +286,47 @@ class RotaryLock:
                                      reverse=False,
                                      range_mode=RotaryIRQ.RANGE_UNBOUNDED)
         
-        self.current_direction = None
-        self.last_direction = None
-        
-        self._code_list = []
-        self._value_current = None
+        self.session = CodeEntrySession(length=4, digit_timeout_ms=30000)
         
         self.rotary_lock.add_listener(self.code_outdoor_get)
         time.sleep(1)
     
-    def code_outdoor_get(self):
-        if self.last_time is None:
-            self.last_time = time.ticks_ms()
-        else:
-            if time.ticks_diff(self.last_time, time.ticks_ms()) > self.max_interval_time:
-                self.last_direction = None
-                self._code_list = []
-                self.current_direction = None
-        self.last_direction = self.rotary_lock.value()
-        self.rotary_lock.reset()
-        if self.current_direction == self.last_direction:
-            self._value_current += 1
-            if self._value_current == 10:
-                self._value_current = 0
-        else:
-            if self.current_direction is not None:
-                self._code_list.append(self._value_current)
-            self._value_current = 1
-            self.current_direction = self.last_direction
-        if len(self._code_list) == 4:
-            self.password_verification(self._code_list)
+    async def run(self, period=0.01):
+        # 编码器中断只记录事件, 在这里取出并解码
+        while True:
+            self.rotary_lock.drain()
+            if self.session.expired():
+                self.session.abort()
+            await asyncio.sleep(period)
+    
+    def code_outdoor_get(self, timestamp, delta):
+        code = self.session.feed(delta, timestamp)
+        if code is not None:
+            self.password_verification(code)
     
     def password_verification(self, password):
-        self._code_list = []
-        self.last_direction = None
-        self.current_direction = None
-        self._password_char = ''.join(map(str, password))
+        if not rotary_limiter.allow('rotary'):
+            # 锁定期间不查库也不播放提示音, 输入直接丢弃
+            return
+        self._password_char = password
         self.search_result = self.data_base.search_data("code_outdoor", self._password_char)
         if self.search_result is not None:
+            rotary_limiter.success('rotary')
             self.player.play_music(self.search_result['dooring'])
-            lock.value(1)
+            lock.open()
             write_record('+rotary+'+self.search_result["name"])
-            time.sleep(3)
-            lock.value(0)
         else:
+            rotary_limiter.failure('rotary')
             self.player.play_music('00099')
 
 
+async def main(server, rotary):
+    asyncio.create_task(Player.queue.run())
+    asyncio.create_task(rotary.run())
+    await server.serve()
+
 
 if __name__ == '__main__':
     Server_class = Server()
-    Rotary_class = RotaryLock()
-    _thread.start_new_thread(Server_class.server_loop, ())
+    Rotary_class = RotaryLock(Server_class.db)
+    asyncio.run(main(Server_class, Rotary_class))
@@ -0,0 +1,249 @@
+"""
+Dynamic HTML pages of the lock web UI, compiled once into templates with {{name}} slots.
+Static pages live in www/ and are served by static_pages.StaticPages.
+"""
+from template import Template
+
+# 页面不存在
+PAGE_NOT_FOUND = Template("""HTTP/1.1 404 Not Found\r\nContent-Type: text/html; charset=utf-8\r\n\r\n
+<!DOCTYPE html>
+<html>
+<head>
+  <meta name="viewport" content="width=device-width, initial-scale=1">
+  <style>
+    body {
+      display: flex;
+      flex-direction: column;
+      align-items: center;
+      justify-content: center;
+      height: 100vh;
+      margin: 0;
+      background-color: aquamarine;
+    }
+    h1 {
+    text - align: center;
+      font-size: 24px;
+    }
+    h2 {
+    text - align: center;
+      font-size: 18px;
+    }
+  </style>
+  <title>错误页面</title>
+</head>
+<body>
+  <h1>您访问的页面不存在</h1>
+  <h2>请联系管理员</h2>
+</body>
+</html>
+""")
+
+
+# 欢迎页面
+PAGE_WELCOME = Template("""HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n\r\n
+<!DOCTYPE html>
+<html>
+<head>
+  <meta name="viewport" content="width=device-width, initial-scale=1">
+  <style>
+    body {
+      display: flex;
+      flex-direction: column;
+      align-items: center;
+      justify-content: center;
+      height: 100vh;
+      margin: 0;
+      background-color: aquamarine;
+    }
+    h1 {
+    text - align: center;
+      font-size: 24px;
+    }
+    h2 {
+    text - align: center;
+      font-size: 18px;
+    }
+  </style>
+  <title>欢迎页面</title>
+</head>
+<body>
+  <h1>欢迎{{level}}{{name}}</h1>
+  <h2>请在提示音后拉门把手</h2>
+</body>
+</html>
+""")
+
+
+# 密码错误
+PAGE_WRONG_PASSWORD = Template("""HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n\r\n
+<!DOCTYPE html>
+<html>
+<head>
+  <meta name="viewport" content="width=device-width, initial-scale=1">
+  <style>
+    body {
+      display: flex;
+      flex-direction: column;
+      align-items: center;
+      justify-content: center;
+      height: 100vh;
+      margin: 0;
+      background-color: aquamarine;
+    }
+    h1 {
+    text - align: center;
+      font-size: 24px;
+    }
+    h2 {
+    text - align: center;
+      font-size: 18px;
+    }
+  </style>
+  <title>错误页面</title>
+</head>
+<body>
+  <h1>您的密码输入有误！</h1>
+  <h2>请检查后重新输入！</h2>
+</body>
+</html>
+""")
+
+
+# 密码错误次数过多, 暂时拒绝
+PAGE_TOO_MANY_ATTEMPTS = Template("""HTTP/1.1 429 Too Many Requests\r\nContent-Type: text/html; charset=utf-8\r\nRetry-After: {{retry}}\r\n\r\n
+<!DOCTYPE html>
+<html>
+<head>
+  <meta name="viewport" content="width=device-width, initial-scale=1">
+  <style>
+    body {
+      display: flex;
+      flex-direction: column;
+      align-items: center;
+      justify-content: center;
+      height: 100vh;
+      margin: 0;
+      background-color: aquamarine;
+    }
+    h1 {
+    text - align: center;
+      font-size: 24px;
+    }
+    h2 {
+    text - align: center;
+      font-size: 18px;
+    }
+  </style>
+  <title>错误页面</title>
+</head>
+<body>
+  <h1>密码错误次数过多！</h1>
+  <h2>请{{retry}}秒后再试！</h2>
+</body>
+</html>
+""")
+
+
+# 修改成功
+PAGE_RESET_SUCCESS = Template("""HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n\r\n
+<!DOCTYPE html>
+<html>
+<head>
+  <meta name="viewport" content="width=device-width, initial-scale=1">
+  <style>
+    body {
+      display: flex;
+      flex-direction: column;
+      align-items: center;
+      justify-content: center;
+      height: 100vh;
+      margin: 0;
+      background-color: aquamarine;
+    }
+    h1 {
+    text - align: center;
+      font-size: 24px;
+    }
+    h2 {
+    text - align: center;
+      font-size: 18px;
+    }
+  </style>
+  <title>修改页面</title>
+</head>
+<body>
+  <h1>修改密码成功</h1>
+</body>
+</html>
+""")
+
+
+# 找回密码结果
+PAGE_GET_PASSWORD = Template("""HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n\r\n
+<!DOCTYPE html>
+<html>
+<head>
+  <meta name="viewport" content="width=device-width, initial-scale=1">
+  <style>
+    body {
+      display: flex;
+      flex-direction: column;
+      align-items: center;
+      justify-content: center;
+      height: 100vh;
+      margin: 0;
+      background-color: aquamarine;
+    }
+    h1 {
+    text - align: center;
+      font-size: 24px;
+    }
+    h2 {
+    text - align: center;
+      font-size: 18px;
+    }
+  </style>
+  <title>密码找回</title>
+</head>
+<body>
+  <h1>欢迎{{level}}{{name}}</h1>
+  <h2>您的开锁密码{{password}}</h2>
+  <h2>您的拨盘密码{{code_outdoor}}</h2>
+</body>
+</html>
+""")
+
+
+# 系统时间
+PAGE_TIME = Template("""HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n\r\n
+<!DOCTYPE html>
+<html>
+<head>
+  <meta name="viewport" content="width=device-width, initial-scale=1">
+  <style>
+    body {
+      display: flex;
+      flex-direction: column;
+      align-items: center;
+      justify-content: center;
+      height: 100vh;
+      margin: 0;
+      background-color: aquamarine;
+    }
+    h1 {
+    text - align: center;
+      font-size: 24px;
+    }
+    h2 {
+    text - align: center;
+      font-size: 18px;
+    }
+  </style>
+  <title>错误页面</title>
+</head>
+<body>
+  <h1>当前系统时间为：</h1>
+  <h2>{{time}}</h2>
+</body>
+</html>
+""")
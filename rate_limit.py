@@ -0,0 +1,83 @@
+from compat import ticks_ms, ticks_diff, ticks_add
+
+
+class RateLimiter:
+    """
+    Per-source token buckets for failed unlock attempts (key: client IP, or a rotary channel name).
+    Every failure takes a token and a token comes back every refill_ms. When the bucket is empty the
+    source is locked out for lockout_ms, doubling with every further lockout up to max_lockout_ms.
+    A success clears the source. At most `size` sources are tracked; the least recently seen one is
+    evicted to make room, so memory stays bounded however many addresses show up.
+    """
+
+    def __init__(self, size=16, burst=5, refill_ms=60000, lockout_ms=30000, max_lockout_ms=3600000,
+                 clock=ticks_ms):
+        self.size = size
+        self.burst = burst
+        self.refill_ms = refill_ms
+        self.lockout_ms = lockout_ms
+        self.max_lockout_ms = max_lockout_ms
+        self.clock = clock
+        self.rejected = 0
+        # key -> [tokens, last_refill, lockouts, locked_until, last_seen]
+        self._table = {}
+
+    def _entry(self, key, now):
+        entry = self._table.get(key)
+        if entry is None:
+            if len(self._table) >= self.size:
+                oldest = None
+                for k in self._table:
+                    if oldest is None or ticks_diff(self._table[oldest][4], self._table[k][4]) > 0:
+                        oldest = k
+                del self._table[oldest]
+            entry = [self.burst, now, 0, None, now]
+            self._table[key] = entry
+            return entry
+        refills = ticks_diff(now, entry[1]) // self.refill_ms
+        if refills > 0:
+            entry[0] = min(self.burst, entry[0] + refills)
+            entry[1] = ticks_add(entry[1], refills * self.refill_ms)
+        entry[4] = now
+        return entry
+
+    def allow(self, key, now=None):
+        """
+        Check whether an attempt from key may go ahead; call this before looking anything up.
+        """
+        if now is None:
+            now = self.clock()
+        entry = self._entry(key, now)
+        if entry[3] is not None:
+            if ticks_diff(entry[3], now) > 0:
+                self.rejected += 1
+                return False
+            entry[3] = None
+        if entry[0] <= 0:
+            self.rejected += 1
+            return False
+        return True
+
+    def failure(self, key, now=None):
+        if now is None:
+            now = self.clock()
+        entry = self._entry(key, now)
+        if entry[0] == self.burst:
+            entry[1] = now  # 从第一次失败开始计算回补时间
+        entry[0] -= 1
+        if entry[0] <= 0:
+            lockout = min(self.max_lockout_ms, self.lockout_ms << entry[2])
+            entry[2] += 1
+            entry[3] = ticks_add(now, lockout)
+            entry[0] = 1  # 锁定结束后只给一次机会, 再失败则锁定时间加倍
+
+    def success(self, key):
+        self._table.pop(key, None)
+
+    def locked_ms(self, key, now=None):
+        entry = self._table.get(key)
+        if entry is None or entry[3] is None:
+            return 0
+        if now is None:
+            now = self.clock()
+        return max(0, ticks_diff(entry[3], now))
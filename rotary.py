@@ -7,7 +7,10 @@
 # Documentation:
 #   https://github.com/MikeTeachman/micropython-rotary
 
-import micropython
+from array import array
+from compat import const, ticks_ms
+
+_EVENT_QUEUE_SIZE = const(64)  # (timestamp, delta) pairs
 
 _DIR_CW = const(0x10)  # Clockwise step
 _DIR_CCW = const(0x20)  # Counter-clockwise step
@@ -49,6 +52,10 @@ _transition_table_half_step = [
 _STATE_MASK = const(0x07)
 _DIR_MASK = const(0x30)
 
+# The same tables flattened to 32 bytes, indexed by (state << 2) | clk_dt_pins
+_TRANSITIONS = bytes(state for row in _transition_table for state in row)
+_TRANSITIONS_HALF_STEP = bytes(state for row in _transition_table_half_step for state in row)
+
 
 def _wrap(value, incr, lower_bound, upper_bound):
     range = upper_bound - lower_bound + 1
@@ -64,9 +71,64 @@ def _bound(value, incr, lower_bound, upper_bound):
     return min(upper_bound, max(lower_bound, value + incr))
 
 
-def _trigger(rotary_instance):
+def decode_samples(samples, count, state, table, invert=False):
+    """
+    Run the state machine over a buffer of (clk << 1) | dt samples.
+    :param samples: bytes, bytearray or array of 2-bit samples, one per edge.
+    :param table: _TRANSITIONS or _TRANSITIONS_HALF_STEP.
+    :return: (net steps, clockwise positive; final state)
+    """
+    steps = 0
+    flip = 0x03 if invert else 0
+    for i in range(count):
+        state = table[((state & _STATE_MASK) << 2) | (samples[i] ^ flip)]
+        direction = state & _DIR_MASK
+        if direction == _DIR_CW:
+            steps += 1
+        elif direction == _DIR_CCW:
+            steps -= 1
+    return steps, state
+
+
+try:
+    import micropython
+
+    # viper 函数最多只能有 4 个参数且只能返回一个 int: 状态和翻转掩码由这个预先分配的数组传入,
+    # 净步数和最终状态也写回这里
+    _decode_io = array('i', (0, 0, 0))  # state, flip, steps
+
+    @micropython.viper
+    def _decode_samples_viper(samples, count: int, table, io):
+        buf = ptr8(samples)
+        transitions = ptr8(table)
+        regs = ptr32(io)
+        state = regs[0]
+        flip = regs[1]
+        steps = 0
+        i = 0
+        while i < count:
+            state = int(transitions[((state & 0x07) << 2) | (buf[i] ^ flip)])
+            direction = state & 0x30
+            if direction == 0x10:
+                steps += 1
+            elif direction == 0x20:
+                steps -= 1
+            i += 1
+        regs[0] = state
+        regs[2] = steps
+
+    def decode_samples_native(samples, count, state, table, invert=False):
+        _decode_io[0] = state
+        _decode_io[1] = 0x03 if invert else 0
+        _decode_samples_viper(samples, count, table, _decode_io)
+        return _decode_io[2], _decode_io[0]
+except (ImportError, AttributeError):
+    decode_samples_native = decode_samples
+
+
+def _trigger(rotary_instance, timestamp, delta):
     for listener in rotary_instance._listener:
-        listener()
+        listener(timestamp, delta)
 
 
 class Rotary(object):
@@ -75,7 +137,8 @@ class Rotary(object):
     RANGE_WRAP = const(2)
     RANGE_BOUNDED = const(3)
 
-    def __init__(self, min_val, max_val, incr, reverse, range_mode, half_step, invert):
+    def __init__(self, min_val, max_val, incr, reverse, range_mode, half_step, invert,
+                 event_queue_size=_EVENT_QUEUE_SIZE):
         self._min_val = min_val
         self._max_val = max_val
         self._incr = incr
@@ -84,8 +147,15 @@ class Rotary(object):
         self._value = min_val
         self._state = _R_START
         self._half_step = half_step
+        self._table = _TRANSITIONS_HALF_STEP if half_step else _TRANSITIONS
         self._invert = invert
         self._listener = []
+        # Ring buffer filled by the pin IRQ and emptied by drain(); preallocated so the IRQ never allocates
+        self._events = array('i', [0] * (2 * event_queue_size))
+        self._event_queue_size = event_queue_size
+        self._event_head = 0
+        self._event_tail = 0
+        self.dropped_events = 0
 
     def set(self, value=None, min_val=None, incr=None,
             max_val=None, reverse=None, range_mode=None):
@@ -125,32 +195,44 @@ class Rotary(object):
         if l not in self._listener:
             raise ValueError('{} is not an installed listener'.format(l))
         self._listener.remove(l)
-        
-    def _process_rotary_pins(self, pin):
-        old_value = self._value
-        clk_dt_pins = (self._hal_get_clk_value() <<
-                       1) | self._hal_get_dt_value()
-                       
-        if self._invert:
-            clk_dt_pins = ~clk_dt_pins & 0x03
-            
-        # Determine next state
-        if self._half_step:
-            self._state = _transition_table_half_step[self._state &
-                                                      _STATE_MASK][clk_dt_pins]
-        else:
-            self._state = _transition_table[self._state &
-                                            _STATE_MASK][clk_dt_pins]
-        direction = self._state & _DIR_MASK
-
-        incr = 0
-        if direction == _DIR_CW:
-            incr = self._incr
-        elif direction == _DIR_CCW:
-            incr = -self._incr
-
-        incr *= self._reverse
 
+    def pending_events(self):
+        return (self._event_head - self._event_tail) % self._event_queue_size
+
+    def drain(self):
+        """
+        Call the listeners with (timestamp, delta) for every event recorded by the IRQ since the last drain.
+        Run this from a task, never from the IRQ itself.
+        """
+        count = 0
+        events = self._events
+        while self._event_tail != self._event_head:
+            i = self._event_tail * 2
+            timestamp = events[i]
+            delta = events[i + 1]
+            self._event_tail = (self._event_tail + 1) % self._event_queue_size
+            count += 1
+            try:
+                _trigger(self, timestamp, delta)
+            except Exception as e:
+                print('rotary listener error:', e)
+        return count
+
+    def decode_batch(self, samples, count=None):
+        """
+        Feed a whole buffer of (clk << 1) | dt samples through the state machine in one call, using the
+        viper decoder when running on MicroPython. The value moves by the net number of steps, so a
+        bounded range clamps the net change rather than every single step. Listeners are not queued.
+        :return: Net steps decoded, clockwise positive.
+        """
+        if count is None:
+            count = len(samples)
+        steps, self._state = decode_samples_native(samples, count, self._state, self._table, self._invert)
+        if steps:
+            self._apply_incr(steps * self._incr * self._reverse)
+        return steps
+
+    def _apply_incr(self, incr):
         if self._range_mode == self.RANGE_WRAP:
             self._value = _wrap(
                 self._value,
@@ -166,8 +248,34 @@ class Rotary(object):
         else:
             self._value = self._value + incr
 
-        try:
-            if old_value != self._value and len(self._listener) != 0:
-                _trigger(self)
-        except:
-            pass
+    def _process_rotary_pins(self, pin):
+        clk_dt_pins = (self._hal_get_clk_value() <<
+                       1) | self._hal_get_dt_value()
+
+        if self._invert:
+            clk_dt_pins = ~clk_dt_pins & 0x03
+
+        # Determine next state
+        self._state = self._table[((self._state & _STATE_MASK) << 2) | clk_dt_pins]
+        direction = self._state & _DIR_MASK
+        if direction == 0:
+            return  # three of every four edges only move the state machine
+
+        if direction == _DIR_CW:
+            incr = self._incr * self._reverse
+        else:
+            incr = -self._incr * self._reverse
+
+        old_value = self._value
+        self._apply_incr(incr)
+
+        if old_value != self._value:
+            # Only record the event here; listeners run later from drain()
+            head = self._event_head
+            next_head = (head + 1) % self._event_queue_size
+            if next_head == self._event_tail:
+                self.dropped_events += 1
+            else:
+                self._events[head * 2] = ticks_ms()
+                self._events[head * 2 + 1] = incr
+                self._event_head = next_head
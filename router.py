@@ -0,0 +1,48 @@
+from compat import ticks_us, ticks_diff
+
+
+class Router:
+    """
+    Dispatch table for the web server, keyed by (method, path).
+    Every dispatch is counted and timed per route; stats holds [count, total_us, max_us] for each key.
+    """
+
+    def __init__(self, not_found):
+        self.routes = {}
+        self.stats = {}
+        self.not_found = not_found
+
+    def add(self, method, path, handler):
+        self.routes[(method, path)] = handler
+        self.stats[(method, path)] = [0, 0, 0]
+
+    async def dispatch(self, writer, request):
+        key = (request.method, request.path)
+        handler = self.routes.get(key)
+        if handler is None:
+            key = None
+            handler = self.not_found
+        start = ticks_us()
+        try:
+            await handler(writer, request)
+        finally:
+            elapsed = ticks_diff(ticks_us(), start)
+            if key is None:
+                key = ('*', '*')
+                if key not in self.stats:
+                    self.stats[key] = [0, 0, 0]
+            stat = self.stats[key]
+            stat[0] += 1
+            stat[1] += elapsed
+            if elapsed > stat[2]:
+                stat[2] = elapsed
+
+    def metrics(self):
+        """
+        Yield the per-route counters in the Prometheus text format.
+        """
+        for (method, path), (count, total_us, max_us) in self.stats.items():
+            labels = '{{method="{}",path="{}"}}'.format(method, path)
+            yield 'http_requests_total{} {}\n'.format(labels, count)
+            yield 'http_request_duration_us_sum{} {}\n'.format(labels, total_us)
+            yield 'http_request_duration_us_max{} {}\n'.format(labels, max_us)
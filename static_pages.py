@@ -0,0 +1,55 @@
+try:
+    import ujson
+except ImportError:
+    import json as ujson
+
+
+class StaticPages:
+    """
+    Serve the gzip-precompressed pages listed in www/manifest.json (see tools/build_www.py).
+    Responses carry Content-Encoding: gzip and an ETag, so a browser revalidating a page it already has
+    gets a bodiless 304. Page bodies are streamed from flash chunk_size bytes at a time through one
+    preallocated buffer, which is safe to share because nothing awaits between filling and writing it.
+    """
+
+    def __init__(self, root='www', chunk_size=512, cache_control='no-cache'):
+        self.root = root
+        self.pages = {}
+        self._buffer = bytearray(chunk_size)
+        self._view = memoryview(self._buffer)
+        with open(root + '/manifest.json', 'r') as f:
+            manifest = ujson.load(f)
+        for path in manifest:
+            page = manifest[path]
+            header = ('HTTP/1.1 200 OK\r\n'
+                      'Content-Type: {}\r\n'
+                      'Content-Encoding: gzip\r\n'
+                      'Content-Length: {}\r\n'
+                      'ETag: {}\r\n'
+                      'Cache-Control: {}\r\n'
+                      '\r\n').format(page['type'], page['size'], page['etag'], cache_control)
+            not_modified = ('HTTP/1.1 304 Not Modified\r\n'
+                            'ETag: {}\r\n'
+                            'Cache-Control: {}\r\n'
+                            '\r\n').format(page['etag'], cache_control)
+            self.pages[path] = (root + '/' + page['file'], page['etag'], header.encode(), not_modified.encode())
+
+    def handler(self, path, send):
+        """
+        Return a router handler serving the page for path; send(writer, data) writes to the client.
+        """
+        file_name, etag, header, not_modified = self.pages[path]
+
+        async def serve(writer, request):
+            if request.headers.get('if-none-match') == etag:
+                await send(writer, not_modified)
+                return
+            await send(writer, header)
+            with open(file_name, 'rb') as f:
+                while True:
+                    size = f.readinto(self._buffer)
+                    if not size:
+                        break
+                    await send(writer, self._view[:size])
+
+        return serve
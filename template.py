@@ -0,0 +1,44 @@
+class Template:
+    """
+    A page with {{name}} slots, compiled once into encoded static chunks and slot names.
+    write() hands the chunks and the escaped slot values to writer.write one by one, so a response
+    is never joined into a single string.
+    """
+
+    def __init__(self, source):
+        parts = []
+        pos = 0
+        while True:
+            start = source.find('{{', pos)
+            if start < 0:
+                break
+            end = source.find('}}', start)
+            if end < 0:
+                raise ValueError('unclosed slot at {}'.format(start))
+            if start > pos:
+                parts.append(source[pos:start].encode())
+            parts.append(source[start + 2:end].strip())
+            pos = end + 2
+        if pos < len(source):
+            parts.append(source[pos:].encode())
+        self.parts = tuple(parts)
+        self.slots = tuple(part for part in parts if isinstance(part, str))
+
+    def write(self, writer, values=None):
+        for part in self.parts:
+            if isinstance(part, str):
+                writer.write(escape(str(values[part])).encode())
+            else:
+                writer.write(part)
+
+
+def escape(text):
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    if '"' in text:
+        text = text.replace('"', '&quot;')
+    return text
@@ -0,0 +1,85 @@
+import time
+import _thread
+import ntptime
+
+
+class TimeKeeper:
+    """
+    Keeps the RTC on local time by syncing with NTP on boot and then every `interval` seconds.
+    Reading the time never touches the network. poll() runs the sync in a background thread, so the
+    NTP round trip (a DNS lookup and a socket timeout when offline) never blocks the event loop; after
+    a failed sync the retry waits retry_interval, doubled after every further failure up to interval.
+    Attributes:
+        last_sync(int): time.time() of the last successful sync, None before the first one.
+        drift(int): Seconds the RTC was ahead of NTP at the last sync (negative if behind).
+        failures(int): Failed syncs since the last successful one.
+        syncing(bool): A sync started by poll() is still running.
+    """
+
+    def __init__(self, rtc, timeoffset=8 * 3600, interval=6 * 3600, retry_interval=60):
+        self.rtc = rtc
+        self.timeoffset = timeoffset
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self.last_sync = None
+        self.last_attempt = None
+        self.drift = 0
+        self.sync_count = 0
+        self.failures = 0
+        self.syncing = False
+
+    def sync(self):
+        self.last_attempt = time.time()
+        before = time.time()
+        try:
+            ntptime.settime()  # RTC 被设为 UTC 时间
+        except OSError:
+            self.failures += 1
+            return False
+        timestamp = time.time()
+        if self.last_sync is not None:
+            self.drift = before - (timestamp + self.timeoffset)
+        time_now = time.localtime(timestamp + self.timeoffset)
+        self.rtc.datetime(
+            (time_now[0], time_now[1], time_now[2], time_now[6] + 1, time_now[3], time_now[4], time_now[5], 0)
+        )
+        self.last_sync = time.time()
+        self.last_attempt = self.last_sync
+        self.sync_count += 1
+        self.failures = 0
+        return True
+
+    def due(self):
+        """
+        :return: True if the interval since the last sync, or the retry delay since a failed one, has passed.
+        """
+        if self.last_attempt is None:
+            return True
+        now = time.time()
+        if self.failures:
+            # 连续失败时重试间隔加倍, 断网时不会每分钟都等一次 DNS/套接字超时
+            return now - self.last_attempt >= min(self.retry_interval << (self.failures - 1), self.interval)
+        return now - self.last_sync >= self.interval
+
+    def poll(self):
+        """
+        Start a sync in a background thread if it is due and none is running.
+        :return: True if a sync was started.
+        """
+        if self.syncing or not self.due():
+            return False
+        self.syncing = True
+        try:
+            _thread.start_new_thread(self._background_sync, ())
+        except (OSError, RuntimeError):
+            self._background_sync()
+        return True
+
+    def _background_sync(self):
+        try:
+            self.sync()
+        finally:
+            self.syncing = False
+
+    def datetime(self):
+        return self.rtc.datetime()
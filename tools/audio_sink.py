@@ -0,0 +1,124 @@
+"""
+TCP sink for the INMP441 audio uplink: accepts the board's connection, receives the stream and reports
+sustained throughput and the gaps between received chunks; optionally writes the audio to a WAV file,
+decoding the IMA-ADPCM blocks of adpcm.AdpcmEncoder first when --adpcm is given.
+Run on the collector (the address in INMP441.SINK_ADDRESS), from the repository root:
+    python tools/audio_sink.py [--port 8001] [--rate 8000] [--wav out.wav] [--gap-ms 200] [--adpcm 1024]
+"""
+import argparse
+import os
+import socket
+import sys
+import time
+import wave
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from adpcm import AdpcmDecoder  # noqa: E402
+
+
+class SinkStats:
+    def __init__(self, gap_ms):
+        self.gap_ms = gap_ms
+        self.bytes = 0
+        self.first = None
+        self.last = None
+        self.max_gap_ms = 0.0
+        self.gaps = 0  # 间隔超过 gap_ms 的次数
+
+    def add(self, count, now=None):
+        if now is None:
+            now = time.monotonic()
+        if self.first is None:
+            self.first = now
+        elif self.last is not None:
+            gap = (now - self.last) * 1000
+            self.max_gap_ms = max(self.max_gap_ms, gap)
+            if gap > self.gap_ms:
+                self.gaps += 1
+        self.last = now
+        self.bytes += count
+
+    def throughput(self):
+        if self.first is None or self.last == self.first:
+            return 0.0
+        return self.bytes / (self.last - self.first)
+
+    def report(self):
+        return '{} bytes, {:.0f} B/s, max gap {:.1f} ms, {} gaps > {} ms'.format(
+            self.bytes, self.throughput(), self.max_gap_ms, self.gaps, self.gap_ms)
+
+
+def receive(conn, stats, decoder=None, wav=None, chunk=4096, rate_limit=None):
+    """
+    Read one connection until it closes.
+    :param decoder: Optional callable bytes -> PCM bytes applied before writing the WAV file.
+    :param rate_limit: Optional bytes per second, to simulate a slow collector.
+    """
+    buf = bytearray(chunk)
+    view = memoryview(buf)
+    while True:
+        count = conn.recv_into(buf)
+        if not count:
+            break
+        stats.add(count)
+        if wav is not None:
+            data = bytes(view[:count])
+            wav.writeframes(decoder(data) if decoder is not None else data)
+        if rate_limit:
+            time.sleep(count / rate_limit)
+
+
+def serve(port, rate, wav_name=None, gap_ms=200, once=False, decoder=None, rate_limit=None, ready=None):
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if rate_limit:
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)  # 否则内核缓冲会掩盖慢速接收
+    server.bind(('0.0.0.0', port))
+    server.listen(1)
+    if ready is not None:
+        ready(server.getsockname()[1])
+    print('listening on port {}'.format(server.getsockname()[1]))
+    results = []
+    try:
+        while True:
+            conn, address = server.accept()
+            stats = SinkStats(gap_ms)
+            if hasattr(decoder, 'reset'):
+                decoder.reset()
+            wav = None
+            if wav_name:
+                wav = wave.open(wav_name, 'wb')
+                wav.setnchannels(1)
+                wav.setsampwidth(2)
+                wav.setframerate(rate)
+            try:
+                receive(conn, stats, decoder, wav, rate_limit=rate_limit)
+            finally:
+                conn.close()
+                if wav is not None:
+                    wav.close()
+            print('{}: {}'.format(address[0], stats.report()))
+            results.append(stats)
+            if once:
+                return results
+    finally:
+        server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--rate', type=int, default=8000, help='sample rate written to the WAV header')
+    parser.add_argument('--wav', help='write the received audio to this WAV file')
+    parser.add_argument('--gap-ms', type=float, default=200, help='report gaps longer than this')
+    parser.add_argument('--once', action='store_true', help='exit after the first connection')
+    parser.add_argument('--adpcm', type=int, metavar='CHUNK',
+                        help='the stream is IMA-ADPCM encoded from chunks of this many PCM bytes')
+    args = parser.parse_args()
+    decoder = AdpcmDecoder(args.adpcm) if args.adpcm else None
+    serve(args.port, args.rate, args.wav, args.gap_ms, args.once, decoder)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Host-side benchmark of the IMA-ADPCM uplink stage (adpcm.py) on the wav/ sample files.
+For every file it encodes the PCM chunk by chunk in place, as AudioStream does, reports the encode and
+decode time per chunk and the compression ratio, checks that one call over several chunks (VoiceGate
+pre-roll) gives the same blocks, decodes the stream in uneven pieces like the sink receives it, and
+reports the round-trip SNR and segmental SNR against the original.
+The time measured here is the pure-Python reference; on the board encode_blocks_native runs in viper.
+With --stream the first file is also sent through tools/fake_i2s.py to tools/audio_sink.py with the
+encoder stage and the sink's decoder, to compare bytes on the wire with raw PCM.
+Run from the repository root: python tools/bench_adpcm.py [--chunk 1024] [--stream]
+"""
+import argparse
+import math
+import os
+import struct
+import sys
+import time
+import wave
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import adpcm  # noqa: E402
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def snr(reference, decoded, segment=256):
+    """
+    :return: (SNR in dB, segmental SNR in dB over segments with signal)
+    """
+    a = struct.unpack('<{}h'.format(len(reference) // 2), reference)
+    b = struct.unpack('<{}h'.format(len(decoded) // 2), decoded)
+    signal = sum(x * x for x in a)
+    noise = sum((x - y) ** 2 for x, y in zip(a, b))
+    segments = []
+    for start in range(0, len(a) - segment + 1, segment):
+        s = sum(x * x for x in a[start:start + segment])
+        n = sum((x - y) ** 2 for x, y in zip(a[start:start + segment], b[start:start + segment]))
+        if s > segment * 100 ** 2:  # 跳过静音段
+            segments.append(10 * math.log10(s / max(n, 1)))
+    return 10 * math.log10(signal / max(noise, 1)), sum(segments) / max(1, len(segments))
+
+
+def run_file(file_name, chunk):
+    with wave.open(file_name, 'rb') as wav:
+        rate = wav.getframerate()
+        pcm = wav.readframes(wav.getnframes())
+    pcm = pcm[:len(pcm) // chunk * chunk]
+    frames = len(pcm) // chunk
+
+    buf = bytearray(pcm)
+    view = memoryview(buf)
+    encoder = adpcm.AdpcmEncoder(chunk, encode=adpcm.encode_blocks)
+    blocks = []
+    start = time.perf_counter()
+    for i in range(frames):
+        blocks.append(bytes(encoder(view[i * chunk:(i + 1) * chunk])))
+    encode_time = time.perf_counter() - start
+    stream = b''.join(blocks)
+
+    # 一次编码多块(预录帧)必须和逐块编码结果一致
+    whole = adpcm.AdpcmEncoder(chunk, encode=adpcm.encode_blocks)(memoryview(bytearray(pcm)))
+    consistent = bytes(whole) == stream
+
+    decoder = adpcm.AdpcmDecoder(chunk)
+    start = time.perf_counter()
+    decoded = b''.join(decoder(stream[i:i + 1460]) for i in range(0, len(stream), 1460))
+    decode_time = time.perf_counter() - start
+    total, segmental = snr(pcm, decoded)
+    return {'rate': rate, 'frames': frames, 'encode_us': encode_time / frames * 1e6,
+            'decode_us': decode_time / frames * 1e6, 'ratio': len(pcm) / len(stream),
+            'snr': total, 'segsnr': segmental, 'consistent': consistent and len(decoded) == len(pcm)}
+
+
+def run_stream(file_name, chunk, seconds):
+    import fake_i2s
+
+    pcm, rate = fake_i2s.wav_pcm(file_name)
+    stream, stats = fake_i2s.run(pcm, rate, seconds, chunk, stages=(adpcm.AdpcmEncoder(chunk),),
+                                 decoder=adpcm.AdpcmDecoder(chunk), wav_name=os.devnull)
+    print('stream {}: captured {} dropped {} sent {} B ({:.0f} B/s vs {} B/s raw PCM)'.format(
+        os.path.basename(file_name), stream.captured, stream.dropped, stream.sent_bytes,
+        stream.sent_bytes / seconds, rate * 2))
+    print('sink:   ' + stats.report())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chunk', type=int, default=1024, help='PCM bytes per chunk (INMP441.CHUNK_SIZE)')
+    parser.add_argument('--stream', action='store_true', help='also stream through fake_i2s and the sink')
+    parser.add_argument('--seconds', type=float, default=3)
+    args = parser.parse_args()
+
+    directory = os.path.join(ROOT, 'wav')
+    files = [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith('.wav')]
+    print('chunk {} B -> block {} B'.format(args.chunk, adpcm.block_size(args.chunk)))
+    print('{:<10} {:>6} {:>7} {:>12} {:>12} {:>7} {:>9} {:>11} {:>6}'.format(
+        'file', 'rate', 'chunks', 'encode us', 'decode us', 'ratio', 'SNR dB', 'segSNR dB', 'check'))
+    for file_name in files:
+        r = run_file(file_name, args.chunk)
+        print('{:<10} {:>6} {:>7} {:>12.0f} {:>12.0f} {:>7.2f} {:>9.1f} {:>11.1f} {:>6}'.format(
+            os.path.basename(file_name), r['rate'], r['frames'], r['encode_us'], r['decode_us'], r['ratio'],
+            r['snr'], r['segsnr'], 'ok' if r['consistent'] else 'FAIL'))
+    if args.stream:
+        run_stream(files[0], args.chunk, args.seconds)
+
+
+if __name__ == '__main__':
+    main()
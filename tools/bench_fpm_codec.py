@@ -0,0 +1,104 @@
+"""
+Host-side benchmark of the FPM383C packet codec against the old way of building and reading frames
+(concatenating header + address + bytes, hexlifying the reply and slicing the hex string).
+Encodes AutoIdentify commands and decodes AutoIdentify replies, and checks both ways agree.
+Reports frames per second and the peak bytes allocated for one frame (tracemalloc). On CPython the
+interpreter overhead of the extra calls dominates the rate; what the codec saves on the board is the
+allocations: no hex strings and no new frame buffer per command.
+Run from the repository root: python tools/bench_fpm_codec.py [iterations]
+"""
+import binascii
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import fpm_codec  # noqa: E402
+
+HEADER = bytearray([239, 1])
+ADDRESS = bytearray([255, 255, 255, 255])
+
+
+def identify_reply(step, code, finger_id, score):
+    body = bytes([fpm_codec.PID_ACK, 0, 8, code, step]) + finger_id.to_bytes(2, 'big') + score.to_bytes(2, 'big')
+    return bytes(HEADER + ADDRESS) + body + (sum(body) & 0xffff).to_bytes(2, 'big')
+
+
+def encode_old(level, params):
+    checksum = 59 + 255 + 255 + level + params
+    return HEADER + ADDRESS + b'\x01\x00\x08\x32' + bytearray([level, 255, 255, 0, params]) + checksum.to_bytes(2, 'big')
+
+
+def encode_new(codec, level, params):
+    return codec.encode(fpm_codec.CMD_AUTO_IDENTIFY, 'BHH', level, 0xffff, params)
+
+
+def decode_old(frame):
+    message = binascii.hexlify(frame).decode()
+    result = {'header': message[0:4],
+              'device_address': message[4:12],
+              'package_identification': message[12:14],
+              'package_length': message[14:18],
+              'conformation_code': message[18:20],
+              'param': message[20:22],
+              'ID_number': message[22:26],
+              'grade': message[26:30],
+              'checksum': message[30:34]
+              }
+    return result['param'], result['conformation_code'], int(result['ID_number'], 16)
+
+
+def decode_new(codec, frame):
+    codec.rx_view[:len(frame)] = frame  # 板上由 uart.readinto 直接写入
+    reply = codec.identify_reply(len(frame))
+    return reply.step, reply.code, reply.finger_id
+
+
+def rate(label, iterations, func, once):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    once()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('{:<12} {:>12,.0f} frames/s  ({:.2f} us/frame, peak {} B)'.format(
+        label, iterations / elapsed, elapsed / iterations * 1e6, peak))
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    codec = fpm_codec.FrameCodec()
+    frames = [identify_reply(5, 0, finger_id, 50 + finger_id) for finger_id in range(64)]
+
+    assert bytes(encode_new(codec, 3, 2)) == bytes(encode_old(3, 2)), 'encoders disagree'
+    for frame in frames:
+        step, code, finger_id = decode_old(frame)
+        assert (int(step, 16), int(code, 16), finger_id) == decode_new(codec, frame), 'decoders disagree'
+
+    def run_encode_old():
+        for i in range(iterations):
+            encode_old(i & 3, i & 7)
+
+    def run_encode_new():
+        for i in range(iterations):
+            encode_new(codec, i & 3, i & 7)
+
+    def run_decode_old():
+        for i in range(iterations):
+            decode_old(frames[i & 63])
+
+    def run_decode_new():
+        for i in range(iterations):
+            decode_new(codec, frames[i & 63])
+
+    rate('encode old', iterations, run_encode_old, lambda: encode_old(3, 2))
+    rate('encode new', iterations, run_encode_new, lambda: encode_new(codec, 3, 2))
+    rate('decode old', iterations, run_decode_old, lambda: decode_old(frames[7]))
+    rate('decode new', iterations, run_decode_new, lambda: decode_new(codec, frames[7]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Host-side benchmark of the rotary decoder: the per-edge IRQ path (Rotary._process_rotary_pins, one call
+and two HAL pin reads per edge) against the batch API (Rotary.decode_batch over a buffer of samples).
+On CPython decode_batch runs the pure-Python decoder; on the board it uses the viper one.
+Run from the repository root: python tools/bench_rotary_decode.py [transitions]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import rotary  # noqa: E402
+
+CW_STEPS = (0b10, 0b00, 0b01, 0b11)
+CCW_STEPS = (0b01, 0b00, 0b10, 0b11)
+
+
+class SampleRotary(rotary.Rotary):
+    def __init__(self):
+        super().__init__(0, 9, 1, False, rotary.Rotary.RANGE_WRAP, False, False)
+        self.pins = 0b11
+
+    def _hal_get_clk_value(self):
+        return self.pins >> 1
+
+    def _hal_get_dt_value(self):
+        return self.pins & 1
+
+
+def synthesize(transitions, seed=0):
+    rng = random.Random(seed)
+    samples = bytearray()
+    while len(samples) < transitions:
+        samples.extend((CW_STEPS if rng.random() < 0.5 else CCW_STEPS) * rng.randint(1, 10))
+    return samples[:transitions - transitions % 4]
+
+
+def per_edge(samples):
+    encoder = SampleRotary()
+    process = encoder._process_rotary_pins
+    for pins in samples:
+        encoder.pins = pins
+        process(None)
+        encoder._event_tail = encoder._event_head  # 模拟消费者及时取走事件
+    return encoder.value()
+
+
+def batch(samples):
+    encoder = SampleRotary()
+    encoder.decode_batch(samples)
+    return encoder.value()
+
+
+def main():
+    transitions = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    samples = synthesize(transitions)
+    results = []
+    for label, func in (('per-edge', per_edge), ('batch', batch)):
+        start = time.perf_counter()
+        value = func(samples)
+        elapsed = time.perf_counter() - start
+        results.append(value)
+        print('{:<9} {:>12,.0f} edges/s  ({} edges in {:.2f} s, value {})'.format(
+            label, len(samples) / elapsed, len(samples), elapsed, value))
+    assert results[0] == results[1], 'decoders disagree'
+
+
+if __name__ == '__main__':
+    main()
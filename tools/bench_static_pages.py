@@ -0,0 +1,72 @@
+"""
+Host-side benchmark for the static pages: bytes sent and handler time per page for
+- inline: the page held as a str constant, encoded and sent whole on every request (the old way)
+- gzip: StaticPages streaming the precompressed file
+- 304: StaticPages answering a revalidation with a matching If-None-Match
+Run from the repository root after tools/build_www.py: python tools/bench_static_pages.py [iterations]
+"""
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from http_request import RequestParser  # noqa: E402
+from static_pages import StaticPages  # noqa: E402
+
+
+class CountingWriter:
+    def __init__(self):
+        self.sent = 0
+
+    def write(self, data):
+        self.sent += len(data)
+
+
+async def send(writer, data):
+    writer.write(data.encode() if isinstance(data, str) else data)
+
+
+def make_request(path, etag=None):
+    raw = 'GET {} HTTP/1.1\r\nHost: lock\r\nAccept-Encoding: gzip\r\n'.format(path)
+    if etag is not None:
+        raw += 'If-None-Match: {}\r\n'.format(etag)
+    parser = RequestParser()
+    parser.feed((raw + '\r\n').encode())
+    return parser.request
+
+
+def inline_handler(page):
+    async def handler(writer, request):
+        await send(writer, page)
+    return handler
+
+
+async def measure(handler, request, iterations):
+    writer = CountingWriter()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await handler(writer, request)
+    elapsed = time.perf_counter() - start
+    return writer.sent // iterations, elapsed / iterations * 1e6
+
+
+async def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    os.chdir(ROOT)
+    static = StaticPages()
+    print('{:<22} {:>14} {:>14} {:>14}'.format('page', 'inline', 'gzip', '304'))
+    for path in sorted(static.pages):
+        with open('www' + path + '.html', 'r') as f:
+            page = 'HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n\r\n' + f.read()
+        etag = static.pages[path][1]
+        results = [await measure(inline_handler(page), make_request(path), iterations),
+                   await measure(static.handler(path, send), make_request(path), iterations),
+                   await measure(static.handler(path, send), make_request(path, etag), iterations)]
+        print('{:<22} {}'.format(path, ' '.join('{:>5} B {:>5.1f}us'.format(*r) for r in results)))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,66 @@
+"""
+Host-side benchmark of the compiled templates against str.format on the whole page literal.
+Reports time per response and the peak bytes allocated while rendering one response (tracemalloc).
+Run from the repository root: python tools/bench_template.py [iterations]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pages  # noqa: E402
+from bench_static_pages import CountingWriter  # noqa: E402
+
+USER = {'level': '来自德玛西亚的最强', 'name': '陈继辉', 'password': '112011', 'code_outdoor': '2672'}
+
+
+def format_source(template):
+    # 把模板还原为旧的 str.format 字面量: 双写花括号, 槽位换成 {}
+    source = ''
+    for part in template.parts:
+        if isinstance(part, str):
+            source += '{}'
+        else:
+            source += part.decode().replace('{', '{{').replace('}', '}}')
+    return source
+
+
+def run_format(source, template, writer, iterations):
+    args = [USER[slot] for slot in template.slots]
+    for _ in range(iterations):
+        writer.write(source.format(*args).encode())
+
+
+def run_template(source, template, writer, iterations):
+    for _ in range(iterations):
+        template.write(writer, USER)
+
+
+def measure(func, source, template, iterations):
+    writer = CountingWriter()
+    start = time.perf_counter()
+    func(source, template, writer, iterations)
+    elapsed = (time.perf_counter() - start) / iterations * 1e6
+
+    tracemalloc.start()
+    func(source, template, CountingWriter(), 1)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print('{:<20} {:>22} {:>22}'.format('page', 'str.format', 'Template'))
+    for name in ('PAGE_WELCOME', 'PAGE_GET_PASSWORD'):
+        template = getattr(pages, name)
+        source = format_source(template)
+        results = [measure(run_format, source, template, iterations),
+                   measure(run_template, source, template, iterations)]
+        print('{:<20} {}'.format(name, ' '.join('{:>6.2f}us peak {:>5} B'.format(*r) for r in results)))
+
+
+if __name__ == '__main__':
+    main()
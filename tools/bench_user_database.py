@@ -0,0 +1,79 @@
+"""
+Host-side benchmark for UserDatabase.search_data.
+Generates a synthetic Userdata.json with 10k users and compares the old linear scan with the indexed lookup.
+Run from the repository root: python tools/bench_user_database.py [users] [lookups]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from user_database import UserDatabase  # noqa: E402
+
+
+def make_users(count):
+    users = {}
+    for i in range(count):
+        users['U{}'.format(i)] = {'name': 'user{}'.format(i),
+                                  'dooring': '{:05d}'.format(i),
+                                  'type': 'user',
+                                  'password': '{:06d}'.format(i * 7 % 1000000),
+                                  'code_outdoor': '{:04d}'.format(i),
+                                  'ID': str(18000000000 + i),
+                                  'level': ''}
+    return users
+
+
+def linear_search(data, key, value):
+    # search_data before the index was added
+    for sub_dict in data:
+        if value == data[sub_dict][key]:
+            return data[sub_dict]
+    return None
+
+
+def bench(label, func, keys):
+    start = time.perf_counter()
+    for key, value in keys:
+        func(key, value)
+    elapsed = time.perf_counter() - start
+    print('{:<8} {:>10.2f} us/lookup'.format(label, elapsed / len(keys) * 1e6))
+    return elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    users = make_users(count)
+    fd, path = tempfile.mkstemp(suffix='.json')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(users, f)
+    try:
+        start = time.perf_counter()
+        db = UserDatabase(path)
+        print('loaded {} users in {:.1f} ms'.format(count, (time.perf_counter() - start) * 1e3))
+
+        rng = random.Random(0)
+        names = list(users)
+        keys = []
+        for _ in range(lookups):
+            user = users[rng.choice(names)]
+            field = rng.choice(('password', 'code_outdoor'))
+            keys.append((field, user[field]))
+        keys.append(('password', 'missing'))
+
+        for key, value in keys:
+            assert linear_search(db.data, key, value) is db.search_data(key, value)
+        before = bench('linear', lambda k, v: linear_search(db.data, k, v), keys)
+        after = bench('indexed', db.search_data, keys)
+        print('speedup  {:>10.1f}x'.format(before / after))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+Precompress the static pages in www/ for the lock's web server.
+For every www/*.html this writes www/*.html.gz and records its ETag in www/manifest.json, which
+static_pages.StaticPages reads on the device. Run after editing a page, then upload www/ to the board:
+    python tools/build_www.py
+"""
+import binascii
+import gzip
+import json
+import os
+
+WWW = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'www')
+CONTENT_TYPES = {'.html': 'text/html; charset=utf-8',
+                 '.css': 'text/css',
+                 '.js': 'application/javascript'}
+
+
+def build(root=WWW):
+    manifest = {}
+    for name in sorted(os.listdir(root)):
+        base, ext = os.path.splitext(name)
+        if ext not in CONTENT_TYPES:
+            continue
+        with open(os.path.join(root, name), 'rb') as f:
+            data = f.read()
+        # mtime=0 使输出可复现, 内容不变时 ETag 不变
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        with open(os.path.join(root, name + '.gz'), 'wb') as f:
+            f.write(compressed)
+        path = '/' + (base if ext == '.html' else name)
+        manifest[path] = {'file': name + '.gz',
+                          'type': CONTENT_TYPES[ext],
+                          'etag': '"{:08x}"'.format(binascii.crc32(compressed)),
+                          'size': len(compressed)}
+        print('{:<28} {:>6} -> {:>5} bytes'.format(path, len(data), len(compressed)))
+    with open(os.path.join(root, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+if __name__ == '__main__':
+    build()
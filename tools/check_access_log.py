@@ -0,0 +1,60 @@
+"""
+Host-side check of the record.log ring buffer (access_log.AccessLog) when it is reopened, in a
+scratch directory:
+- the legacy record.txt is imported on the first start and renamed to record.txt.imported;
+- reopening with a smaller or larger capacity, or another slot_size, keeps the newest records
+  instead of recreating the log, and never brings the legacy lines back;
+- a file that is not a record log is recreated without importing record.txt a second time.
+Run from the repository root: python tools/check_access_log.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from access_log import AccessLog  # noqa: E402
+from checks import Checks  # noqa: E402
+
+LEGACY = ['legacy {}'.format(i) for i in range(3)]
+
+
+def main():
+    checks = Checks()
+    directory = tempfile.mkdtemp(prefix='door_lock_')
+    os.chdir(directory)
+    with open('record.txt', 'w') as f:
+        f.write('\n'.join(LEGACY) + '\n')
+
+    log = AccessLog(capacity=10)
+    checks.check('record.txt is imported on the first start', list(log.records()) == LEGACY)
+    checks.check('record.txt is renamed once imported',
+                 not os.path.exists('record.txt') and os.path.exists('record.txt.imported'))
+    new = ['unlock {}'.format(i) for i in range(6)]
+    for record in new:
+        log.append(record)
+
+    log = AccessLog(capacity=5)
+    records = list(log.records())
+    checks.check('a smaller capacity keeps the newest records', records == new[-5:], str(records))
+    log.append('unlock 6')
+    kept = new[-4:] + ['unlock 6']
+    log = AccessLog(capacity=20)
+    records = list(log.records())
+    checks.check('a larger capacity keeps every record', records == kept, str(records))
+    log = AccessLog(capacity=20, slot_size=48)
+    records = list(log.records())
+    checks.check('another slot_size keeps every record', records == kept, str(records))
+    log.append('unlock 7')
+    checks.check('the migrated log keeps appending', list(log.records()) == kept + ['unlock 7'])
+    checks.check('no tmp file is left', not os.path.exists('record.log.tmp'))
+
+    with open('record.log', 'wb') as f:
+        f.write(b'garbage')
+    log = AccessLog(capacity=20)
+    checks.check('a broken log is recreated without the legacy lines', list(log.records()) == [])
+    return checks.report()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Host-side check of the rotary code entry (code_entry.CodeEntrySession) against a simulated clock.
+The session gets an injected clock that only moves when the check advances it, so timeouts are exact:
+- a code entered digit by digit comes out once the last digit is closed, 10 detents giving 0;
+- a pause longer than digit_timeout_ms drops the half-entered code, a pause of exactly
+  digit_timeout_ms does not, also across the ticks_ms wraparound;
+- abort() drops the code being entered and is only counted when a code was in progress;
+- the run-loop expiry path: lock_main.RotaryLock.run (with tools/host_stubs.py) aborts an expired
+  session on its own, without a further edge, and the next code is checked against the database.
+Run from the repository root: python tools/check_code_entry.py
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import host_stubs  # noqa: E402
+from checks import Checks, USERS  # noqa: E402
+from code_entry import CodeEntrySession  # noqa: E402
+
+TICKS_PERIOD = 1 << 30
+TIMEOUT_MS = 30000
+
+
+class SimClock:
+    def __init__(self, now=0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, ms):
+        self.now = (self.now + ms) % TICKS_PERIOD
+
+
+def turns(digits, first=1):
+    """
+    :return: rotary deltas that enter digits, each digit one run in alternating direction, plus the
+        first step of the next run that closes the last digit.
+    """
+    deltas = []
+    direction = first
+    for digit in digits:
+        deltas.extend([direction] * (digit or 10))
+        direction = -direction
+    deltas.append(direction)
+    return deltas
+
+
+def enter(session, clock, deltas, step_ms=100):
+    codes = []
+    for delta in deltas:
+        clock.advance(step_ms)
+        code = session.feed(delta)
+        if code is not None:
+            codes.append(code)
+    return codes
+
+
+def check_session(checks):
+    clock = SimClock()
+    session = CodeEntrySession(length=4, digit_timeout_ms=TIMEOUT_MS, clock=clock)
+    codes = enter(session, clock, turns((4, 2, 9, 8)))
+    checks.check('a complete code is returned', codes == ['4298'] and not session.active(), str(codes))
+    codes = enter(session, clock, turns((0, 1, 0, 3), first=-1))
+    checks.check('10 detents enter 0', codes == ['0103'], str(codes))
+
+    enter(session, clock, turns((2, 3))[:-1])
+    started = session.start
+    clock.advance(TIMEOUT_MS)
+    checks.check('not expired after exactly digit_timeout_ms', not session.expired() and session.active())
+    clock.advance(1)
+    checks.check('expired after digit_timeout_ms', session.expired())
+    codes = enter(session, clock, turns((4, 2, 9, 8)))
+    checks.check('the half-entered code is dropped on the next edge',
+                 codes == ['4298'] and session.abort_count == 1 and session.start != started, str(codes))
+
+    enter(session, clock, turns((5, 5))[:-1])
+    session.abort()
+    checks.check('abort() drops the code being entered', not session.active() and session.digits == [] and
+                 session.abort_count == 2)
+    session.abort()
+    checks.check('abort() while idle is not counted', session.abort_count == 2)
+    codes = enter(session, clock, turns((1, 2, 3, 4)))
+    checks.check('entry works again after abort()', codes == ['1234'], str(codes))
+
+    # ticks_ms 回绕: 数字之间跨过 2**30
+    clock.now = TICKS_PERIOD - 250
+    codes = enter(session, clock, turns((6, 1, 7, 2)))
+    checks.check('a code across the ticks wraparound', codes == ['6172'], str(codes))
+    clock.now = TICKS_PERIOD - 10
+    enter(session, clock, [1], step_ms=0)
+    clock.advance(TIMEOUT_MS)
+    checks.check('timeout across the ticks wraparound', not session.expired())
+    clock.advance(1)
+    checks.check('expiry across the ticks wraparound', session.expired())
+    session.abort()
+
+
+def check_run_loop(checks):
+    host_stubs.install()
+    host_stubs.workdir(USERS)
+    import lock_main
+
+    clock = SimClock()
+    rotary = lock_main.RotaryLock()
+    rotary.session = CodeEntrySession(length=4, digit_timeout_ms=TIMEOUT_MS, clock=clock)
+    verified = []
+    rotary.password_verification = verified.append
+
+    async def run():
+        task = asyncio.ensure_future(rotary.run(period=0.001))
+        for delta in turns((4, 2)):
+            clock.advance(100)
+            rotary.code_outdoor_get(clock(), delta)
+        await asyncio.sleep(0.01)
+        checks.check('run() keeps a session inside the timeout', rotary.session.active())
+        clock.advance(TIMEOUT_MS + 1)
+        await asyncio.sleep(0.01)
+        checks.check('run() aborts an expired session without a further edge',
+                     not rotary.session.active() and rotary.session.abort_count == 1)
+        for delta in turns((4, 2, 9, 8)):
+            clock.advance(100)
+            rotary.code_outdoor_get(clock(), delta)
+        await asyncio.sleep(0.01)
+        checks.check('the next code is passed to password_verification', verified == ['4298'], str(verified))
+        task.cancel()
+
+    asyncio.run(run())
+
+
+def main():
+    checks = Checks()
+    check_session(checks)
+    check_run_loop(checks)
+    return checks.report()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
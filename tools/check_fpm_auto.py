@@ -0,0 +1,170 @@
+"""
+Host-side check that the FPM383C driver never blocks the event loop on a UART created with a timeout.
+The driver runs against tools/fake_uart.py with timeout_ms (20000 like the example in
+FPM383C_default.py), where read()/readinto() wait for the bytes they were asked for just like the
+board's UART; a heartbeat task measures the longest stall of the asyncio loop meanwhile:
+- identify() gets every reply without stalling the loop, also with a stale acknowledgement left in the
+  UART by the previous command;
+- cancel() during an enroll() that gets no reply ends it on the Cancel acknowledgement;
+- a TOUCH_OUT edge runs identify() and then puts the module back to sleep through sleep();
+- read_sys_para() and model_sleep() return as soon as their reply is complete, model_sleep() after
+  playing the prompts still queued in Player.queue.
+Run from the repository root: python tools/check_fpm_auto.py [--uart-timeout 20000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import host_stubs  # noqa: E402
+from checks import Checks  # noqa: E402
+from fake_uart import FakeUART, ack_frame  # noqa: E402
+
+FINGER_ID = 3
+MAX_STALL_MS = 50
+
+
+class StubbedUART(FakeUART, host_stubs.UART):
+    # FPM383C 只接受 machine.UART 的实例
+    pass
+
+
+def responder(command):
+    code = command[9]
+    if code == 0x32:  # AutoIdentify: 合法性检测, 获取图像, 搜索到指纹
+        return [(20, ack_frame(b'\x00\x00\x00\x00\x00\x00')),
+                (30, ack_frame(b'\x00\x01\x00\x00\x00\x00')),
+                (40, ack_frame(b'\x00\x05' + FINGER_ID.to_bytes(2, 'big') + b'\x00\x64'))]
+    if code == 0x31:  # AutoEnroll: 没有手指, 一直不应答
+        return []
+    if code == 0x0f:  # ReadSysPara
+        return [(5, ack_frame(b'\x00' + bytes(range(16))))]
+    return [(5, ack_frame())]
+
+
+class Heartbeat:
+    """
+    Wakes up every millisecond and remembers the longest gap between two wakeups.
+    """
+
+    def __init__(self):
+        self.max_gap_ms = 0.0
+        self._task = None
+
+    async def _run(self, last):
+        while True:
+            now = time.monotonic()
+            self.max_gap_ms = max(self.max_gap_ms, (now - last) * 1000)
+            last = now
+            await asyncio.sleep(0.001)
+
+    def start(self):
+        # 从调用时开始计时, 被测协程在心跳任务第一次运行之前就阻塞也能发现
+        self.max_gap_ms = 0.0
+        self._task = asyncio.ensure_future(self._run(time.monotonic()))
+
+    def stop(self):
+        self._task.cancel()
+        return self.max_gap_ms
+
+
+async def run(FPM383C_default, checks, uart_timeout):
+    uart = StubbedUART(responder, timeout_ms=uart_timeout)
+    fpm = FPM383C_default.FPM383C(uart, touch_out=5)
+    heartbeat = Heartbeat()
+
+    heartbeat.start()
+    events = []
+    result = await fpm.identify(on_event=lambda event, reply: events.append(event))
+    stall = heartbeat.stop()
+    checks.check('identify() gets every reply', events == ['checked', 'image_captured', 'searched'] and
+                 fpm._result_dict.finger_id == FINGER_ID, str(events))
+    checks.check('identify() does not stall the loop', stall < MAX_STALL_MS, 'longest stall {:.0f} ms'.format(stall))
+
+    # enable_touch_wakeup 不读休眠应答, 应答留在串口里
+    identified = []
+    fpm.enable_touch_wakeup(on_identified=identified.append)
+    await asyncio.sleep(0.05)
+    heartbeat.start()
+    events = []
+    await fpm.identify(on_event=lambda event, reply: events.append(event))
+    stall = heartbeat.stop()
+    checks.check('a stale acknowledgement is flushed without blocking',
+                 events == ['checked', 'image_captured', 'searched'] and stall < MAX_STALL_MS,
+                 'longest stall {:.0f} ms'.format(stall))
+
+    heartbeat.start()
+    task = asyncio.ensure_future(fpm.enroll(1))
+    await asyncio.sleep(0.1)
+    fpm.cancel()
+    result = await asyncio.wait_for(task, 2)
+    stall = heartbeat.stop()
+    checks.check('cancel() ends an enroll() that gets no reply', result[-1:] == ['已取消'] and not fpm.busy)
+    checks.check('waiting for the enroll reply does not stall the loop', stall < MAX_STALL_MS,
+                 'longest stall {:.0f} ms'.format(stall))
+
+    heartbeat.start()
+    fpm.touch_out_pin.handler(fpm.touch_out_pin)
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if identified and not fpm._touch_pending:
+            break
+    stall = heartbeat.stop()
+    checks.check('a touch runs identify() and puts the module back to sleep',
+                 len(identified) == 1 and fpm.touch_count == 1 and uart.written[-1] == fpm._sleep_frame and
+                 not fpm.busy)
+    checks.check('the touch path does not stall the loop', stall < MAX_STALL_MS,
+                 'longest stall {:.0f} ms'.format(stall))
+    fpm.disable_touch_wakeup()
+    checks.check('the UART never waited for bytes', uart.blocked_ms < MAX_STALL_MS,
+                 '{:.0f} ms blocked'.format(uart.blocked_ms))
+
+
+def check_blocking_calls(FPM383C_default, checks, uart_timeout):
+    uart = StubbedUART(responder, timeout_ms=uart_timeout)
+    fpm = FPM383C_default.FPM383C(uart)
+    start = time.monotonic()
+    para = fpm.read_sys_para()
+    elapsed = (time.monotonic() - start) * 1000
+    checks.check('read_sys_para() returns once the reply is complete',
+                 para['EnrollTimes'] == 0x0001 and elapsed < MAX_STALL_MS * 2, '{:.0f} ms'.format(elapsed))
+    queue = fpm.player.queue
+    queued = len(queue)
+    start = time.monotonic()
+    code = fpm.model_sleep()
+    elapsed = (time.monotonic() - start) * 1000
+    checks.check('model_sleep() returns once the acknowledgement is complete and the prompts are played',
+                 code == 0 and not len(queue) and elapsed < MAX_STALL_MS * 2 + queued * queue.interval_ms,
+                 '{:.0f} ms, {} prompts'.format(elapsed, queued))
+
+
+def check_fake_uart(checks):
+    # 确认模拟串口确实像带 timeout 的串口一样阻塞, 否则上面的检查没有意义
+    uart = FakeUART(responder, timeout_ms=100)
+    start = time.monotonic()
+    data = uart.read()
+    elapsed = (time.monotonic() - start) * 1000
+    checks.check('the fake UART blocks a bare read() for its timeout', data is None and elapsed >= 100,
+                 '{:.0f} ms'.format(elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--uart-timeout', type=int, default=20000, help='ms, timeout of the fake UART')
+    args = parser.parse_args()
+
+    host_stubs.install()
+    import FPM383C_default
+
+    checks = Checks()
+    check_fake_uart(checks)
+    asyncio.run(run(FPM383C_default, checks, args.uart_timeout))
+    check_blocking_calls(FPM383C_default, checks, args.uart_timeout)
+    return checks.report()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
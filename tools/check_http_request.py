@@ -0,0 +1,170 @@
+"""
+Corpus check of the incremental HTTP request parser (http_request.RequestParser).
+Every request of the corpus is fed to a fresh parser byte by byte, in random pieces (--splits
+random splittings per request) and in one piece, and must give the same result every time: the
+expected method, path, headers and body, or a ValueError with the expected message.
+feed() must not report completion before the last byte of the request has arrived.
+The form()/args() cases check percent-decoding, including malformed escapes, which stay literal.
+Run from the repository root: python tools/check_http_request.py [--splits 50]
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import http_request  # noqa: E402
+
+
+def post(path, body):
+    return 'POST {} HTTP/1.1\r\nHost: lock\r\nContent-Length: {}\r\n\r\n'.format(path, len(body)).encode() + body
+
+
+BIG_HEADER = 'X-Filler: ' + 'a' * http_request.MAX_HEADER_SIZE + '\r\n'
+
+# (name, raw request, expected) where expected is a dict of attributes or 'error: <message>'
+CORPUS = [
+    ('GET without body', b'GET /password HTTP/1.1\r\nHost: lock\r\n\r\n',
+     {'method': 'GET', 'path': '/password', 'body': b''}),
+    ('GET with query', b'GET /record?page=2&type=WLAN HTTP/1.1\r\nHost: lock\r\n\r\n',
+     {'path': '/record', 'query': 'page=2&type=WLAN', 'args': {'page': '2', 'type': 'WLAN'}}),
+    ('header names are case-insensitive', b'GET / HTTP/1.1\r\nIF-None-Match: "abc"\r\n\r\n',
+     {'headers': {'if-none-match': '"abc"'}}),
+    ('POST form body', post('/pwd', b'password=111111&play=on'),
+     {'method': 'POST', 'path': '/pwd', 'form': {'password': '111111', 'play': 'on'}}),
+    ('body arrives after the headers', post('/reset-password', b'JX=A&old-password=1&password=2'),
+     {'form': {'JX': 'A', 'old-password': '1', 'password': '2'}}),
+    ('body with CRLF inside', post('/pwd', b'a=1\r\n\r\nb=2'), {'body': b'a=1\r\n\r\nb=2'}),
+    ('bytes after Content-Length are ignored', post('/pwd', b'password=1') + b'GET / HTTP/1.1\r\n',
+     {'body': b'password=1'}),
+    ('header at the size limit', b'GET / HTTP/1.1\r\nX: ' + b'a' * (http_request.MAX_HEADER_SIZE - 19) + b'\r\n\r\n',
+     {'method': 'GET'}),
+    ('body at the size limit', post('/pwd', b'a' * http_request.MAX_BODY_SIZE),
+     {'body': b'a' * http_request.MAX_BODY_SIZE}),
+    ('header one byte over the limit',
+     b'GET / HTTP/1.1\r\nX: ' + b'a' * (http_request.MAX_HEADER_SIZE - 18) + b'\r\n\r\n', 'error: request header too large'),
+    ('header too large', 'GET / HTTP/1.1\r\n{}\r\n'.format(BIG_HEADER).encode(), 'error: request header too large'),
+    ('header too large, never terminated', b'GET / HTTP/1.1\r\n' + b'a' * (http_request.MAX_HEADER_SIZE + 10),
+     'error: request header too large'),
+    ('body too large', post('/pwd', b'a' * (http_request.MAX_BODY_SIZE + 1)), 'error: request body too large'),
+    ('Content-Length not a number', b'POST /pwd HTTP/1.1\r\nContent-Length: abc\r\n\r\nx', 'error: bad content-length'),
+    ('Content-Length negative', b'POST /pwd HTTP/1.1\r\nContent-Length: -1\r\n\r\nx', 'error: bad content-length'),
+    ('Content-Length with sign', b'POST /pwd HTTP/1.1\r\nContent-Length: +1\r\n\r\nx', 'error: bad content-length'),
+    ('Content-Length with underscore', b'POST /pwd HTTP/1.1\r\nContent-Length: 1_0\r\n\r\n0123456789',
+     'error: bad content-length'),
+    ('Content-Length empty', b'POST /pwd HTTP/1.1\r\nContent-Length:\r\n\r\n', 'error: bad content-length'),
+    ('bad request line', b'GET /\r\nHost: lock\r\n\r\n', 'error: bad request line'),
+    ('bad header line', b'GET / HTTP/1.1\r\nno colon here\r\n\r\n', 'error: bad header line'),
+]
+
+# (query string, expected parse_query result)
+FORMS = [
+    ('password=111111', {'password': '111111'}),
+    ('name=a+b&x=%41%42', {'name': 'a b', 'x': 'AB'}),
+    ('name=%E4%BD%A0%e5%a5%bd', {'name': '你好'}),
+    ('a=100%', {'a': '100%'}),
+    ('a=%-1', {'a': '%-1'}),
+    ('a=%-0', {'a': '%-0'}),
+    ('a=%+1', {'a': '% 1'}),
+    ('a=%1', {'a': '%1'}),
+    ('a=x%2', {'a': 'x%2'}),
+    ('a=%zz', {'a': '%zz'}),
+    ('a=%%41', {'a': '%A'}),
+    ('a=%2', {'a': '%2'}),
+    ('%41=b', {'A': 'b'}),
+    ('a=&=b&c', {'a': '', '': 'b', 'c': ''}),
+]
+
+
+def feed(raw, pieces):
+    """
+    :return: (HTTPRequest or error string, True if feed() reported completion before the last byte)
+    """
+    parser = http_request.RequestParser()
+    offset = 0
+    try:
+        for piece in pieces:
+            offset += len(piece)
+            if parser.feed(piece):
+                return parser.request, offset < expected_length(raw)
+        return 'incomplete', False
+    except ValueError as e:
+        return 'error: ' + str(e), False
+
+
+def expected_length(raw):
+    # 请求本身的长度: 头部 + Content-Length, 之后的字节属于下一个请求
+    head, sep, _ = raw.partition(b'\r\n\r\n')
+    if not sep:
+        return len(raw)
+    for line in head.split(b'\r\n')[1:]:
+        name, _, value = line.partition(b':')
+        if name.strip().lower() == b'content-length' and value.strip().isdigit():
+            return len(head) + 4 + int(value)
+    return len(head) + 4
+
+
+def splittings(raw, count, rng):
+    yield 'byte by byte', [raw[i:i + 1] for i in range(len(raw))]
+    yield 'in one piece', [raw]
+    boundary = raw.find(b'\r\n\r\n')
+    if boundary >= 0:
+        for cut in range(boundary, boundary + 4):
+            yield 'split at header end +{}'.format(cut - boundary), [raw[:cut], raw[cut:]]
+    for _ in range(count):
+        cuts = sorted(rng.sample(range(1, len(raw)), min(len(raw) - 1, rng.randint(1, 8))))
+        yield 'random pieces', [raw[a:b] for a, b in zip([0] + cuts, cuts + [len(raw)])]
+
+
+def matches(result, expected):
+    if isinstance(expected, str):
+        return result == expected
+    if isinstance(result, str):
+        return False
+    for name, value in expected.items():
+        if name in ('args', 'form'):
+            actual = getattr(result, name)()
+        elif name == 'headers':
+            actual = {key: result.headers.get(key) for key in value}
+        else:
+            actual = getattr(result, name)
+        if actual != value:
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--splits', type=int, default=50, help='random splittings per request')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    failures = 0
+    feeds = 0
+    for name, raw, expected in CORPUS:
+        failed = None
+        for how, pieces in splittings(raw, args.splits, rng):
+            feeds += 1
+            result, early = feed(raw, pieces)
+            if early or not matches(result, expected):
+                failed = '{}: {}'.format(how, 'completed early' if early else result)
+                break
+        print('{:<4} {}{}'.format('ok' if failed is None else 'FAIL', name, ' (' + failed + ')' if failed else ''))
+        failures += failed is not None
+    for query, expected in FORMS:
+        try:
+            result = http_request.parse_query(query)
+        except ValueError as e:
+            result = 'error: ' + str(e)
+        ok = result == expected
+        print('{:<4} form {!r} -> {!r}'.format('ok' if ok else 'FAIL', query, result))
+        failures += not ok
+    print('{} requests fed {} ways, {} form cases'.format(len(CORPUS), feeds, len(FORMS)))
+    print('OK' if not failures else '{} CASES FAILED'.format(failures))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
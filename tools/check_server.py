@@ -0,0 +1,162 @@
+"""
+Host-side check of the lock's asyncio web server (lock_main.Server) under CPython.
+machine, network and ntptime are replaced by tools/host_stubs.py, the server listens on a local port
+and the check drives it through real sockets:
+- the static pages, /pwd (right and wrong password), /reset-password, /record and /metrics;
+- the lock hold runs on the timer: the response comes back at once and the pin drops after hold_ms;
+- slow clients dribbling one byte at a time do not delay other clients, and a client that never
+  finishes its request is dropped after REQUEST_TIMEOUT;
+- repeated wrong passwords get 429 with a Retry-After header, and wrong passwords from more web
+  sources than the limiter tracks do not clear a lockout of the rotary dial.
+Run from the repository root: python tools/check_server.py [--clients 30] [--slow-clients 5]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import host_stubs  # noqa: E402
+from checks import Checks, USERS  # noqa: E402
+
+
+async def request(port, raw, slow=0.0, timeout=10):
+    """
+    :return: (status code or None when the server closed without answering, headers, body, seconds)
+    """
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        if slow:
+            for i in range(len(raw)):
+                writer.write(raw[i:i + 1])
+                await writer.drain()
+                await asyncio.sleep(slow)
+        else:
+            writer.write(raw)
+            await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+    if not response:
+        return None, '', b'', elapsed
+    head, _, body = response.partition(b'\r\n\r\n')
+    lines = head.decode().split('\r\n')
+    return int(lines[0].split()[1]), '\r\n'.join(lines[1:]), body, elapsed
+
+
+def get(path):
+    return 'GET {} HTTP/1.1\r\nHost: lock\r\n\r\n'.format(path).encode()
+
+
+def post(path, form):
+    body = '&'.join('{}={}'.format(k, v) for k, v in form.items()).encode()
+    return 'POST {} HTTP/1.1\r\nHost: lock\r\nContent-Type: application/x-www-form-urlencoded\r\n' \
+           'Content-Length: {}\r\n\r\n'.format(path, len(body)).encode() + body
+
+
+async def run(lock_main, checks, clients, slow_clients):
+    server = lock_main.Server()
+    listener = await asyncio.start_server(server.handle_client, '127.0.0.1', 0)
+    port = listener.sockets[0].getsockname()[1]
+    lock = lock_main.lock
+    lock.hold_ms = 300
+    try:
+        status, headers, body, _ = await request(port, get('/password'))
+        checks.check('GET /password serves the gzip page', status == 200 and 'gzip' in headers.lower())
+        status, _, _, _ = await request(port, get('/nothing-here'))
+        checks.check('unknown path is 404', status == 404)
+
+        status, _, body, elapsed = await request(port, post('/pwd', {'password': '111111'}))
+        checks.check('/pwd with the right password opens the lock',
+                     status == 200 and 'Alice'.encode() in body and lock.pin.value() == 1)
+        checks.check('/pwd answers without waiting for the lock hold', elapsed < lock.hold_ms / 1000,
+                     '{:.0f} ms'.format(elapsed * 1000))
+        await asyncio.sleep(lock.hold_ms / 1000 + 0.2)
+        checks.check('the lock pin drops after hold_ms', lock.pin.value() == 0)
+
+        status, _, body, _ = await request(port, post('/pwd', {'password': '999999'}))
+        checks.check('/pwd with a wrong password is refused',
+                     status == 200 and '有误'.encode() in body and lock.pin.value() == 0)
+        lock_main.limiter.success('127.0.0.1')
+
+        status, _, body, _ = await request(port, post('/reset-password', {
+            'JX': 'B', 'old-password': '222222', 'password': '333333'}))
+        checks.check('/reset-password changes the password', status == 200 and '成功'.encode() in body)
+        status, _, body, _ = await request(port, post('/pwd', {'password': '333333'}))
+        checks.check('the new password unlocks', status == 200 and 'Bob'.encode() in body)
+
+        status, _, body, _ = await request(port, get('/record?type=WLAN'))
+        checks.check('/record lists the web unlocks', status == 200 and body.count(b'<td>WLAN</td>') == 2)
+        status, _, body, _ = await request(port, get('/metrics'))
+        checks.check('/metrics reports the rejected attempts',
+                     status == 200 and b'unlock_attempts_rejected_total 0' in body)
+
+        # 并发: 慢速客户端逐字节发送, 同时大量正常客户端请求
+        hanging = asyncio.ensure_future(request(port, b'GET /password HTTP/1.1\r\n', timeout=30))
+        slow = [asyncio.ensure_future(request(port, get('/password'), slow=0.02)) for _ in range(slow_clients)]
+        await asyncio.sleep(0.05)
+        fast = await asyncio.gather(*(request(port, get('/password')) for _ in range(clients)))
+        worst = max(result[3] for result in fast)
+        checks.check('{} clients served while {} slow clients dribble'.format(clients, slow_clients),
+                     all(result[0] == 200 for result in fast) and worst < 1.0, 'slowest {:.0f} ms'.format(worst * 1000))
+        slow_results = await asyncio.gather(*slow)
+        checks.check('the slow clients are served too', all(result[0] == 200 for result in slow_results))
+        status, _, _, elapsed = await hanging
+        checks.check('an unfinished request is dropped after REQUEST_TIMEOUT',
+                     status is None and lock_main.REQUEST_TIMEOUT <= elapsed < lock_main.REQUEST_TIMEOUT + 2,
+                     '{:.1f} s'.format(elapsed))
+
+        statuses = []
+        for _ in range(lock_main.limiter.burst + 1):
+            status, headers, _, _ = await request(port, post('/pwd', {'password': '000000'}))
+            statuses.append(status)
+        checks.check('repeated wrong passwords get 429 with Retry-After',
+                     statuses[-1] == 429 and 'Retry-After:' in headers, str(statuses))
+        status, _, _, _ = await request(port, post('/pwd', {'password': '111111'}))
+        checks.check('the right password is refused while locked out', status == 429 and lock.pin.value() == 0)
+        status, _, body, _ = await request(port, get('/metrics'))
+        checks.check('/metrics counts the rejections', b'unlock_attempts_rejected_total 2' in body)
+
+        # 旋钮锁定后, 大量不同来源的网页请求不能把它的锁定挤掉
+        rotary = lock_main.RotaryLock(server.db)
+        for _ in range(lock_main.rotary_limiter.burst):
+            rotary.password_verification('0000')
+        opened = lock.open_count
+        peer_address = lock_main.peer_address
+        sources = iter(range(1, 1000))
+        lock_main.peer_address = lambda writer: '10.0.0.{}'.format(next(sources))
+        try:
+            for _ in range(lock_main.limiter.size + 4):
+                await request(port, post('/pwd', {'password': '000000'}))
+        finally:
+            lock_main.peer_address = peer_address
+        rotary.password_verification('1234')
+        checks.check('web sources do not evict the rotary lockout',
+                     lock.open_count == opened and lock_main.rotary_limiter.locked_ms('rotary') > 0)
+    finally:
+        listener.close()
+        await listener.wait_closed()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=30)
+    parser.add_argument('--slow-clients', type=int, default=5)
+    args = parser.parse_args()
+
+    host_stubs.install()
+    host_stubs.workdir(USERS)
+    import lock_main
+    lock_main.REQUEST_TIMEOUT = 1
+
+    checks = Checks()
+    asyncio.run(run(lock_main, checks, args.clients, args.slow_clients))
+    return checks.report()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+Host-side check that logging an unlock never touches the network, and of the TimeKeeper schedule.
+ntptime is the counting stub from tools/host_stubs.py:
+- lock_main.write_record is called --records times, then the rotary and web unlock paths a hundredth
+  as often, and ntptime.settime() must not be called apart from the sync on boot;
+- TimeKeeper, driven by a simulated clock, must sync on boot, skip polls inside the interval, sync
+  again once it has passed, retry a failed sync after retry_interval, doubled after every further
+  failure, and report the RTC drift;
+- poll() returns at once while settime() hangs (offline: DNS and socket timeouts), and does not start
+  a second sync while one is running.
+Run from the repository root: python tools/check_timekeeper.py [--records 1000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import host_stubs  # noqa: E402
+from checks import Checks, USERS  # noqa: E402
+
+
+class SimClock:
+    """
+    Stands in for the time module and the RTC: time() is the RTC in local time, settime() (installed
+    as ntptime.settime) sets it to UTC like the real one, and rtc.datetime(...) moves it back to local.
+    """
+
+    def __init__(self, utc, offset, drift=0):
+        self.utc = utc
+        self.offset = offset
+        self.now = utc + offset + drift
+        self.calls = 0
+        self.fail = False
+        self.hang = None  # threading.Event: settime() waits for it, like a sync stuck in a timeout
+
+    def time(self):
+        return self.now
+
+    def localtime(self, seconds=None):
+        return time.gmtime(self.now if seconds is None else seconds)
+
+    def advance(self, seconds, drift=0):
+        self.utc += seconds
+        self.now += seconds + drift
+
+    def settime(self):
+        self.calls += 1
+        if self.hang is not None:
+            self.hang.wait(5)
+        if self.fail:
+            raise OSError('ntp unreachable')
+        self.now = self.utc
+
+    def datetime(self, value=None):
+        if value is not None:
+            self.now = self.utc + self.offset
+
+
+def check_records(checks, records):
+    import lock_main
+
+    ntptime = host_stubs.ntptime
+    ntptime.calls = 0
+    count = lock_main.access_log.count
+    start = time.perf_counter()
+    for i in range(records):
+        lock_main.write_record('+WLAN+user{}'.format(i))
+    elapsed = time.perf_counter() - start
+    checks.check('{} write_record calls make no NTP call'.format(records), ntptime.calls == 0,
+                 '{:.0f} us per record'.format(elapsed / records * 1e6))
+    checks.check('the records are in the access log',
+                 lock_main.access_log.count == min(lock_main.access_log.capacity, count + records))
+
+    server = lock_main.Server()
+    checks.check('the server syncs once on boot', ntptime.calls == 1)
+    rotary = lock_main.RotaryLock(server.db)
+
+    async def unlocks():
+        for _ in range(records // 100):
+            rotary.password_verification('1234')
+            lock_main.limiter.success('127.0.0.1')
+            await server.pwd(NullWriter(), FormRequest({'password': '111111'}))
+
+    opened = lock_main.lock.open_count
+    asyncio.run(unlocks())
+    checks.check('rotary and web unlocks make no NTP call',
+                 ntptime.calls == 1 and lock_main.lock.open_count - opened == 2 * (records // 100),
+                 '{} unlocks'.format(lock_main.lock.open_count - opened))
+
+
+class NullWriter:
+    def get_extra_info(self, name):
+        return ('127.0.0.1', 0)
+
+    def write(self, data):
+        pass
+
+    async def drain(self):
+        pass
+
+
+class FormRequest:
+    def __init__(self, form):
+        self._form = form
+
+    def form(self):
+        return self._form
+
+
+def poll(keeper):
+    # poll() 在后台线程中对时, 等它结束后再检查结果
+    started = keeper.poll()
+    for _ in range(500):
+        if not keeper.syncing:
+            break
+        time.sleep(0.001)
+    return started
+
+
+def check_schedule(checks):
+    import timekeeper
+
+    offset = 8 * 3600
+    clock = SimClock(utc=1700000000, offset=offset)
+    timekeeper.time = clock
+    timekeeper.ntptime.settime = clock.settime
+    keeper = timekeeper.TimeKeeper(clock, timeoffset=offset, interval=6 * 3600, retry_interval=60)
+
+    checks.check('poll syncs on boot', poll(keeper) and clock.calls == 1 and keeper.sync_count == 1)
+    for _ in range(10):
+        clock.advance(600)
+        poll(keeper)
+    checks.check('no sync inside the interval', clock.calls == 1)
+
+    clock.advance(6 * 3600, drift=5)
+    poll(keeper)
+    checks.check('sync once the interval has passed', clock.calls == 2 and keeper.sync_count == 2)
+    checks.check('drift against the RTC is reported', keeper.drift == 5, 'drift {} s'.format(keeper.drift))
+    checks.check('the RTC is back on local time', clock.now == clock.utc + offset)
+
+    # 断网: 每次失败后重试间隔加倍, 60, 120, 240 秒
+    clock.advance(6 * 3600)
+    clock.fail = True
+    poll(keeper)
+    attempts = []  # 第一次失败之后的秒数
+    for elapsed in range(10, 7 * 60 + 1, 10):
+        clock.advance(10)
+        calls = clock.calls
+        poll(keeper)
+        if clock.calls != calls:
+            attempts.append(elapsed)
+    retries = [b - a for a, b in zip([0] + attempts, attempts)]
+    checks.check('failed syncs back off 60, 120, 240 s', retries == [60, 120, 240], str(retries))
+    clock.fail = False
+    clock.advance(480)
+    poll(keeper)
+    checks.check('a successful sync ends the backoff', keeper.failures == 0 and keeper.sync_count == 3)
+
+    clock.advance(6 * 3600)
+    clock.hang = threading.Event()
+    calls = clock.calls
+    start = time.perf_counter()
+    started = keeper.poll()
+    elapsed = (time.perf_counter() - start) * 1000
+    checks.check('poll() returns while settime() hangs', started and keeper.syncing and elapsed < 50,
+                 '{:.1f} ms'.format(elapsed))
+    checks.check('no second sync while one is running', not keeper.poll() and clock.calls == calls + 1)
+    clock.hang.set()
+    clock.hang = None
+    poll(keeper)
+    checks.check('the hung sync completes in the background', not keeper.syncing and keeper.sync_count == 4)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, default=1000)
+    args = parser.parse_args()
+
+    host_stubs.install()
+    host_stubs.workdir(USERS)
+    checks = Checks()
+    check_records(checks, args.records)
+    check_schedule(checks)
+    return checks.report()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
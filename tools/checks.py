@@ -0,0 +1,34 @@
+"""
+Shared pieces of the host-side checks in tools/: the Checks reporter and the user fixture the
+checks write as Userdata.json through host_stubs.workdir().
+"""
+
+# Alice 和 Bob: 网页密码、旋钮密码各不相同
+USERS = {
+    'A': {'name': 'Alice', 'dooring': '00001', 'type': 'user', 'password': '111111', 'code_outdoor': '1234',
+          'ID': '100', 'level': ''},
+    'B': {'name': 'Bob', 'dooring': '00002', 'type': 'user', 'password': '222222', 'code_outdoor': '4321',
+          'ID': '200', 'level': ''},
+}
+
+
+class Checks:
+    """
+    Prints one ok/FAIL line per check and counts the failures.
+    """
+
+    def __init__(self):
+        self.failed = 0
+
+    def check(self, name, ok, detail=''):
+        print('{:<4} {}{}'.format('ok' if ok else 'FAIL', name, ' (' + detail + ')' if detail else ''))
+        if not ok:
+            self.failed += 1
+
+    def report(self):
+        """
+        Print the summary line.
+        :return: The exit code of the check script, 1 if any check failed.
+        """
+        print('OK' if not self.failed else '{} CHECKS FAILED'.format(self.failed))
+        return 1 if self.failed else 0
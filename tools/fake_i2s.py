@@ -0,0 +1,130 @@
+"""
+A stand-in for machine.I2S in RX mode with the non-blocking readinto/irq interface, driven by the
+asyncio loop: every readinto() completes after the real-time duration of the buffer, like the I2S DMA
+does, and the irq handler is then called from the loop (as micropython.schedule would).
+Running this file streams the fake microphone through AudioStream to tools/audio_sink.py on a local
+port and reports sustained throughput, gaps and dropped chunks.
+Run from the repository root: python tools/fake_i2s.py [--seconds 5] [--chunk 1024] [--sink-rate 0]
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import socket
+import sys
+import threading
+import wave
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from audio_stream import AudioStream  # noqa: E402
+import audio_sink  # noqa: E402
+
+
+def synthetic_pcm(rate, seconds, seed=0):
+    """
+    Half a second of tone bursts alternating with quiet noise, 16 bit little endian mono.
+    """
+    rng = random.Random(seed)
+    samples = bytearray()
+    for n in range(int(rate * seconds)):
+        if (n // (rate // 2)) % 2:
+            value = 8000 * math.sin(2 * math.pi * 440 * n / rate) + rng.gauss(0, 300)
+        else:
+            value = rng.gauss(0, 100)
+        samples += int(max(-32768, min(32767, value))).to_bytes(2, 'little', signed=True)
+    return bytes(samples)
+
+
+def wav_pcm(file_name):
+    with wave.open(file_name, 'rb') as wav:
+        return wav.readframes(wav.getnframes()), wav.getframerate()
+
+
+class FakeI2S:
+    def __init__(self, pcm, rate=8000, bits=16, jitter_ms=0.0, seed=0):
+        self.pcm = pcm
+        self.bytes_per_second = rate * bits // 8
+        self.jitter_ms = jitter_ms
+        self.rng = random.Random(seed)
+        self._handler = None
+        self._pos = 0
+        self._due = None
+
+    def irq(self, handler):
+        self._handler = handler
+
+    def readinto(self, buf):
+        # 采样按真实时间到达: 每个缓冲区在上一块结束后 len(buf)/码率 秒填满
+        loop = asyncio.get_event_loop()
+        now = loop.time()
+        if self._due is None or self._due < now - 1:
+            self._due = now
+        self._due += len(buf) / self.bytes_per_second
+        delay = max(0.0, self._due - now + self.rng.uniform(0, self.jitter_ms) / 1000)
+        loop.call_later(delay, self._complete, buf)
+        return 0
+
+    def _complete(self, buf):
+        size = len(buf)
+        for i in range(size):
+            buf[i] = self.pcm[(self._pos + i) % len(self.pcm)]
+        self._pos = (self._pos + size) % len(self.pcm)
+        if self._handler is not None:
+            self._handler(self)
+
+
+def start_sink(rate, gap_ms, rate_limit=None, decoder=None, wav_name=None):
+    port = []
+    ready = threading.Event()
+    results = []
+
+    def on_ready(p):
+        port.append(p)
+        ready.set()
+
+    thread = threading.Thread(target=lambda: results.extend(audio_sink.serve(
+        0, rate, wav_name, gap_ms, once=True, decoder=decoder, rate_limit=rate_limit, ready=on_ready)))
+    thread.start()
+    ready.wait()
+    return port[0], thread, results
+
+
+def run(pcm, rate, seconds, chunk, stages=(), sink_rate=None, decoder=None, wav_name=None, jitter_ms=0.0):
+    port, thread, results = start_sink(rate, gap_ms=4 * chunk * 1000 / (2 * rate), rate_limit=sink_rate,
+                                       decoder=decoder, wav_name=wav_name)
+    sock = socket.create_connection(('127.0.0.1', port))
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 5744)  # lwIP 在 ESP32 上默认的 TCP 发送缓冲
+    stream = AudioStream(FakeI2S(pcm, rate, jitter_ms=jitter_ms), sock, chunk, stages)
+    asyncio.run(stream.run(duration_ms=int(seconds * 1000)))
+    sock.close()
+    thread.join()
+    return stream, results[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--chunk', type=int, default=1024, help='bytes per I2S buffer')
+    parser.add_argument('--rate', type=int, default=8000)
+    parser.add_argument('--wav', help='loop this WAV file instead of the synthetic signal')
+    parser.add_argument('--jitter', type=float, default=0, help='ms of random lateness per buffer')
+    parser.add_argument('--sink-rate', type=float, default=0, help='throttle the sink to this many B/s')
+    args = parser.parse_args()
+
+    if args.wav:
+        pcm, args.rate = wav_pcm(args.wav)
+    else:
+        pcm = synthetic_pcm(args.rate, 2)
+    stream, stats = run(pcm, args.rate, args.seconds, args.chunk, sink_rate=args.sink_rate or None,
+                        jitter_ms=args.jitter)
+    expected = args.rate * 2
+    print('source {} B/s, chunk {} B ({:.0f} ms)'.format(expected, args.chunk, args.chunk * 1000 / expected))
+    print('stream: captured {} dropped {} skipped {} sent {} B'.format(
+        stream.captured, stream.dropped, stream.skipped, stream.sent_bytes))
+    print('sink:   ' + stats.report())
+
+
+if __name__ == '__main__':
+    main()
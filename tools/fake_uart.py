@@ -0,0 +1,161 @@
+"""
+A stand-in for machine.UART that answers written commands the way the FPM383C would, with
+configurable timing: the reply starts reply_delay_ms after the command and then trickles out at the
+wire speed of the baud rate, optionally preceded by junk bytes. read()/readinto()/any() are
+non-blocking, like a MicroPython UART created without a timeout; with timeout_ms they block like one
+created with timeout=timeout_ms (the driver's example uses timeout=20000).
+Running this file compares the old fixed-sleep read (write, sleep 100 ms, sleep 1 ms, read) with the
+frame-aware FrameCodec.read_frame on the LED and query commands of finger.py.
+Run from the repository root: python tools/fake_uart.py [--reply-delay 5] [--baud 57600] [--junk 1]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import fpm_codec  # noqa: E402
+
+
+def ack_frame(payload=b'\x00', address=fpm_codec.DEFAULT_ADDRESS):
+    body = bytes([fpm_codec.PID_ACK]) + (len(payload) + 2).to_bytes(2, 'big') + payload
+    return fpm_codec.HEADER + address + body + (sum(body) & 0xffff).to_bytes(2, 'big')
+
+
+class FakeUART:
+    """
+    :param responder: Called with every written command, returns a list of (delay_ms, reply bytes);
+        delay_ms is counted from the end of the previous reply (or from the command for the first).
+    :param interrupting: Instruction codes (e.g. 0x30, Cancel) that make the module drop the replies it
+        has not sent yet for the previous command.
+    :param timeout_ms: 0 for a non-blocking UART. Otherwise read(n)/readinto() wait until n bytes
+        (the whole buffer) have arrived or timeout_ms has passed, and read() without a size waits
+        until no byte has arrived for timeout_ms. The time spent waiting is added up in blocked_ms.
+    """
+
+    def __init__(self, responder, baud=57600, junk=b'', interrupting=(0x30,), timeout_ms=0):
+        self.responder = responder
+        self.interrupting = interrupting
+        self.timeout_ms = timeout_ms
+        self.blocked_ms = 0.0
+        self.byte_time = 10 / baud  # 8N1: 10 bits per byte
+        self.junk = junk
+        self.written = []
+        self._schedule = []  # (time the byte is on the wire, byte, time the first byte of its reply is)
+
+    def write(self, data):
+        data = bytes(data)
+        self.written.append(data)
+        now = time.monotonic()
+        if len(data) > 9 and data[9] in self.interrupting:
+            # 已经开始发送的应答会发完, 其余的丢弃
+            self._schedule = [item for item in self._schedule if item[2] <= now]
+        t = max(now, self._schedule[-1][0] if self._schedule else now) + len(data) * self.byte_time
+        first = True
+        for delay_ms, reply in self.responder(data):
+            if first:
+                reply = self.junk + reply
+                first = False
+            t += delay_ms / 1000
+            start = t + self.byte_time
+            for byte in reply:
+                t += self.byte_time
+                self._schedule.append((t, byte, start))
+        return len(data)
+
+    def any(self):
+        now = time.monotonic()
+        count = 0
+        for t, _, _ in self._schedule:
+            if t > now:
+                break
+            count += 1
+        return count
+
+    def _wait(self, nbytes):
+        # 像设置了 timeout 的 MicroPython 串口一样等待: 凑够 nbytes 字节, 或超时内不再有新字节
+        start = time.monotonic()
+        deadline = start + self.timeout_ms / 1000
+        count = self.any()
+        while nbytes is None or count < nbytes:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            time.sleep(min(0.001, deadline - now))
+            if self.any() != count:
+                count = self.any()
+                if nbytes is None:
+                    deadline = time.monotonic() + self.timeout_ms / 1000
+        self.blocked_ms += (time.monotonic() - start) * 1000
+
+    def read(self, nbytes=None):
+        if self.timeout_ms:
+            self._wait(nbytes)
+        available = self.any()
+        if nbytes is not None:
+            available = min(available, nbytes)
+        if not available:
+            return None
+        data = bytes(item[1] for item in self._schedule[:available])
+        del self._schedule[:available]
+        return data
+
+    def readinto(self, buf, nbytes=None):
+        data = self.read(len(buf) if nbytes is None else min(nbytes, len(buf)))
+        if data is None:
+            return None
+        buf[:len(data)] = data
+        return len(data)
+
+
+def led_and_query_responder(reply_delay_ms):
+    def responder(command):
+        code = command[9]
+        if code == 0x1d:  # ValidTempleteNum
+            return [(reply_delay_ms, ack_frame(b'\x00\x00\x03'))]
+        return [(reply_delay_ms, ack_frame())]
+    return responder
+
+
+def old_read(uart, command):
+    uart.write(command)
+    time.sleep(0.1)  # FINGER.write_cmd
+    time.sleep(0.001)  # 调用者再等待
+    return uart.read()
+
+
+def new_read(uart, codec, command):
+    uart.write(command)
+    count = codec.read_frame(uart, 1000)
+    codec.decode(count)
+    return bytes(codec.rx_view[:count])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--reply-delay', type=float, default=5, help='ms between command and reply')
+    parser.add_argument('--baud', type=int, default=57600)
+    parser.add_argument('--junk', type=int, default=1, help='bytes of junk (0x55) before the first reply')
+    args = parser.parse_args()
+
+    commands = (('FINGERPRINT_NUMBER', b'\xEF\x01\xFF\xFF\xFF\xFF\x01\x00\x03\x1d\x00\x21'),
+                ('BREATH_LED', b'\xef\x01\xff\xff\xff\xff\x01\x00\x07\x3c\x01\x02\x04\x64\x00\xaf'),
+                ('BLUE_LED', b'\xef\x01\xff\xff\xff\xff\x01\x00\x07\x3c\x03\x01\x01\x05\x00\x4e'),
+                ('OFF_LED', b'\xef\x01\xff\xff\xff\xff\x01\x00\x07\x3c\x03\x00\x00\x01\x00\x48'))
+    codec = fpm_codec.FrameCodec()
+    print('{:<20} {:>10} {:>10}  reply'.format('command', 'old ms', 'new ms'))
+    for name, command in commands:
+        results = []
+        timings = []
+        for read in (lambda u: old_read(u, command), lambda u: new_read(u, codec, command)):
+            uart = FakeUART(led_and_query_responder(args.reply_delay), args.baud, b'\x55' * args.junk)
+            start = time.perf_counter()
+            results.append(read(uart))
+            timings.append((time.perf_counter() - start) * 1000)
+        assert results[0].endswith(results[1]), 'readers disagree'
+        print('{:<20} {:>10.2f} {:>10.2f}  {}'.format(name, timings[0], timings[1], results[1].hex()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""
+Stand-ins for the MicroPython modules (machine, network, ntptime, micropython) so that the board's
+modules, lock_main included, can be imported on a PC by the host-side checks in tools/.
+install() registers them in sys.modules. They record what the code asked of the hardware instead of
+doing it: UART writes are kept in UART.written, ntptime.settime() only counts its calls, Timer
+callbacks and micropython.schedule() run from the asyncio loop (or a thread / at once when no loop
+is running). micropython has no viper, so the modules fall back to their pure-Python paths.
+workdir() makes a scratch directory holding a copy of www/ and chdirs into it, since lock_main opens
+Userdata.json, record.log and www/ relative to the current directory like it does on the board.
+"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import types
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+class Pin:
+    IN = 1
+    OUT = 3
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_RISING = 1
+    IRQ_FALLING = 2
+
+    def __init__(self, pin_id, mode=None, pull=None, value=None):
+        self.id = pin_id
+        self.mode = mode
+        self.handler = None
+        self._value = 0 if value is None else value
+        self.history = []
+
+    def value(self, value=None):
+        if value is None:
+            return self._value
+        self._value = 1 if value else 0
+        self.history.append(self._value)
+
+    def irq(self, handler=None, trigger=None):
+        self.handler = handler
+
+
+class UART:
+    def __init__(self, uart_id, baudrate=9600, **kwargs):
+        self.id = uart_id
+        self.baudrate = baudrate
+        self.written = []
+
+    def write(self, data):
+        self.written.append(bytes(data))
+        return len(data)
+
+    def any(self):
+        return 0
+
+    def read(self, size=None):
+        return None
+
+    def readinto(self, buf, size=None):
+        return None
+
+
+class RTC:
+    def __init__(self):
+        now = time.localtime()
+        self._datetime = (now[0], now[1], now[2], now[6] + 1, now[3], now[4], now[5], 0)
+        self.writes = 0
+
+    def datetime(self, value=None):
+        if value is None:
+            return self._datetime
+        self._datetime = tuple(value)
+        self.writes += 1
+
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, timer_id=-1):
+        self.id = timer_id
+        self._handle = None
+
+    def init(self, mode=ONE_SHOT, period=1000, callback=None):
+        self.deinit()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            self._handle = loop.call_later(period / 1000, callback, self)
+        else:
+            self._handle = threading.Timer(period / 1000, callback, (self,))
+            self._handle.daemon = True
+            self._handle.start()
+
+    def deinit(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+
+class WLAN:
+    def __init__(self, interface=0):
+        self.interface = interface
+        self._active = False
+
+    def active(self, value=None):
+        if value is None:
+            return self._active
+        self._active = bool(value)
+
+    def config(self, **kwargs):
+        pass
+
+    def connect(self, ssid=None, password=None):
+        pass
+
+    def isconnected(self):
+        return True
+
+    def ifconfig(self):
+        return ('127.0.0.1', '255.0.0.0', '127.0.0.1', '127.0.0.1')
+
+
+def _schedule(func, arg):
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        func(arg)
+        return
+    loop.call_soon(func, arg)
+
+
+def _settime():
+    ntptime.calls += 1
+    if ntptime.fail:
+        raise OSError('ntp unreachable')
+
+
+machine = types.ModuleType('machine')
+machine.Pin = Pin
+machine.UART = UART
+machine.RTC = RTC
+machine.Timer = Timer
+
+network = types.ModuleType('network')
+network.STA_IF = 0
+network.AP_IF = 1
+network.WLAN = WLAN
+
+ntptime = types.ModuleType('ntptime')
+ntptime.host = 'pool.ntp.org'
+ntptime.calls = 0  # settime() 被调用的次数, 即网络对时次数
+ntptime.fail = False
+ntptime.settime = _settime
+
+micropython = types.ModuleType('micropython')
+micropython.const = lambda value: value
+micropython.schedule = _schedule
+
+
+def install():
+    sys.modules.setdefault('machine', machine)
+    sys.modules.setdefault('network', network)
+    sys.modules.setdefault('ntptime', ntptime)
+    sys.modules.setdefault('micropython', micropython)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+
+def workdir(users=None):
+    """
+    chdir into a fresh scratch directory with a copy of www/ and, if given, a Userdata.json.
+    :param users: username -> user dict written as the snapshot.
+    :return: The directory.
+    """
+    directory = tempfile.mkdtemp(prefix='door_lock_')
+    shutil.copytree(os.path.join(ROOT, 'www'), os.path.join(directory, 'www'))
+    if users is not None:
+        import json
+        with open(os.path.join(directory, 'Userdata.json'), 'w') as f:
+            json.dump(users, f)
+    os.chdir(directory)
+    return directory
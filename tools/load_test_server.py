@@ -0,0 +1,60 @@
+"""
+Concurrent load test for the lock's web server.
+Opens many connections at once, optionally dribbling the request out slowly, and reports latency per request.
+Run: python tools/load_test_server.py 192.168.1.50 --clients 50 --path /password
+"""
+import argparse
+import asyncio
+import time
+
+
+async def one_request(host, port, path, slow, timeout):
+    start = time.perf_counter()
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    request = 'GET {} HTTP/1.1\r\nHost: {}\r\n\r\n'.format(path, host).encode()
+    try:
+        if slow:
+            # 模拟慢速客户端: 每次只发一个字节
+            for i in range(len(request)):
+                writer.write(request[i:i + 1])
+                await writer.drain()
+                await asyncio.sleep(slow)
+        else:
+            writer.write(request)
+            await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    return time.perf_counter() - start, len(response)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('host')
+    parser.add_argument('--port', type=int, default=80)
+    parser.add_argument('--path', default='/password')
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--slow-clients', type=int, default=0, help='clients that send one byte every --slow seconds')
+    parser.add_argument('--slow', type=float, default=0.2)
+    parser.add_argument('--timeout', type=float, default=30)
+    args = parser.parse_args()
+
+    tasks = [one_request(args.host, args.port, args.path, args.slow, args.timeout) for _ in range(args.slow_clients)]
+    tasks += [one_request(args.host, args.port, args.path, 0, args.timeout) for _ in range(args.clients)]
+    start = time.perf_counter()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    elapsed = time.perf_counter() - start
+
+    fast = [r for r in results[args.slow_clients:] if not isinstance(r, Exception)]
+    errors = [r for r in results if isinstance(r, Exception)]
+    latencies = sorted(r[0] for r in fast)
+    print('{} requests in {:.2f} s, {} errors'.format(len(results), elapsed, len(errors)))
+    if latencies:
+        print('fast clients: min {:.0f} ms, median {:.0f} ms, max {:.0f} ms, {} bytes each'.format(
+            latencies[0] * 1e3, latencies[len(latencies) // 2] * 1e3, latencies[-1] * 1e3, fast[0][1]))
+    for error in errors[:5]:
+        print('error:', repr(error))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
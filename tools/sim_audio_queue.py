@@ -0,0 +1,112 @@
+"""
+Host-side simulation of the Player audio queue.
+Plays a few scripted scenarios (a burst of wrong-code alarms, a greeting racing an alarm, more
+prompts than the queue holds, a timer callback pushing while service() is picking the next command)
+through AudioQueue with its drain task running, against a fake UART that records when each command
+reaches the wire, and checks the pacing, that every command is written once and that the drain task
+survives.
+Run from the repository root: python tools/sim_audio_queue.py [--interval 100] [--collapse 1000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from audio_queue import AudioQueue, PRIORITY_ALARM, PRIORITY_GREETING  # noqa: E402
+
+
+class RecordingUART:
+    def __init__(self):
+        self.start = time.monotonic()
+        self.log = []  # (ms since start, command)
+
+    def write(self, data):
+        self.log.append(((time.monotonic() - self.start) * 1000, bytes(data)))
+        return len(data)
+
+
+class InterruptedList(list):
+    """
+    Pending list whose next pop() first runs interrupt(), like a machine.Timer callback that fires after
+    service() has picked the command to send and before it takes it out.
+    """
+
+    def __init__(self, interrupt):
+        super().__init__()
+        self.interrupt = interrupt
+
+    def pop(self, index=-1):
+        interrupt, self.interrupt = self.interrupt, None
+        if interrupt is not None:
+            interrupt()
+        return super().pop(index)
+
+
+def command(track):
+    return b'A7:' + track.encode()
+
+
+async def alarm_burst(queue):
+    # 连续输错密码: 200 ms 内 10 次 00099
+    for _ in range(10):
+        queue.push(command('00099'), PRIORITY_ALARM)
+        await asyncio.sleep(0.02)
+
+
+async def greeting_vs_alarm(queue):
+    queue.push(command('00001'))
+    queue.push(command('00002'))
+    queue.push(command('00099'), PRIORITY_ALARM)
+
+
+async def overflow(queue):
+    for i in range(queue.size + 4):
+        queue.push(command('{:05d}'.format(i + 10)))
+    queue.push(command('00099'), PRIORITY_ALARM)
+
+
+async def timer_push(queue):
+    # /indoor: LockActuator 的定时器回调 on_release 播放 00017, 恰好打断 service()
+    queue._pending = InterruptedList(lambda: queue.push(command('00017')))
+    queue.push(command('00001'))
+    queue.push(command('00099'), PRIORITY_ALARM)
+
+
+async def run_scenario(scenario, interval_ms, collapse_ms):
+    uart = RecordingUART()
+    queue = AudioQueue(uart, interval_ms=interval_ms, collapse_ms=collapse_ms)
+    drain = asyncio.create_task(queue.run())
+    await scenario(queue)
+    while len(queue) and not drain.done():
+        await asyncio.sleep(interval_ms / 1000)
+    await asyncio.sleep(interval_ms / 1000)
+    assert not drain.done(), 'the drain task died: {!r}'.format(drain.exception())
+    drain.cancel()
+    return queue, uart.log
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--interval', type=int, default=100, help='ms between two commands')
+    parser.add_argument('--collapse', type=int, default=1000, help='ms in which a repeated command is dropped')
+    args = parser.parse_args()
+
+    for scenario in (alarm_burst, greeting_vs_alarm, overflow, timer_push):
+        queue, log = asyncio.run(run_scenario(scenario, args.interval, args.collapse))
+        gaps = [b[0] - a[0] for a, b in zip(log, log[1:])]
+        print('{}: sent {} collapsed {} dropped {}, min gap {} ms'.format(
+            scenario.__name__, queue.sent, queue.collapsed, queue.dropped,
+            '{:.1f}'.format(min(gaps)) if gaps else '-'))
+        for t, data in log:
+            print('  {:8.1f} ms  {}'.format(t, data.decode()))
+        assert all(gap >= args.interval - 1 for gap in gaps), 'commands sent faster than the interval'
+        commands = [data for _, data in log]
+        assert len(set(commands)) == len(commands) == queue.sent, 'a command was written twice'
+    print('ok')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Host-side simulation of the deferred rotary event queue.
+Replays an edge timeline through Rotary._process_rotary_pins (what the pin IRQ runs) while a simulated
+consumer task calls drain() every --period ms, and checks that every detent reaches the listener.
+The timeline is either synthesized (--rate edges per second, random direction bursts) or read from a
+CSV file of "t_us,clk,dt" lines recorded from the encoder.
+Run from the repository root: python tools/sim_rotary_events.py --rate 20000 --period 10
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import rotary  # noqa: E402
+
+# (clk, dt) sequence of one full detent, starting from the 11 rest state
+CW_STEPS = ((1, 0), (0, 0), (0, 1), (1, 1))
+CCW_STEPS = ((0, 1), (0, 0), (1, 0), (1, 1))
+
+
+class SimRotary(rotary.Rotary):
+    def __init__(self, queue_size):
+        super().__init__(0, 1, 1, False, rotary.Rotary.RANGE_UNBOUNDED, False, False, queue_size)
+        self.clk = 1
+        self.dt = 1
+
+    def _hal_get_clk_value(self):
+        return self.clk
+
+    def _hal_get_dt_value(self):
+        return self.dt
+
+
+def synthesize(rate, detents, seed):
+    rng = random.Random(seed)
+    period_us = 1e6 / rate
+    timeline = []
+    expected = 0
+    t = 0.0
+    while abs(expected) < detents and len(timeline) < detents * 4:
+        direction = rng.choice((1, -1))
+        for _ in range(rng.randint(1, 10)):
+            for clk, dt in (CW_STEPS if direction > 0 else CCW_STEPS):
+                timeline.append((int(t), clk, dt))
+                t += period_us * rng.uniform(0.5, 1.5)
+            expected += direction
+    return timeline, expected
+
+
+def load(file_name):
+    timeline = []
+    with open(file_name) as f:
+        for line in f:
+            if line.strip() and not line.startswith('#'):
+                t_us, clk, dt = (int(v) for v in line.split(','))
+                timeline.append((t_us, clk, dt))
+    return timeline, None
+
+
+def simulate(timeline, period_ms, queue_size):
+    sim = SimRotary(queue_size)
+    now_us = [0]
+    rotary.ticks_ms = lambda: now_us[0] // 1000
+    received = []
+    sim.add_listener(lambda timestamp, delta: received.append((timestamp, delta)))
+    next_drain = period_ms * 1000
+    max_pending = 0
+    for t_us, clk, dt in timeline:
+        while t_us >= next_drain:
+            now_us[0] = next_drain
+            sim.drain()
+            next_drain += period_ms * 1000
+        now_us[0] = t_us
+        sim.clk, sim.dt = clk, dt
+        sim._process_rotary_pins(None)
+        max_pending = max(max_pending, sim.pending_events())
+    sim.drain()
+    ordered = all(received[i][0] <= received[i + 1][0] for i in range(len(received) - 1))
+    return received, sim.dropped_events, max_pending, ordered, sim.value()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rate', type=float, default=20000, help='edges per second')
+    parser.add_argument('--detents', type=int, default=100000)
+    parser.add_argument('--period', type=float, default=10, help='consumer drain period in ms')
+    parser.add_argument('--queue', type=int, default=64, help='event queue size')
+    parser.add_argument('--timeline', help='CSV file of t_us,clk,dt edges')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    timeline, expected = load(args.timeline) if args.timeline else synthesize(args.rate, args.detents, args.seed)
+    received, dropped, max_pending, ordered, value = simulate(timeline, args.period, args.queue)
+    total = sum(delta for _, delta in received)
+    print('edges {}, events delivered {}, dropped {}, max queue depth {}/{}'.format(
+        len(timeline), len(received), dropped, max_pending, args.queue - 1))
+    print('sum of deltas {}, encoder value {}, expected {}, timestamps ordered: {}'.format(
+        total, value, expected if expected is not None else value, ordered))
+    ok = dropped == 0 and total == value and ordered and (expected is None or total == expected)
+    print('OK' if ok else 'EVENTS LOST')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
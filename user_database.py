@@ -0,0 +1,305 @@
+import os
+import _thread
+
+try:
+    import ujson
+except ImportError:
+    import json as ujson
+
+# 建立二级索引的字段, 值可以重复(多个用户可能设置相同的密码); 值为列表时其中每一项都建立索引
+INDEXED_FIELDS = ('password', 'code_outdoor', 'ID', 'dooring', 'fingers')
+# 日志超过该字节数后在后台合并进快照
+JOURNAL_COMPACT_SIZE = 4096
+
+
+class UserDatabase:
+    """
+    User data stored in Userdata.json, with a secondary index per field in INDEXED_FIELDS
+    so that search_data() is a dict lookup instead of a scan over every user.
+    Changes are appended to a journal file (one json line per mutation) instead of rewriting
+    the whole snapshot; the journal is replayed on load and merged into the snapshot by a
+    background thread once it grows past compact_size bytes.
+    Attributes:
+        data(dict): username -> user dict, as stored in the json file.
+        index(dict): field -> {value: [username, ...]}, every user holding that value.
+    The 'fingers' field of a user is the list of fingerprint library IDs enrolled for that user.
+    """
+
+    def __init__(self, file_name='Userdata.json', indexed_fields=INDEXED_FIELDS, journal_name=None,
+                 compact_size=JOURNAL_COMPACT_SIZE):
+        self.file_name = file_name
+        if journal_name is None:
+            journal_name = file_name.rsplit('.', 1)[0] + '.journal'
+        self.journal_name = journal_name
+        self.compact_size = compact_size
+        self.indexed_fields = indexed_fields
+        self.index = {}
+        self._indexed_values = {}  # username -> {field: value} at the time it was indexed
+        self._lock = _thread.allocate_lock()
+        # 合并可能同时由后台线程和 save() 发起, 同一时间只能有一个在轮换日志和写快照
+        self._compact_lock = _thread.allocate_lock()
+        self._compact_runs = 0
+        self._listeners = []
+        self._compacting = False
+        self._journal_size = 0
+        try:
+            with open(file_name, 'r') as f:
+                self.data = ujson.load(f)
+        except (OSError, ValueError):
+            self.data = {}
+        # 上次合并中断时遗留的旧日志先回放
+        self._replay(self.journal_name + '.old')
+        self._journal_size = self._replay(self.journal_name)
+        self.build_index()
+
+    def _replay(self, journal_name):
+        size = 0
+        try:
+            with open(journal_name, 'r') as f:
+                for line in f:
+                    size += len(line)
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = ujson.loads(line)
+                    except ValueError:
+                        continue  # 断电时写了一半的行, 之后追加的内容另起一行
+                    self._apply(entry)
+        except OSError:
+            pass
+        return size
+
+    def _apply(self, entry):
+        if entry[0] == 'set':
+            if entry[1] in self.data:
+                self.data[entry[1]].update(entry[2])
+            else:
+                self.data[entry[1]] = entry[2]
+        elif entry[0] == 'del':
+            self.data.pop(entry[1], None)
+
+    def add_listener(self, listener):
+        """
+        Call listener(username) after every add, update or delete of a user.
+        """
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, username):
+        for listener in self._listeners:
+            listener(username)
+
+    def build_index(self):
+        self.index = {field: {} for field in self.indexed_fields}
+        self._indexed_values = {}
+        for username in self.data:
+            self._index_user(username)
+
+    def _index_user(self, username):
+        user_data = self.data[username]
+        indexed = {}
+        for field in self.indexed_fields:
+            if field in user_data:
+                value = user_data[field]
+                if isinstance(value, list):
+                    value = tuple(value)
+                    for item in value:
+                        self._index_value(field, item, username)
+                else:
+                    self._index_value(field, value, username)
+                indexed[field] = value
+        self._indexed_values[username] = indexed
+
+    def _unindex_user(self, username):
+        # 用户数据可能已经被调用者原地修改, 所以按索引时记录的旧值删除
+        indexed = self._indexed_values.pop(username, {})
+        for field in indexed:
+            field_index = self.index[field]
+            values = indexed[field]
+            for value in values if isinstance(values, tuple) else (values,):
+                usernames = field_index.get(value)
+                if usernames is not None and username in usernames:
+                    usernames.remove(username)
+                    if not usernames:
+                        del field_index[value]
+
+    def _index_value(self, field, value, username):
+        usernames = self.index[field].get(value)
+        if usernames is None:
+            self.index[field][value] = [username]
+        elif username not in usernames:
+            usernames.append(username)
+
+    def _first_user(self, key, value):
+        usernames = self.index[key].get(value)
+        if not usernames:
+            return None
+        if len(usernames) == 1:
+            return usernames[0]
+        # 值重复时和原来的顺序查找一样返回最先加入的用户
+        for username in self.data:
+            if username in usernames:
+                return username
+        return None
+
+    def _append_journal(self, entry):
+        """
+        Append one mutation to the journal; the caller holds _lock.
+        :return: True when a compaction should be started (after releasing _lock).
+        """
+        line = ujson.dumps(entry) + '\n'
+        with open(self.journal_name, 'a') as f:
+            f.write(line)
+        self._journal_size += len(line)
+        start_compact = self._journal_size > self.compact_size and not self._compacting
+        if start_compact:
+            self._compacting = True
+        return start_compact
+
+    def _start_compact(self):
+        try:
+            _thread.start_new_thread(self._background_compact, ())
+        except (OSError, RuntimeError):
+            self._background_compact()
+
+    def _background_compact(self):
+        try:
+            self.compact()
+        finally:
+            self._compacting = False
+
+    def compact(self):
+        """
+        Merge the journal into the snapshot file.
+        The journal is moved to *.old first so that mutations made while the snapshot is
+        being written go to a fresh journal; *.old is removed only once the new snapshot is in
+        place. If an earlier compaction was interrupted, *.old still holds entries that are not
+        in the snapshot file, so the journal is appended to it instead of replacing it.
+        Compactions are serialized: one started while another is running (e.g. save() during a
+        background compaction) waits for it, so an older snapshot never replaces a newer one.
+        """
+        old_name = self.journal_name + '.old'
+        with self._compact_lock:
+            with self._lock:
+                snapshot = ujson.dumps(self.data)
+                try:
+                    os.stat(old_name)
+                    old_exists = True
+                except OSError:
+                    old_exists = False
+                try:
+                    if old_exists:
+                        self._append_file(self.journal_name, old_name)
+                        os.remove(self.journal_name)
+                    else:
+                        os.rename(self.journal_name, old_name)
+                    self._journal_size = 0
+                except OSError:
+                    pass
+            self._compact_runs += 1
+            self._write_snapshot(snapshot, '{}.{}.tmp'.format(self.file_name, self._compact_runs))
+            try:
+                os.remove(old_name)
+            except OSError:
+                pass
+
+    def _write_snapshot(self, snapshot, tmp_name):
+        with open(tmp_name, 'w') as f:
+            f.write(snapshot)
+        try:
+            os.rename(tmp_name, self.file_name)
+        except OSError:
+            os.remove(self.file_name)
+            os.rename(tmp_name, self.file_name)
+
+    @staticmethod
+    def _append_file(src_name, dst_name):
+        with open(src_name, 'r') as src:
+            with open(dst_name, 'a') as dst:
+                dst.write('\n')  # 旧日志可能以写了一半的行结尾
+                while True:
+                    block = src.read(512)
+                    if not block:
+                        break
+                    dst.write(block)
+
+    def save(self):
+        self.compact()
+
+    def get_data(self):
+        return self.data
+
+    def add_user(self, username, key, value):
+        # 后台合并线程在 _lock 内序列化 data, 修改 data 时也必须持有 _lock
+        with self._lock:
+            if username in self.data:
+                return False
+            self.data[username] = {key: value}
+            self._index_user(username)
+            start_compact = self._append_journal(['set', username, {key: value}])
+        if start_compact:
+            self._start_compact()
+        self._notify(username)
+        return True
+
+    def get_user(self, username):
+        return self.data[username]
+
+    def update_user(self, username, updated_data):
+        with self._lock:
+            if username not in self.data:
+                return False
+            self._unindex_user(username)
+            user_data = self.data[username]
+            user_data.update(updated_data)  # 更新用户数据
+            self._index_user(username)
+            start_compact = self._append_journal(['set', username, updated_data])
+        if start_compact:
+            self._start_compact()
+        self._notify(username)
+        return True
+
+    def delete_user(self, username):
+        with self._lock:
+            if username not in self.data:
+                return False
+            self._unindex_user(username)
+            del self.data[username]
+            start_compact = self._append_journal(['del', username])
+        if start_compact:
+            self._start_compact()
+        self._notify(username)
+        return True
+
+    def search_data(self, key, value):
+        if key in self.index:
+            username = self._first_user(key, value)
+            if username is None:
+                return None
+            return self.data[username]
+        for sub_dict in self.data:
+            if value == self.data[sub_dict].get(key):
+                return self.data[sub_dict]
+        return None
+
+    def user_by_finger(self, finger_id):
+        return self.search_data('fingers', finger_id)
+
+    def add_finger(self, username, finger_id):
+        if username not in self.data:
+            return False
+        fingers = self.data[username].get('fingers', [])
+        if finger_id not in fingers:
+            self.update_user(username, {'fingers': fingers + [finger_id]})
+        return True
+
+    def remove_finger(self, finger_id):
+        username = self._first_user('fingers', finger_id) if 'fingers' in self.index else None
+        if username is None:
+            return False
+        fingers = [item for item in self.data[username]['fingers'] if item != finger_id]
+        return self.update_user(username, {'fingers': fingers})
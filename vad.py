@@ -0,0 +1,157 @@
+"""
+Voice-activity gating for the microphone uplink: per-frame mean absolute level and zero-crossing count
+of 16 bit little endian PCM, an adaptive noise floor, and a gate stage for AudioStream that only lets
+speech through, with a few frames of pre-roll before the onset and a hangover after it.
+frame_features is the pure-Python reference; frame_features_native uses viper on the board.
+"""
+import struct
+from array import array
+
+MAX_FRAME_SAMPLES = 4096  # 电平累加值在 32 位内不会溢出
+
+
+def frame_features(buf, count):
+    """
+    :param buf: PCM bytes (16 bit little endian mono).
+    :param count: Number of samples to look at.
+    :return: (mean absolute level, number of sign changes)
+    """
+    samples = struct.unpack_from('<{}h'.format(count), buf)
+    level = 0
+    crossings = 0
+    negative = samples[0] < 0
+    for x in samples:
+        if x < 0:
+            level -= x
+            if not negative:
+                crossings += 1
+                negative = True
+        else:
+            level += x
+            if negative:
+                crossings += 1
+                negative = False
+    return level // count, crossings
+
+
+try:
+    import micropython
+
+    # viper 只能返回一个 int, 电平累加值和过零次数写进这个预先分配的数组
+    _features_out = array('i', (0, 0))
+
+    @micropython.viper
+    def _frame_features_viper(buf, count: int, out):
+        pcm = ptr16(buf)
+        result = ptr32(out)
+        level = 0
+        crossings = 0
+        negative = int(pcm[0]) & 0x8000
+        i = 0
+        while i < count:
+            x = int(pcm[i])
+            if x & 0x8000:
+                level += 0x10000 - x
+                if not negative:
+                    crossings += 1
+                    negative = 1
+            else:
+                level += x
+                if negative:
+                    crossings += 1
+                    negative = 0
+            i += 1
+        result[0] = level
+        result[1] = crossings
+
+    def frame_features_native(buf, count):
+        _frame_features_viper(buf, count, _features_out)
+        return _features_out[0] // count, _features_out[1]
+except (ImportError, AttributeError):
+    frame_features_native = frame_features
+
+
+class VoiceGate:
+    """
+    AudioStream stage: returns the chunk while there is speech, None while there is not.
+    A frame is speech when its level is above both min_level and ratio times the noise floor and its
+    zero-crossing rate is below max_crossing_rate (broadband hiss crosses zero far more often than
+    voice). The noise floor follows the level of non-speech frames. When speech starts, the last
+    pre_roll silent frames are sent in front of it so the onset is not clipped; after it stops,
+    hangover more frames are still sent.
+    Attributes:
+        frames(int): Frames seen.
+        speech_frames(int): Frames classified as speech.
+        passed_frames(int): Frames let through (speech + pre-roll + hangover).
+    """
+
+    def __init__(self, chunk_size, pre_roll=2, hangover=5, min_level=200, ratio=3, max_crossing_rate=0.35,
+                 features=frame_features_native):
+        if chunk_size // 2 > MAX_FRAME_SAMPLES:
+            raise ValueError('chunk too large')
+        self.chunk_size = chunk_size
+        self.pre_roll = pre_roll
+        self.hangover = hangover
+        self.min_level = min_level
+        self.ratio = ratio
+        self.max_crossings = int(max_crossing_rate * (chunk_size // 2))
+        self.features = features
+        self.noise_floor = min_level // ratio
+        self._ring = bytearray(chunk_size * pre_roll)
+        self._ring_view = memoryview(self._ring)
+        self._ring_head = 0  # 下一个写入的槽位
+        self._ring_count = 0
+        self._out = bytearray(chunk_size * (pre_roll + 1))
+        self._out_view = memoryview(self._out)
+        self._remaining = 0  # 还要继续发送的帧数
+        self.frames = 0
+        self.speech_frames = 0
+        self.passed_frames = 0
+
+    def is_speech(self, view):
+        level, crossings = self.features(view, len(view) // 2)
+        speech = level >= self.min_level and level >= self.noise_floor * self.ratio and \
+            crossings <= self.max_crossings
+        if not speech:
+            self.noise_floor += (level - self.noise_floor) >> 3
+        return speech
+
+    def __call__(self, view):
+        self.frames += 1
+        if self.is_speech(view):
+            self.speech_frames += 1
+            onset = self._remaining == 0
+            self._remaining = self.hangover + 1
+            if onset and self._ring_count:
+                return self._with_pre_roll(view)
+        if self._remaining:
+            self._remaining -= 1
+            self.passed_frames += 1
+            return view
+        self._remember(view)
+        return None
+
+    def _remember(self, view):
+        if not self.pre_roll:
+            return
+        start = self._ring_head * self.chunk_size
+        self._ring_view[start:start + len(view)] = view
+        self._ring_head = (self._ring_head + 1) % self.pre_roll
+        if self._ring_count < self.pre_roll:
+            self._ring_count += 1
+
+    def _with_pre_roll(self, view):
+        # 按时间顺序拼接缓存的静音帧和当前帧, 全部写进预先分配的输出缓冲区
+        size = self.chunk_size
+        slot = (self._ring_head - self._ring_count) % self.pre_roll
+        offset = 0
+        for _ in range(self._ring_count):
+            self._out_view[offset:offset + size] = self._ring_view[slot * size:slot * size + size]
+            offset += size
+            slot = (slot + 1) % self.pre_roll
+        self._out_view[offset:offset + len(view)] = view
+        offset += len(view)
+        self.passed_frames += self._ring_count + 1
+        self._remaining -= 1
+        self._ring_count = 0
+        return self._out_view[:offset]